@@ -0,0 +1,134 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# codec_bench.py                                                             #
+# Compare message codecs: bytes per message and encode/decode time.          #
+#                                                                            #
+#   $ python bench/codec_bench.py --iterations 5000                          #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import os
+import sys
+import argparse
+import timeit
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'hiss'), os.path.join(ROOT, 'client')]
+
+# Local Imports
+import me
+import nodes
+import message
+import aggregation
+
+### Classes ##################################################################
+class Args(object):
+    """
+    Holds arguments
+    """
+    pass
+
+### Functions ################################################################
+def parse_args():
+    """
+    Parse command line arguments
+    """
+    arguments = Args()
+    parser = argparse.ArgumentParser(
+        description="------------ Codec Benchmark --------------------",
+        epilog="--------------------------------------------------")
+
+    parser.add_argument('--iterations',
+        default=2000,
+        type=int,
+        help='Encode/decode round trips per message type')
+
+    parser.add_argument('--clocksize',
+        default=100,
+        type=int,
+        help='Number of entries in the benchmark vector clock')
+
+    parser.parse_args(namespace=arguments)
+    return arguments
+
+def sampleStatistic():
+    """
+    Stand-in statistic so the benchmark doesn't depend on psutil.
+    """
+    return 42.0
+
+def sampleMessages(clocksize):
+    """
+    One representative message of each type that goes over the wire.
+    """
+    me.init(nodes.CurrentNode('127.0.0.1'))
+    aggregation.STATISTICS = {
+        'cpuload': aggregation.MinMaxAverageAggregator(
+            'cpuload', sampleStatistic),
+        'cpucount': aggregation.MinMaxAverageSumAggregator(
+            'cpucount', sampleStatistic),
+        }
+
+    peer = uuid.uuid1()
+    recipients = [peer.hex]
+    clocks = {}
+    for i in range(clocksize):
+        clocks[uuid.uuid1().hex] = i
+
+    return [
+        ('V', message.VectorMessage(clocks)),
+        ('AG', message.AggregateMessage(
+            aggregation.STATISTICS['cpuload'], recipients=recipients)),
+        ('AG+sum', message.AggregateMessage(
+            aggregation.STATISTICS['cpucount'], recipients=recipients)),
+        ('D', message.DeadNodeMessage(peer.hex, recipients=recipients)),
+        ('N', message.NewNodeMessage(
+            (peer, '10.0.0.12', 30081), recipients=recipients)),
+        ('U', message.UniverseMessage(clocks.keys(), recipients=recipients)),
+        ('IL', message.InternalLogMessage("node joined", 2)),
+        ('EL', message.ExternalLogMessage("GET /stats 200", 1, 'access')),
+        ]
+
+def measure(codec, msg, iterations):
+    """
+    Return (bytes, encode microseconds, decode microseconds) for one message.
+    """
+    data = codec.encode(msg)
+    encode = timeit.Timer(lambda: codec.encode(msg)).timeit(iterations)
+    decode = timeit.Timer(lambda: codec.decode(data)).timeit(iterations)
+    return (len(data),
+        encode * 1000000.0 / iterations,
+        decode * 1000000.0 / iterations)
+
+### Main #####################################################################
+def main():
+    """
+    Run the benchmark and print a table.
+    """
+    args = parse_args()
+    pickle = message.getCodec('pickle')
+    binary = message.getCodec('binary')
+
+    print "%-8s | %21s | %21s | %21s" % (
+        "", "bytes/msg", "encode us", "decode us")
+    print "%-8s | %10s %10s | %10s %10s | %10s %10s" % (
+        "code", "pickle", "binary", "pickle", "binary", "pickle", "binary")
+    print "-" * 80
+    for label, msg in sampleMessages(args.clocksize):
+        p = measure(pickle, msg, args.iterations)
+        b = measure(binary, msg, args.iterations)
+        print "%-8s | %10d %10d | %10.1f %10.1f | %10.1f %10.1f" % (
+            label, p[0], b[0], p[1], b[1], p[2], b[2])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# gossip_bench.py                                                            #
+# Time one GossipClientFactory.gossip() tick with 10, 100 and 1000 queued    #
+# messages, sent to a few neighbors over in-memory transports. Reports the   #
+# time per tick, bytes written, and net allocations: allocated blocks where  #
+# the interpreter counts them, else gc-tracked objects with the collector    #
+# off.                                                                       #
+#                                                                            #
+#   $ python bench/gossip_bench.py --ticks 50 --neighbors 8                  #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import os
+import sys
+import gc
+import argparse
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'hiss'), os.path.join(ROOT, 'client')]
+
+# Local Imports
+import debug
+import config
+import me
+import nodes
+import connections
+import neighbors
+import message
+import aggregation
+import gossip
+
+### Classes ##################################################################
+class Args(object):
+    """
+    Holds arguments
+    """
+    pass
+
+class NullTransport(object):
+    """
+    Transport that counts what is written to it.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.written = 0
+
+    def getPeer(self):
+        return self
+
+    def writeSequence(self, data):
+        for part in data:
+            self.written += len(part)
+
+    def loseConnection(self):
+        pass
+
+### Functions ################################################################
+def parse_args():
+    """
+    Parse command line arguments
+    """
+    arguments = Args()
+    parser = argparse.ArgumentParser(
+        description="------------ Gossip Tick Benchmark ---------------",
+        epilog="--------------------------------------------------")
+
+    parser.add_argument('--ticks',
+        default=50,
+        type=int,
+        help='Gossip ticks timed per queue depth')
+
+    parser.add_argument('--neighbors',
+        default=8,
+        type=int,
+        help='Neighbors gossiped with each tick')
+
+    parser.add_argument('--depths',
+        default="10,100,1000",
+        help='Comma separated queue depths to measure')
+
+    parser.parse_args(namespace=arguments)
+    return arguments
+
+def sampleStatistic():
+    """
+    Stand-in statistic so the benchmark doesn't depend on psutil.
+    """
+    return 42.0
+
+def setUp(neighborCount):
+    """
+    A node with neighborCount connected neighbors and a client factory.
+    Returns the transports.
+    """
+    debug.DEBUG_FLG = False
+    debug.THRESHOLD = 100
+    me.init(nodes.CurrentNode('127.0.0.1'))
+    aggregation.STATISTICS = {
+        'cpuload': aggregation.MinMaxAverageAggregator(
+            'cpuload', sampleStatistic),
+        'cpucount': aggregation.MinMaxAverageSumAggregator(
+            'cpucount', sampleStatistic),
+        }
+    connections.neighborStrategy = \
+        neighbors.ConstantNeighborStrategy(neighborCount)
+    connections.addNode(me.getMe())
+
+    transports = []
+    for i in range(neighborCount):
+        node = connections.createNode(uuid.uuid1(), '10.1.0.' + str(i),
+            config.RECEIVE_PORT)
+        transport = NullTransport(node.getIp(), node.getPort())
+        connections.assignTransport(node.getUid(), transport, True)
+        transports.append(transport)
+
+    gossip.gossipClientFactory = gossip.GossipClientFactory()
+    gossip.gossipClientFactory.gossipLoop.stop()
+    return transports
+
+def fillQueue(depth, recipients):
+    """
+    Queue depth network messages: a mix of dead/new node events, remote
+    aggregates and logs, each about something different.
+    """
+    for i in range(depth):
+        kind = i % 4
+        if kind == 0:
+            msg = message.DeadNodeMessage(uuid.uuid1().hex,
+                recipients=recipients)
+        elif kind == 1:
+            msg = message.NewNodeMessage((uuid.uuid1(), '10.2.0.1', 30081),
+                recipients=recipients)
+        elif kind == 2:
+            stat = aggregation.MinMaxAverageAggregator(
+                'stat' + str(i), sampleStatistic)
+            msg = message.AggregateMessage(stat, recipients=recipients)
+        else:
+            msg = message.ExternalLogMessage("GET /stats 200", 1, 'access')
+        gossip.gossipqueue.put(msg)
+
+def allocations():
+    """
+    Allocation counter: allocated blocks if available (Python 3.4+),
+    otherwise gc-tracked allocations minus deallocations.
+    """
+    if hasattr(sys, 'getallocatedblocks'):
+        return sys.getallocatedblocks()
+    return gc.get_count()[0]
+
+def measure(depth, ticks, transports):
+    """
+    Return (milliseconds, bytes written, net allocations) per tick.
+    """
+    recipients = [uid for uid in connections.universe
+        if uid != me.getUid()]
+    factory = gossip.gossipClientFactory
+    elapsed = 0.0
+    allocated = 0
+    before = sum(t.written for t in transports)
+    config.GOSSIP_ROUND_BYTES = sys.maxint
+    for tick in range(ticks):
+        fillQueue(depth, recipients)
+        gc.collect()
+        gc.disable()
+        count = allocations()
+        start = time.time()
+        factory.gossip()
+        elapsed += time.time() - start
+        allocated += allocations() - count
+        gc.enable()
+    written = sum(t.written for t in transports) - before
+    return (elapsed * 1000.0 / ticks, written / ticks, allocated / ticks)
+
+### Main #####################################################################
+def main():
+    """
+    Run the benchmark and print a table.
+    """
+    args = parse_args()
+    transports = setUp(args.neighbors)
+
+    print "%-8s | %12s | %12s | %12s" % (
+        "queued", "ms/tick", "bytes/tick", "allocs/tick")
+    print "-" * 54
+    for depth in [int(d) for d in args.depths.split(",")]:
+        (ms, written, allocated) = measure(depth, args.ticks, transports)
+        print "%-8d | %12.2f | %12d | %12d" % (depth, ms, written, allocated)
+
+if __name__ == "__main__":
+    main()
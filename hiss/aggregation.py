@@ -14,9 +14,10 @@
 ### Imports ##################################################################
 # Python Library imports
 from __future__ import division
+import math
 import time
 import copy
-import random
+import zlib
 
 # External library imports
 import psutil
@@ -25,7 +26,14 @@ import zope.interface
 # Local imports
 import config
 import connections
+import hyperloglog
+import me
+import pushflow
+import sketch
 import stats
+import vector_clock
+import wire
+from hiss_exceptions import GeneralError
 
 ### Interfaces ###############################################################
 class IAggregator(zope.interface.Interface):
@@ -147,6 +155,40 @@ class Aggregator(object):
         toReturn['value'] = self._value
         return toReturn
 
+    def getFlowAggregators(self):
+        """
+        (part, aggregator) for each push-flow aggregate this holds.
+        """
+        return []
+
+    def share(self, count):
+        """
+        What to send count peers this round. Most aggregators send
+        themselves as they are.
+        """
+        return self
+
+    def getDigestState(self):
+        """
+        The part of the state that settles once the cluster agrees, for
+        anti-entropy digests. None if there's nothing to reconcile that
+        way.
+        """
+        return self.getWireState()
+
+    def getWireState(self):
+        """
+        Get the values that make up this aggregator as primitives, for the
+        binary message codec. The statistic function never leaves the node.
+        """
+        return (self._key, self._value)
+
+    def setWireState(self, state):
+        """
+        Restore values produced by getWireState().
+        """
+        (self._key, self._value) = state
+
 class NamedAggregator(Aggregator):
     """
     NAMED AGGREGATOR (SUPER CLASS)
@@ -185,7 +227,9 @@ class NamedAggregator(Aggregator):
 class AverageAggregator(NamedAggregator):
     """
     AVERAGE AGGREGATOR
-    Aggregator that keeps an average of a value.
+    Aggregator that keeps the cluster-wide average of a value by push-flow
+    (see pushflow.py). The flows travel in AggregateFlowMessages; aggregate
+    messages only carry this node's estimate.
     """
 
     def __init__(self, name, statistic=None):
@@ -193,50 +237,351 @@ class AverageAggregator(NamedAggregator):
         Constructor
         """
         super(AverageAggregator, self).__init__(name, statistic)
-        self._interval = random.randint(
-            config.AGGREGATE_AVERAGE_REFRESH_MIN, 
-            config.AGGREGATE_AVERAGE_REFRESH_MAX)
-        self._counter = 0
+        self._flow = self._createFlow()
+
+    def _createFlow(self):
+        """
+        New push-flow state for the local value.
+        """
+        return pushflow.PushFlow(self._value, currentEpoch())
+
+    def getFlowAggregators(self):
+        """
+        This is one.
+        """
+        return [('value', self)]
+
+    def getFlow(self):
+        """
+        The push-flow state, or None for an aggregator received over the
+        wire.
+        """
+        return self._flow
+
+    def getValue(self):
+        """
+        This node's estimate of the average.
+        """
+        if self._flow is None:
+            return self._value
+        return self._flow.getEstimate()
 
     def refresh(self):
         """
-        Refresh on a certain interval.
+        Take a new local reading, and restart if a new epoch began.
         """
-        self._counter += 1
-        if self._counter == self._interval:
-            self._value = self.getLocalValue()
-        else:
-            pass
+        self._flow.setLocal(self.getLocalValue())
+        self._flow.advance(currentEpoch())
 
     def reduce(self, other):
         """
-        Reduce from a received message.
-        When we combine two the variance of the system converges
-        to zero.
+        Reduce from a received message. The average only moves by flows
+        (averaging estimates pairwise isn't mass-conserving), so another
+        node's estimate changes nothing here.
         """
         if self.getName() == other.getName():
-            self._value = ((self.getValue() + other.getValue()) / 2)
             return self.getValue()
         else:
             error = "Cannot reduce different aggregators: (" + self.getName()
             error += ", " + other.getName() + ")"
             raise error
 
-class SumAggregator(NamedAggregator):
+    def getStatistic(self):
+        """
+        Get as a dictionary, with the epoch and convergence error.
+        """
+        toReturn = super(AverageAggregator, self).getStatistic()
+        toReturn['value'] = self.getValue()
+        if self._flow is not None:
+            toReturn['epoch'] = self._flow.getEpoch()
+            toReturn['error'] = self._flow.getError()
+        return toReturn
+
+    def getDigestState(self):
+        """
+        None: the flows reconcile averages, in their own messages.
+        """
+        return None
+
+    def getWireState(self):
+        """
+        Only the estimate goes over the wire.
+        """
+        return (self._key, self.getValue())
+
+    def setWireState(self, state):
+        """
+        Restore a received estimate.
+        """
+        (self._key, self._value) = state
+        self._flow = None
+
+class SumAggregator(AverageAggregator):
+    """
+    SUM AGGREGATOR
+    Aggregator that keeps the cluster-wide total of a value: a push-flow
+    average where only one node holds any weight (see PushFlowSum).
+    """
+
+    def _createFlow(self):
+        """
+        New push-flow total for the local value.
+        """
+        return pushflow.PushFlowSum(self._value, me.getMe().getUid(),
+            currentEpoch())
+
+class CountAggregator(SumAggregator):
+    """
+    COUNT AGGREGATOR
+    Aggregator that counts the nodes: the total of 1 from each.
+    """
+
+    def __init__(self, name, statistic=None):
+        """
+        Constructor. Any statistic given is ignored.
+        """
+        super(CountAggregator, self).__init__(name, countOne)
+
+
+class QuantileAggregator(NamedAggregator):
+    """
+    QUANTILE AGGREGATOR
+    Aggregator that keeps a DDSketch of recent readings across the cluster,
+    for percentiles. Each refresh fades the sketch and adds the local
+    reading. A round's sends hand each neighbor an equal share of the
+    sketch and reduce merges received shares in (push-sum), so the total
+    weight holds steady and no node's readings count twice.
+    """
 
     def __init__(self, name, statistic=None):
         """
         Constructor
-        This might be a little tricky since a SUM is really
-        just an average multiplied by the total node count.
         """
+        super(QuantileAggregator, self).__init__(name, statistic)
+        self._sketch = sketch.DDSketch()
+        self._sketch.add(self._value)
+
+    def getSketch(self):
+        """
+        Get the sketch
+        """
+        return self._sketch
+
+    def getQuantile(self, q):
+        """
+        Estimate the q-quantile of the cluster's recent readings.
+        """
+        return self._sketch.getQuantile(q)
+
+    def getValue(self):
+        """
+        The median.
+        """
+        return self.getQuantile(0.5)
+
+    def refresh(self):
+        """
+        Fade the sketch and add the local reading.
+        """
+        self._value = self.getLocalValue()
+        self._sketch.scale(1 - config.AGGREGATE_QUANTILE_DECAY)
+        self._sketch.add(self._value, config.AGGREGATE_QUANTILE_DECAY)
 
     def reduce(self, other):
         """
-        reduce from a received message
+        Merge in a share of another node's sketch.
         """
-        pass
+        if self.getName() == other.getName():
+            self._sketch.merge(other.getSketch())
+            return self.getValue()
+        else:
+            error = "Cannot reduce different aggregators: (" + self.getName()
+            error += ", " + other.getName() + ")"
+            raise GeneralError(error)
 
+    def share(self, count):
+        """
+        Split the sketch count + 1 ways: one share stays here, the one
+        returned goes to each of count peers.
+        """
+        self._sketch.scale(1.0 / (count + 1))
+        shared = emptyAggregator(QuantileAggregator, self._name)
+        shared._key = self._key
+        shared._value = self._value
+        shared._sketch = self._sketch.copy()
+        return shared
+
+    def getStatistic(self):
+        """
+        Get as a dictionary, with each configured quantile as pNN.
+        """
+        toReturn = super(QuantileAggregator, self).getStatistic()
+        toReturn['value'] = self.getValue()
+        for q in config.AGGREGATE_QUANTILES:
+            toReturn['p' + ('%g' % (q * 100))] = self.getQuantile(q)
+        return toReturn
+
+    def getDigestState(self):
+        """
+        The configured quantiles. The sketch weights keep moving as
+        shares are passed on, but each quantile lands in one bucket.
+        """
+        return tuple(self.getQuantile(q) for q in config.AGGREGATE_QUANTILES)
+
+    def getWireState(self):
+        """
+        The key and the sketch's buckets.
+        """
+        return (self._key, self._sketch.getWireState())
+
+    def setWireState(self, state):
+        """
+        Restore from wire state.
+        """
+        (self._key, sketchState) = state
+        self._value = None
+        self._sketch = sketch.DDSketch()
+        self._sketch.setWireState(sketchState)
+
+class CardinalityAggregator(NamedAggregator):
+    """
+    CARDINALITY AGGREGATOR
+    Aggregator that counts distinct keys across the cluster with a
+    HyperLogLog. Without a statistic it counts nodes, each adding its own
+    uid. Otherwise the statistic returns this node's keys, and add()
+    counts more. reduce is a register-wise max, so hearing the same
+    counter again changes nothing. The registers restart every epoch so
+    keys that are gone stop counting; keys given to add() only count
+    for the epoch they were added in.
+    """
+
+    def __init__(self, name, statistic=None):
+        """
+        Constructor
+        """
+        super(CardinalityAggregator, self).__init__(name, statistic)
+        self._counter = hyperloglog.HyperLogLog()
+        self._epoch = currentEpoch()
+        self._merges = 0
+        self._previous = None
+        self._addLocal()
+
+    def _addLocal(self):
+        """
+        Count this node's keys.
+        """
+        if self._statistic_function is None:
+            self._counter.add(self._key)
+        else:
+            for key in self._statistic_function() or []:
+                self._counter.add(key)
+
+    def _restart(self, epoch):
+        """
+        Start a new epoch with only our own keys. Until it warms up the
+        last epoch's count is reported.
+        """
+        if self._merges >= config.AGGREGATE_EPOCH_WARMUP:
+            self._previous = self._counter.getEstimate()
+        self._counter.clear()
+        self._epoch = epoch
+        self._merges = 0
+        self._addLocal()
+
+    def add(self, key):
+        """
+        Count an application key.
+        """
+        self._counter.add(key)
+
+    def getCounter(self):
+        """
+        Get the HyperLogLog
+        """
+        return self._counter
+
+    def getEpoch(self):
+        """
+        Get the epoch the registers are for
+        """
+        return self._epoch
+
+    def getValue(self):
+        """
+        Estimated number of distinct keys in the cluster.
+        """
+        estimate = self._counter.getEstimate()
+        if self._merges < config.AGGREGATE_EPOCH_WARMUP \
+            and self._previous is not None:
+            estimate = self._previous
+        return int(round(estimate))
+
+    def getLocalValue(self):
+        """
+        Number of keys at this node.
+        """
+        if self._statistic_function is None:
+            return 1
+        return len(self._statistic_function() or [])
+
+    def refresh(self):
+        """
+        Restart if a new epoch began, and count our keys.
+        """
+        epoch = currentEpoch()
+        if epoch > self._epoch:
+            self._restart(epoch)
+        else:
+            self._addLocal()
+
+    def reduce(self, other):
+        """
+        Register-wise max with another node's counter of the same epoch
+        or newer.
+        """
+        if self.getName() == other.getName():
+            if other.getEpoch() > self._epoch:
+                self._restart(other.getEpoch())
+            if other.getEpoch() == self._epoch:
+                self._counter.merge(other.getCounter())
+                self._merges += 1
+            return self.getValue()
+        else:
+            error = "Cannot reduce different aggregators: (" + self.getName()
+            error += ", " + other.getName() + ")"
+            raise GeneralError(error)
+
+    def getStatistic(self):
+        """
+        Get as a dictionary, with the epoch and standard error.
+        """
+        toReturn = super(CardinalityAggregator, self).getStatistic()
+        toReturn['value'] = self.getValue()
+        toReturn['epoch'] = self._epoch
+        toReturn['error'] = self._counter.getStandardError()
+        return toReturn
+
+    def getDigestState(self):
+        """
+        The epoch and registers; the key is our own.
+        """
+        return (self._epoch, self._counter.getWireState())
+
+    def getWireState(self):
+        """
+        The key, epoch and registers.
+        """
+        return (self._key, self._epoch, self._counter.getWireState())
+
+    def setWireState(self, state):
+        """
+        Restore from wire state.
+        """
+        (self._key, self._epoch, registers) = state
+        self._counter = hyperloglog.HyperLogLog()
+        self._counter.setWireState(registers)
+        self._merges = 0
+        self._previous = None
 
 class MinAggregator(NamedAggregator):
     """
@@ -331,7 +676,7 @@ class MinMaxAggregator(object):
         """
         Combine the two.
         """
-        assert other.__class__.__name__ == "MinMaxAggregator"
+        assert isinstance(other, MinMaxAggregator)
         self._max.reduce(other.getMaxAggregator())
         self._min.reduce(other.getMinAggregator())
 
@@ -348,12 +693,45 @@ class MinMaxAggregator(object):
         """
         return None
 
+    def getFlowAggregators(self):
+        """
+        Min and max don't use push-flow.
+        """
+        return []
+
+    def share(self, count):
+        """
+        Min and max are sent as they are.
+        """
+        return self
+
     def getStatistic(self):
         ret = {}
         ret['min'] = self.getMinAggregator().getStatistic()
         ret['max'] = self.getMaxAggregator().getStatistic()
         return ret
 
+    def getDigestState(self):
+        """
+        The max and the min settle.
+        """
+        return self.getWireState()
+
+    def getWireState(self):
+        """
+        Wire state of the max and the min.
+        """
+        return (self._max.getWireState(), self._min.getWireState())
+
+    def setWireState(self, state):
+        """
+        Restore the max and the min from wire state.
+        """
+        self._max = emptyAggregator(MaxAggregator, self._name)
+        self._max.setWireState(state[0])
+        self._min = emptyAggregator(MinAggregator, self._name)
+        self._min.setWireState(state[1])
+
     def localValue(self):
         """
         Return the statistic local to this node.
@@ -378,13 +756,19 @@ class MinMaxAverageAggregator(MinMaxAggregator):
         """
         return self._average
 
+    def getFlowAggregators(self):
+        """
+        The average.
+        """
+        return [('avg', self._average)]
+
     def reduce(self, other):
         """
         Combine the two.
         """
-        assert other.__class__.__name__ == "MinMaxAverageAggregator"
+        assert isinstance(other, MinMaxAverageAggregator)
         super(MinMaxAverageAggregator, self).reduce(other)
-        self._avg.reduce(other.getAverageAggregator())
+        self._average.reduce(other.getAverageAggregator())
 
     def refresh(self):
         """
@@ -401,6 +785,27 @@ class MinMaxAverageAggregator(MinMaxAggregator):
         ret['avg'] = self.getAverageAggregator().getStatistic()
         return ret
 
+    def getDigestState(self):
+        """
+        Only the max and min; the average is reconciled by its flows.
+        """
+        return MinMaxAggregator.getWireState(self)
+
+    def getWireState(self):
+        """
+        Wire state of the max, min and average.
+        """
+        return super(MinMaxAverageAggregator, self).getWireState() + \
+            (self._average.getWireState(),)
+
+    def setWireState(self, state):
+        """
+        Restore the max, min and average from wire state.
+        """
+        super(MinMaxAverageAggregator, self).setWireState(state[:2])
+        self._average = emptyAggregator(AverageAggregator, self._name)
+        self._average.setWireState(state[2])
+
 class MinMaxAverageSumAggregator(MinMaxAverageAggregator):
     """
     MINIMUM + MAXIMUM + AVERAGE + SUM
@@ -412,32 +817,539 @@ class MinMaxAverageSumAggregator(MinMaxAverageAggregator):
         Constructor
         """
         super(MinMaxAverageSumAggregator, self).__init__(name, statistic)
-        self._nodecount = len(connections.universe)
+        self._sum = SumAggregator(name, statistic)
+
+    def getSumAggregator(self):
+        """
+        Get the aggregator for the sum
+        """
+        return self._sum
+
+    def getFlowAggregators(self):
+        """
+        The average and the sum.
+        """
+        return super(MinMaxAverageSumAggregator, self).getFlowAggregators() \
+            + [('sum', self._sum)]
 
     def refresh(self):
         """
         Refresh from the local machine/sensor
         """
         super(MinMaxAverageSumAggregator, self).refresh()
-        self._nodecount = len(connections.universe)
+        self._sum.refresh()
 
     def reduce(self, other):
         """
         Reduce from a received message.
         """
-        assert other.__class__.__name__ == "MinMaxAverageSumAggregator"
+        assert isinstance(other, MinMaxAverageSumAggregator)
         super(MinMaxAverageSumAggregator, self).reduce(other)
+        self._sum.reduce(other.getSumAggregator())
 
     def getStatistic(self):
         """
         Get the full statistic for this aggregator
         """
         ret = super(MinMaxAverageSumAggregator, self).getStatistic()
-        ret['sum'] = {}
-        ret['sum']['name'] = ret['avg']['name']
-        ret['sum']['value'] = ret['avg']['value'] * self._nodecount
+        ret['sum'] = self.getSumAggregator().getStatistic()
+        return ret
+
+    def getWireState(self):
+        """
+        Wire state of the max, min, average and sum.
+        """
+        return super(MinMaxAverageSumAggregator, self).getWireState() + \
+            (self._sum.getWireState(),)
+
+    def setWireState(self, state):
+        """
+        Restore from wire state.
+        """
+        super(MinMaxAverageSumAggregator, self).setWireState(state[:3])
+        self._sum = emptyAggregator(SumAggregator, self._name)
+        self._sum.setWireState(state[3])
+
+class WindowedAggregator(NamedAggregator):
+    """
+    WINDOWED AGGREGATOR. ABSTRACT CLASS
+    Keeps a statistic over a sliding window as a ring buffer of buckets,
+    each stamped with its epoch (wall clock time in bucketSeconds steps).
+    Readings go into the current bucket, and received buckets merge into
+    ours of the same epoch. A bucket that falls out of the window is
+    overwritten and older ones that arrive are ignored, so old readings
+    expire everywhere without a reset. With a halfLife (seconds), newer
+    buckets weigh more where the statistic has weights.
+    """
+
+    splits = False
+    """
+    Whether buckets are shared out when sent (push-sum) rather than sent
+    whole.
+    """
+
+    def __init__(self, name, statistic=None, window=None,
+        bucketSeconds=None, halfLife=None, clock=None):
+        """
+        Constructor. clock returns the wall clock time (time.time).
+        """
+        super(WindowedAggregator, self).__init__(name, statistic)
+        if clock is None:
+            clock = time.time
+        if window is None:
+            window = config.AGGREGATE_WINDOW_SECONDS
+        if bucketSeconds is None:
+            bucketSeconds = config.AGGREGATE_WINDOW_BUCKET_SECONDS
+        self._bucketSeconds = bucketSeconds
+        self._halfLife = halfLife
+        self._slots = [None] * max(1, int(math.ceil(window / bucketSeconds)))
+        self._clock = clock
+        self.record(self._value)
+
+    def _currentEpoch(self):
+        """
+        Epoch of the current bucket.
+        """
+        return int(self._clock() // self._bucketSeconds)
+
+    def _bucket(self, epoch):
+        """
+        State of the bucket for epoch, started afresh if its slot holds an
+        older one. None if the epoch is outside the window or the slot
+        already holds a newer one.
+        """
+        if epoch <= self._currentEpoch() - len(self._slots):
+            return None
+        index = epoch % len(self._slots)
+        slot = self._slots[index]
+        if slot is None or slot[0] < epoch:
+            slot = [epoch, self._emptyBucket()]
+            self._slots[index] = slot
+        elif slot[0] > epoch:
+            return None
+        return slot[1]
+
+    def getBuckets(self):
+        """
+        (epoch, state) of each bucket in the window, newest first.
+        """
+        if self._bucketSeconds is None:
+            live = self._slots
+        else:
+            oldest = self._currentEpoch() - len(self._slots)
+            live = [slot for slot in self._slots
+                if slot is not None and slot[0] > oldest]
+        return [(epoch, state) for (epoch, state)
+            in sorted(live, key=lambda slot: slot[0], reverse=True)]
+
+    def _weighted(self):
+        """
+        (weight, state) of each bucket in the window. Weights halve every
+        halfLife seconds of age, or are all 1. Buckets from a peer whose
+        clock runs ahead count as current.
+        """
+        buckets = self.getBuckets()
+        if self._halfLife is None or not buckets:
+            return [(1.0, state) for (epoch, state) in buckets]
+        newest = self._currentEpoch()
+        return [(0.5 ** (max(0, newest - epoch) * self._bucketSeconds
+            / self._halfLife), state) for (epoch, state) in buckets]
+
+    def record(self, value):
+        """
+        Add a reading to the current bucket.
+        """
+        if value is None:
+            return
+        state = self._bucket(self._currentEpoch())
+        if state is not None:
+            self._addReading(state, value)
+
+    def refresh(self):
+        """
+        Add the local reading to the current bucket.
+        """
+        self._value = self.getLocalValue()
+        self.record(self._value)
+
+    def reduce(self, other):
+        """
+        Merge each of the other's buckets into ours of the same epoch.
+        """
+        if self.getName() == other.getName():
+            for (epoch, state) in other.getBuckets():
+                mine = self._bucket(epoch)
+                if mine is not None:
+                    self._mergeBucket(mine, state)
+            return self.getValue()
+        else:
+            error = "Cannot reduce different aggregators: (" + self.getName()
+            error += ", " + other.getName() + ")"
+            raise GeneralError(error)
+
+    def share(self, count):
+        """
+        For statistics that split, keep one of count + 1 equal shares of
+        each bucket and return the share each peer gets.
+        """
+        if not self.splits:
+            return self
+        fraction = 1.0 / (count + 1)
+        shared = emptyAggregator(self.__class__, self._name)
+        shared._key = self._key
+        shared._value = self._value
+        shared._bucketSeconds = None
+        shared._halfLife = None
+        shared._slots = []
+        for (epoch, state) in self.getBuckets():
+            self._scaleBucket(state, fraction)
+            shared._slots.append([epoch, self._copyBucket(state)])
+        return shared
+
+    def getStatistic(self):
+        """
+        Get as a dictionary, with the window in seconds.
+        """
+        toReturn = super(WindowedAggregator, self).getStatistic()
+        toReturn['value'] = self.getValue()
+        if self._bucketSeconds is not None:
+            toReturn['window'] = len(self._slots) * self._bucketSeconds
+        return toReturn
+
+    def getDigestState(self):
+        """
+        Each bucket in the window as (epoch, state); the key is our own.
+        """
+        return self.getWireState()[1]
+
+    def getWireState(self):
+        """
+        The key and each bucket in the window as (epoch, state).
+        """
+        return (self._key, [(epoch, self._packBucket(state))
+            for (epoch, state) in self.getBuckets()])
+
+    def setWireState(self, state):
+        """
+        Restore received buckets.
+        """
+        (self._key, buckets) = state
+        self._value = None
+        self._bucketSeconds = None
+        self._halfLife = None
+        self._slots = [[epoch, self._unpackBucket(packed)]
+            for (epoch, packed) in buckets]
+
+class WindowedMinAggregator(WindowedAggregator):
+    """
+    Minimum over the window, and the node it came from.
+    Bucket: [value, key]
+    """
+
+    def _better(self, value, than):
+        """
+        Whether value beats than.
+        """
+        return value < than
+
+    def _emptyBucket(self):
+        return [None, None]
+
+    def _addReading(self, state, value):
+        self._mergeBucket(state, (value, self._key))
+
+    def _mergeBucket(self, state, other):
+        if other[0] is not None and \
+            (state[0] is None or self._better(other[0], state[0])):
+            state[0] = other[0]
+            state[1] = other[1]
+
+    def _packBucket(self, state):
+        return tuple(state)
+
+    def _unpackBucket(self, packed):
+        return list(packed)
+
+    def _extreme(self):
+        """
+        [value, key] of the extreme over the window.
+        """
+        extreme = self._emptyBucket()
+        for (epoch, state) in self.getBuckets():
+            self._mergeBucket(extreme, state)
+        return extreme
+
+    def getValue(self):
+        """
+        The extreme over the window.
+        """
+        return self._extreme()[0]
+
+    def getStatistic(self):
+        """
+        Get as a dictionary, keyed by the node the extreme came from.
+        """
+        toReturn = super(WindowedMinAggregator, self).getStatistic()
+        toReturn['key'] = self._extreme()[1]
+        return toReturn
+
+class WindowedMaxAggregator(WindowedMinAggregator):
+    """
+    Maximum over the window, and the node it came from.
+    """
+
+    def _better(self, value, than):
+        """
+        Whether value beats than.
+        """
+        return value > than
+
+class WindowedAverageAggregator(WindowedAggregator):
+    """
+    Average over the window by push-sum on each bucket's (sum, weight).
+    Shares only go to peers the frame reaches (see gossip.py), since a
+    lost share takes its readings' weight with it.
+    Bucket: [sum, weight]
+    """
+
+    splits = True
+
+    def _emptyBucket(self):
+        return [0.0, 0.0]
+
+    def _addReading(self, state, value):
+        state[0] += value
+        state[1] += 1.0
+
+    def _mergeBucket(self, state, other):
+        state[0] += other[0]
+        state[1] += other[1]
+
+    def _scaleBucket(self, state, factor):
+        state[0] *= factor
+        state[1] *= factor
+
+    def _copyBucket(self, state):
+        return list(state)
+
+    def _packBucket(self, state):
+        return tuple(state)
+
+    def _unpackBucket(self, packed):
+        return list(packed)
+
+    def getDigestState(self):
+        """
+        The average to the quantile sketches' accuracy: bucket sums and
+        weights keep moving as shares are passed on.
+        """
+        return quantize(self.getValue())
+
+    def getValue(self):
+        """
+        Weighted average over the window. None if nothing was read.
+        """
+        total = 0.0
+        weight = 0.0
+        for (age, state) in self._weighted():
+            total += age * state[0]
+            weight += age * state[1]
+        if weight <= 0:
+            return None
+        return total / weight
+
+class WindowedQuantileAggregator(WindowedAggregator):
+    """
+    Quantiles over the window: a DDSketch per bucket, shared out by
+    push-sum like QuantileAggregator.
+    Bucket: DDSketch
+    """
+
+    splits = True
+
+    def _emptyBucket(self):
+        return sketch.DDSketch()
+
+    def _addReading(self, state, value):
+        state.add(value)
+
+    def _mergeBucket(self, state, other):
+        state.merge(other)
+
+    def _scaleBucket(self, state, factor):
+        state.scale(factor)
+
+    def _copyBucket(self, state):
+        return state.copy()
+
+    def _packBucket(self, state):
+        return state.getWireState()
+
+    def _unpackBucket(self, packed):
+        state = sketch.DDSketch()
+        state.setWireState(packed)
+        return state
+
+    def getQuantile(self, q):
+        """
+        Estimate the q-quantile over the window, newer buckets weighing
+        more if there is a half life.
+        """
+        combined = sketch.DDSketch()
+        for (age, state) in self._weighted():
+            weighted = state.copy()
+            weighted.scale(age)
+            combined.merge(weighted)
+        return combined.getQuantile(q)
+
+    def getDigestState(self):
+        """
+        The configured quantiles, each of which lands in one bucket.
+        """
+        return tuple(self.getQuantile(q) for q in config.AGGREGATE_QUANTILES)
+
+    def getValue(self):
+        """
+        The median.
+        """
+        return self.getQuantile(0.5)
+
+    def getStatistic(self):
+        """
+        Get as a dictionary, with each configured quantile as pNN.
+        """
+        toReturn = super(WindowedQuantileAggregator, self).getStatistic()
+        for q in config.AGGREGATE_QUANTILES:
+            toReturn['p' + ('%g' % (q * 100))] = self.getQuantile(q)
+        return toReturn
+
+class WindowedMinMaxAverageAggregator(object):
+    """
+    Windowed min, max and average of the same statistic, reported like a
+    MinMaxAverageAggregator.
+    """
+
+    zope.interface.implements(INamedAggregator)
+
+    def __init__(self, name, statistic, window=None, bucketSeconds=None,
+        halfLife=None, clock=None):
+        """
+        Constructor
+        """
+        self._name = name
+        self._statistic_function = statistic
+        self._min = WindowedMinAggregator(
+            name, statistic, window, bucketSeconds, clock=clock)
+        self._max = WindowedMaxAggregator(
+            name, statistic, window, bucketSeconds, clock=clock)
+        self._average = WindowedAverageAggregator(
+            name, statistic, window, bucketSeconds, halfLife, clock)
+
+    def getName(self):
+        """
+        Get the name of the statistic.
+        """
+        return self._name
+
+    def getMinAggregator(self):
+        """
+        Getter for the min
+        """
+        return self._min
+
+    def getMaxAggregator(self):
+        """
+        Getter for the max
+        """
+        return self._max
+
+    def getAverageAggregator(self):
+        """
+        Getter for the average
+        """
+        return self._average
+
+    def reduce(self, other):
+        """
+        Combine each part.
+        """
+        assert isinstance(other, WindowedMinMaxAverageAggregator)
+        self._min.reduce(other.getMinAggregator())
+        self._max.reduce(other.getMaxAggregator())
+        self._average.reduce(other.getAverageAggregator())
+
+    def refresh(self):
+        """
+        Take one local reading for every part.
+        """
+        value = self.getLocalValue()
+        for part in (self._min, self._max, self._average):
+            part.record(value)
+
+    def getValue(self):
+        """
+        Get the value of this aggregator (do nothing).
+        """
+        return None
+
+    def getLocalValue(self):
+        """
+        Return the statistic local to this node.
+        """
+        return self._statistic_function()
+
+    def getFlowAggregators(self):
+        """
+        The window doesn't use push-flow.
+        """
+        return []
+
+    def share(self, count):
+        """
+        Min and max go whole; the average is shared out.
+        """
+        shared = emptyAggregator(WindowedMinMaxAverageAggregator, self._name)
+        shared._min = self._min
+        shared._max = self._max
+        shared._average = self._average.share(count)
+        return shared
+
+    def getStatistic(self):
+        """
+        Get the min, max and average.
+        """
+        ret = {}
+        ret['min'] = self._min.getStatistic()
+        ret['max'] = self._max.getStatistic()
+        ret['avg'] = self._average.getStatistic()
         return ret
 
+    def getDigestState(self):
+        """
+        Digest state of the min, max and average.
+        """
+        return (self._min.getDigestState(), self._max.getDigestState(),
+            self._average.getDigestState())
+
+    def getWireState(self):
+        """
+        Wire state of the min, max and average.
+        """
+        return (self._min.getWireState(), self._max.getWireState(),
+            self._average.getWireState())
+
+    def setWireState(self, state):
+        """
+        Restore the min, max and average from wire state.
+        """
+        self._min = emptyAggregator(WindowedMinAggregator, self._name)
+        self._min.setWireState(state[0])
+        self._max = emptyAggregator(WindowedMaxAggregator, self._name)
+        self._max.setWireState(state[1])
+        self._average = emptyAggregator(
+            WindowedAverageAggregator, self._name)
+        self._average.setWireState(state[2])
+
 
 class UpdateAggregator(NamedAggregator):
     """
@@ -475,7 +1387,7 @@ class UpdateAggregator(NamedAggregator):
         if self.getVectorClock().cameBefore(other.getVectorClock()):
             self._key = other.getKey()
             self._value = other.getValue()
-            self.getVectorClock().mergeClocks(other)
+            self.getVectorClock().mergeClock(other.getVectorClock())
         else:
             pass #irrelevant.
 
@@ -491,6 +1403,20 @@ class UpdateAggregator(NamedAggregator):
         else:
             pass # not relevant
 
+    def getWireState(self):
+        """
+        Wire state is the value plus the vector clock it was taken at.
+        """
+        return (self._key, self._value, 
+            self._vectorClock.getKey(), self._vectorClock.getClocks())
+
+    def setWireState(self, state):
+        """
+        Restore value and vector clock from wire state.
+        """
+        (self._key, self._value, clockKey, clocks) = state
+        self._vectorClock = vector_clock.VectorClock(clockKey, clocks)
+
 
 ### Globals ##################################################################
 
@@ -507,14 +1433,27 @@ def stats_init():
     DISK_AVAILABLE = MinMaxAverageSumAggregator(
         'diskavailable', stats.disk_free)
 
-    NETWORK_LOAD = MinMaxAverageAggregator(
-        'networkload', stats.network_load_single_stat)
+    # Loads over the last five minutes, so a spike doesn't stick.
+    NETWORK_LOAD = WindowedMinMaxAverageAggregator(
+        'networkload', stats.network_load_single_stat, window=300)
+
+    DISK_LOAD = WindowedMinMaxAverageAggregator(
+        'diskload', stats.disk_load_single_stat, window=300)
+
+    CPU_LOAD = WindowedMinMaxAverageAggregator(
+        'cpuload', stats.cpu_utilization, window=300)
+
+    NETWORK_LOAD_QUANTILES = WindowedQuantileAggregator(
+        'networkloadquantiles', stats.network_load_single_stat,
+        window=300, halfLife=120)
 
-    DISK_LOAD = MinMaxAverageAggregator(
-        'diskload', stats.disk_load_single_stat)
+    DISK_LOAD_QUANTILES = WindowedQuantileAggregator(
+        'diskloadquantiles', stats.disk_load_single_stat,
+        window=300, halfLife=120)
 
-    CPU_LOAD = MinMaxAverageAggregator(
-        'cpuload', stats.cpu_utilization)
+    CPU_LOAD_QUANTILES = WindowedQuantileAggregator(
+        'cpuloadquantiles', stats.cpu_utilization,
+        window=300, halfLife=120)
 
     CPU_COUNT = MinMaxAverageSumAggregator(
         'cpucount', stats.cpu_count)
@@ -522,24 +1461,87 @@ def stats_init():
     PMEM_AVAILABLE = MinMaxAverageSumAggregator(
         'pmemavailable', stats.physical_mem_free)
 
-    NODE_COUNT = UpdateAggregator(
-        'nodecount', stats.timber_node_count)
+    NODE_COUNT = CardinalityAggregator('nodecount')
 
     STATISTICS = {
         'diskavailable': DISK_AVAILABLE, 
         'networkload': NETWORK_LOAD, 
         'diskload': DISK_LOAD,
         'cpuload': CPU_LOAD,
+        'networkloadquantiles': NETWORK_LOAD_QUANTILES,
+        'diskloadquantiles': DISK_LOAD_QUANTILES,
+        'cpuloadquantiles': CPU_LOAD_QUANTILES,
         'cpucount': CPU_COUNT,
         'pmemavailable': PMEM_AVAILABLE, 
         'nodecount': NODE_COUNT, 
         'logcount':LOG_COUNT
         }
 
-def getAggregation(name, local=False, minOnly=False, maxOnly=False):
+def emptyAggregator(cls, name):
+    """
+    Make an aggregator of class cls without running its constructor (which
+    would sample the local statistic). Used to hold received state.
+    """
+    agg = cls.__new__(cls)
+    agg._name = name
+    agg._statistic_function = None
+    return agg
+
+def fromWireState(name, state):
+    """
+    Rebuild an aggregator received over the wire. It takes the class of our
+    own statistic with the same name.
+    """
+    if name not in STATISTICS:
+        raise GeneralError("Unknown statistic " + name)
+    agg = emptyAggregator(STATISTICS[name].__class__, name)
+    agg.setWireState(state)
+    return agg
+
+def getDigest(agg):
     """
-    Get aggregation.
+    Short hash of the state of an aggregator that settles. Two nodes with
+    the same digest for a statistic have nothing to tell each other about
+    it. None if the aggregator has no such state.
     """
+    state = agg.getDigestState()
+    if state is None:
+        return None
+    return zlib.crc32(wire.pack(state)) & 0xffffffff
+
+def getDigests():
+    """
+    Digest of every statistic that has one, by name.
+    """
+    digests = {}
+    for name in STATISTICS:
+        digest = getDigest(STATISTICS[name])
+        if digest is not None:
+            digests[name] = digest
+    return digests
+
+def quantize(value):
+    """
+    A value to the relative accuracy of the quantile sketches, as
+    (sign, bucket), so estimates that agree that closely match.
+    """
+    if value is None:
+        return None
+    if abs(value) < sketch.MIN_VALUE:
+        return (0, 0)
+    accuracy = config.AGGREGATE_QUANTILE_ACCURACY
+    gamma = (1 + accuracy) / (1 - accuracy)
+    return (1 if value > 0 else -1,
+        int(math.ceil(math.log(abs(value)) / math.log(gamma))))
+
+def getAggregation(name, local=False, minOnly=False, maxOnly=False,
+    quantile=None):
+    """
+    Get aggregation. quantile (0 to 1) asks a quantile statistic for just
+    that quantile.
+    """
+    if quantile is not None and hasattr(STATISTICS[name], 'getQuantile'):
+        return STATISTICS[name].getQuantile(quantile)
     toReturn = STATISTICS[name].getStatistic()
     if local:
         return STATISTICS[name].getLocalValue()
@@ -552,7 +1554,55 @@ def getAggregation(name, local=False, minOnly=False, maxOnly=False):
 
 def refreshAll():
     """
-    Refresh all the statistics.
+    Refresh all the statistics. Flows to nodes that left are dropped.
     """
     for name in STATISTICS:
-        STATISTICS[name].refresh()
\ No newline at end of file
+        STATISTICS[name].refresh()
+    for (name, part, agg) in getFlowAggregators():
+        agg.getFlow().prune(connections.universe)
+
+def currentEpoch():
+    """
+    Push-flow epoch: wall clock time in AGGREGATE_EPOCH_SECONDS steps, so
+    nodes restart together. 0 forever if epochs are off.
+    """
+    if config.AGGREGATE_EPOCH_SECONDS <= 0:
+        return 0
+    return int(time.time() // config.AGGREGATE_EPOCH_SECONDS)
+
+def countOne():
+    """
+    Each node counts once.
+    """
+    return 1
+
+def getFlowAggregators():
+    """
+    (statistic name, part, aggregator) for every push-flow aggregate: the
+    averages, sums and counts.
+    """
+    flowAggregators = []
+    for name in STATISTICS:
+        for (part, agg) in STATISTICS[name].getFlowAggregators():
+            flowAggregators.append((name, part, agg))
+    return flowAggregators
+
+def getFlows(uid, fraction=0.5):
+    """
+    Move fraction of every push-flow aggregate's mass to node uid.
+    Returns (name, part, epoch, sum flow, weight flow, estimate[, leader])
+    for each, to send it.
+    """
+    return [(name, part) + agg.getFlow().flowTo(uid, fraction)
+        for (name, part, agg) in getFlowAggregators()]
+
+def receiveFlows(uid, flows):
+    """
+    Take the flows node uid sent, as produced by getFlows().
+    """
+    flowAggregators = dict(((name, part), agg)
+        for (name, part, agg) in getFlowAggregators())
+    for flow in flows:
+        agg = flowAggregators.get((flow[0], flow[1]))
+        if agg is not None:
+            agg.getFlow().receiveFlow(uid, *flow[2:])
\ No newline at end of file
@@ -47,9 +47,170 @@ Provider choices:
 'RabbitMQ' | 'SQS'
 """
 
+MEMBERSHIP_PROVIDER = "simpledb"
+"""
+simpledb | swim
+simpledb polls the member list in SimpleDB. swim runs the SWIM protocol
+between the nodes themselves, joining through SWIM_SEEDS.
+"""
+
+SWIM_SEEDS = []
+"""
+"host:port" of nodes to join the cluster through (swim only).
+"""
+
+SWIM_PROBE_INTERVAL = 1.0
+SWIM_PROBE_TIMEOUT = 0.3
+SWIM_INDIRECT_PROBES = 3
+SWIM_SUSPECT_MULTIPLIER = 5
+SWIM_RETRANSMIT_MULTIPLIER = 3
+SWIM_MAX_PIGGYBACK = 8
+SWIM_DEAD_MEMORY_SECONDS = 600
+"""
+SWIM protocol period and direct ack timeout (seconds), members asked
+to probe indirectly, suspicion timeout (multiplier * log N periods),
+retransmissions per update (multiplier * log N), updates per message,
+and how long dead members are remembered.
+"""
+
+GOSSIP_WAIT_MIN_FRACTION = 0.25
+GOSSIP_WAIT_MAX_FRACTION = 2.0
+GOSSIP_WAIT_JITTER = 0.2
+GOSSIP_WAIT_GROWTH = 1.25
+"""
+Gossip rounds start GOSSIP_WAIT_SECONDS apart. The interval halves (down
+to MIN_FRACTION of it) while messages are queued or membership changed,
+and grows by GROWTH each quiet round (up to MAX_FRACTION of it). Every
+interval is scaled by a random factor in 1 +/- JITTER.
+"""
+
 GOSSIP_NEIGHBOR_STRATEGY = "default"
 """
-default | random | all | single | logarithmic | constant
+default | random | all | single | logarithmic | constant | proximity
+"""
+
+GOSSIP_NEIGHBOR_COUNT = 3
+"""
+How many neighbors the constant strategy keeps.
+"""
+
+GOSSIP_NEIGHBOR_ROTATE_ROUNDS = 10
+"""
+The logarithmic and constant strategies keep their neighbors (and the
+connections to them) across rounds, swapping one out this often.
+"""
+
+CONNECTION_MAX_OPEN = 64
+"""
+Most gossip connections (open or being opened) at once.
+"""
+
+CONNECTION_IDLE_SECONDS = 120
+"""
+Close a connection with no traffic either way for this long.
+"""
+
+CONNECTION_BACKOFF_INITIAL_SECONDS = 1
+CONNECTION_BACKOFF_MAX_SECONDS = 60
+CONNECTION_BACKOFF_JITTER = 0.5
+"""
+After a failed connect, wait initial * 2^(failures-1) seconds (at most
+max), scaled by a random factor in 1 +/- jitter, before trying that node
+again.
+"""
+
+SEND_BUFFER_HIGH_WATER = 256 * 1024
+"""
+Bytes buffered for a peer before sends to it are held back (the low
+water mark is an empty buffer, when Twisted resumes the producer).
+Meanwhile the newest gossip batch waits and other messages are dropped.
+"""
+
+PROXIMITY_RTT_ALPHA = 0.125
+"""
+Weight of a new round trip sample in a node's smoothed RTT.
+"""
+
+PROXIMITY_RANDOM_FRACTION = 0.25
+"""
+Share of the proximity strategy's neighbors picked at random rather than
+by lowest RTT.
+"""
+
+GOSSIP_MODE = "push"
+"""
+push | pushpull
+push sends the full vector clock and every aggregate each round.
+pushpull sends a digest (vector clock and a hash per aggregate) and the
+peer replies with only what is missing or stale, then asks for the same.
+"""
+
+VECTOR_CLOCK_DELTAS = True
+VECTOR_CLOCK_FULL_SYNC_ROUNDS = 10
+"""
+Send each neighbor only the vector clock entries that changed since the
+last message to it. Every this many messages the whole clock is sent
+instead, in case a delta was lost.
+"""
+
+VECTOR_CLOCK_GC_INTERVAL = 60
+VECTOR_CLOCK_GC_GRACE_SECONDS = 300
+VECTOR_CLOCK_RETIRED_SECONDS = 3600
+"""
+Clock entries of dead nodes are pruned once they have been dead for the
+grace period and every live peer has acknowledged the tombstone. Pruned
+uids are ignored for the retired period so stale messages can't bring
+them back. The collector runs every GC_INTERVAL seconds.
+"""
+
+FAILURE_DETECTOR_SUSPECT_PHI = 5.0
+FAILURE_DETECTOR_DEAD_PHI = 8.0
+FAILURE_DETECTOR_WINDOW = 100
+FAILURE_DETECTOR_MIN_STD_SECONDS = 0.5
+FAILURE_DETECTOR_PAUSE_SECONDS = 3
+FAILURE_DETECTOR_FIRST_HEARTBEAT_SECONDS = DEFAULT_GOSSIP_WAIT_SECONDS
+FAILURE_DETECTOR_MIN_INTERVAL_SECONDS = 0.5
+FAILURE_DETECTOR_INTERVAL = 1
+"""
+Phi-accrual failure detector. A node is suspect once phi passes
+SUSPECT_PHI and declared dead once it passes DEAD_PHI (phi 8 means a
+1 in 10^8 chance the silence is normal). Heartbeat intervals are kept
+over a window; the standard deviation never drops below MIN_STD and
+PAUSE seconds of extra silence are tolerated. Heartbeats closer than
+MIN_INTERVAL count as one. Checked every INTERVAL seconds.
+"""
+
+MESSAGE_CODEC = "binary"
+"""
+Wire format for messages. Must match across the cluster.
+binary | pickle
+"""
+
+FRAME_MAX_LENGTH = 16 * 1024 * 1024
+"""
+Largest frame (in bytes) accepted on a gossip connection. Anything
+bigger is treated as a corrupt stream and the connection is dropped.
+"""
+
+GOSSIP_TRANSPORT = "tcp"
+"""
+tcp | udp
+udp sends gossip rounds and SWIM probes as datagrams from one socket on
+the receive port, packed up to UDP_MTU bytes. Bigger messages still go
+over TCP.
+"""
+
+UDP_MTU = 1400
+"""
+Largest datagram sent, in bytes. Stays under a 1500 byte Ethernet MTU
+after IP and UDP headers.
+"""
+
+GOSSIP_QUEUE_MAX_ITEMS = 5000
+GOSSIP_ROUND_BYTES = 256 * 1024
+"""
+Most messages waiting to be gossiped, and how many bytes of them one
+round sends. The rest wait for the next round.
 """
 
 GOSSIPTTL = 10
@@ -59,10 +220,74 @@ a message doesn't get stuck in system.
 Messages will be destroyed once they hit 0.
 """
 
-AGGREGATE_AVERAGE_REFRESH_MIN = 5
-AGGREGATE_AVERAGE_REFRESH_MAX = 10
+GOSSIP_DISSEMINATION = "flood"
+"""
+flood | rumor
+flood passes every network event on for GOSSIPTTL hops. rumor scales the
+hop count to the cluster (RUMOR_TTL_LAMBDA * log N), sends each event for
+up to RUMOR_ROUNDS_LAMBDA * log N rounds, stops once it has come back
+RUMOR_FEEDBACK_LIMIT times, and pulls missed events from a neighbor.
+"""
+
+RUMOR_TTL_LAMBDA = 2.0
+RUMOR_ROUNDS_LAMBDA = 1.0
+RUMOR_FEEDBACK_LIMIT = 2
+"""
+Hop count and rounds a rumor is sent for, as multiples of log N, and how
+many duplicates make a node stop spreading it.
+"""
+
+RUMOR_PULL_ROUNDS = 5
+RUMOR_RETAIN_SECONDS = 60
+RUMOR_MAX = 1000
+"""
+Every this many rounds one neighbor is sent the ids of the rumors this
+node knows and replies with the ones it's missing. Rumors are kept for
+answering pulls this long, at most RUMOR_MAX of them.
+"""
+
+DEDUP_CACHE_SIZE = 10000
+DEDUP_CACHE_EXPIRY_SECONDS = 120
+"""
+Seen-message cache for gossiped network events. At most this many
+message ids are remembered, each for up to this many seconds.
+"""
+
+AGGREGATE_EPOCH_SECONDS = 3600
+AGGREGATE_EPOCH_WARMUP = 10
+"""
+Averages are computed by push-flow, which restarts from the local values
+every EPOCH_SECONDS (by wall clock, 0 to never restart). The previous
+epoch's average is reported until the new one has had WARMUP exchanges.
+Distinct counts restart on the same epochs.
+"""
+
+AGGREGATE_HLL_PRECISION = 9
+"""
+Distinct counts use 2^PRECISION one byte HyperLogLog registers (512
+bytes at 9), for a standard error of 1.04 / sqrt(2^PRECISION), about 5%.
+Counts up to about 2.5 * 2^PRECISION are close to exact.
+"""
+
+AGGREGATE_QUANTILES = [0.5, 0.95, 0.99]
+AGGREGATE_QUANTILE_ACCURACY = 0.01
+AGGREGATE_QUANTILE_MAX_BUCKETS = 512
+AGGREGATE_QUANTILE_DECAY = 0.1
+"""
+Quantile statistics report these quantiles from a DDSketch accurate to
+ACCURACY relative error, spanning at most MAX_BUCKETS buckets (the
+smallest values are folded together beyond that). Each refresh fades the
+sketch by DECAY and adds the local reading with that weight, so it
+follows recent readings.
+"""
+
+AGGREGATE_WINDOW_SECONDS = 300
+AGGREGATE_WINDOW_BUCKET_SECONDS = 30
 """
-When to refresh from the local node.
+Default window of the windowed aggregators and the length of each of
+its buckets (by wall clock). Readings older than the window are dropped
+a bucket at a time. stats_init can set the window and a half life per
+statistic.
 """
 
 STATS_REFRESH_INTERVAL = 5
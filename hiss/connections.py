@@ -14,6 +14,7 @@ import random
 import sys
 import traceback
 import math
+import time
 
 # External Library Imports
 import twisted.internet.tcp
@@ -23,9 +24,15 @@ import zope.interface
 
 # Local Imports
 import config
+import framing
 import gossip
+import me
 import message
 import nodes
+import vector_clock
+import failure_detector
+import swim
+import proximity
 import membership
 import neighbors
 from debug import debug
@@ -39,17 +46,41 @@ class HissConnection(object):
     use composition instead of inheritence.
     """
 
-    zope.interface.implements(twisted.internet.interfaces.ITCPTransport)
+    zope.interface.implements(twisted.internet.interfaces.ITCPTransport,
+        twisted.internet.interfaces.IPushProducer)
     """
-    Implements all the TCPTransport methods.
+    Implements all the TCPTransport methods. It is also registered as the
+    transport's producer, so the transport pauses it once its write
+    buffer passes the high water mark and resumes it when drained. While
+    paused, batch frames are coalesced (the newest one waits) and
+    everything else is dropped; gossip repeats itself anyway.
     """
 
-    def __init__(self, parentNode, client):
+    def __init__(self, parentNode, client, outbound=False):
         """
         Constructor
         """
         self._client = client
         self._parentNode = parentNode
+        self._outbound = outbound
+        self._paused = False
+        self._pending = {}
+        if getattr(client, "registerProducer", None) is not None \
+            and getattr(client, "producer", None) is None:
+            client.bufferSize = config.SEND_BUFFER_HIGH_WATER
+            client.registerProducer(self, True)
+
+    def getTransport(self):
+        """
+        Get the wrapped twisted transport.
+        """
+        return self._client
+
+    def isOutbound(self):
+        """
+        Whether this node opened the connection.
+        """
+        return self._outbound
 
     @classmethod
     def fromPrimitives(
@@ -71,29 +102,43 @@ class HissConnection(object):
                 host, port, bindAddress, connector, reactor)
         return cls(parentNode, client)
 
-    def loseWriteConnection():
+    def loseWriteConnection(self):
         self._client.loseWriteConnection()
-    def abortConnection():
+    def abortConnection(self):
         self._client.abortConnection()
-    def getTcpNoDelay():
+    def getTcpNoDelay(self):
         return self._client.getTcpNoDelay()
-    def setTcpNoDelay(enabled):
+    def setTcpNoDelay(self, enabled):
         self._client.setTcpNoDelay(enabled)
-    def getTcpKeepAlive():
+    def getTcpKeepAlive(self):
         return self._client.getTcpKeepAlive()
-    def setTcpKeepAlive(enabled):
+    def setTcpKeepAlive(self, enabled):
         return self._client.setTcpKeepAlive(enabled)
-    def getHost():
+    def getHost(self):
         return self._client.getHost()
-    def getPeer():
+    def getPeer(self):
         return self._client.getPeer()
-    def write(data):
+    def write(self, data):
         self._client.write(data)
-    def writeSequence(data):
+    def writeSequence(self, data):
         self._client.writeSequence(data)
-    def loseConnection():
-        self._client.loseConnection
-
+    def loseConnection(self):
+        """
+        Close the connection. We stop being the transport's producer
+        first, or a resume with nothing to write would keep it from ever
+        closing. A peer still backed up is aborted, so a stalled write
+        buffer can't keep the socket open.
+        """
+        paused = self._paused
+        self._paused = True
+        self._pending = {}
+        if getattr(self._client, "producer", None) is self:
+            self._client.unregisterProducer()
+        if paused and getattr(self._client, "abortConnection", None) \
+            is not None:
+            self._client.abortConnection()
+        else:
+            self._client.loseConnection()
 
     def connectionLost(self, reason):
         """
@@ -102,17 +147,97 @@ class HissConnection(object):
         super.connectionLost()
         _parentNode.destroyTCPConnection()
 
+    def pauseProducing(self):
+        """
+        The peer's write buffer is above the high water mark.
+        """
+        if not self._paused:
+            self._paused = True
+            pool.countPaused(self._parentNode.getUid())
+            debug("Backing off [ " + self._parentNode.getShortUid() \
+                + " ], write buffer full", info=True, threshold=1)
+
+    def resumeProducing(self):
+        """
+        The write buffer drained. Send what was coalesced meanwhile.
+        """
+        self._paused = False
+        pending = self._pending
+        self._pending = {}
+        for data in pending.values():
+            self._write(data)
+
+    def stopProducing(self):
+        """
+        The connection is going away.
+        """
+        self._paused = True
+        self._pending = {}
+
+    def isPaused(self):
+        """
+        Whether sends to this peer are being held back.
+        """
+        return self._paused
+
+    def _held(self, data, key):
+        """
+        Hold back a frame while paused: keep the newest one per key, drop
+        anything without a key. The peer's next vector clock message is
+        then a full one, since a delta may have gone with it.
+        """
+        uid = self._parentNode.getUid()
+        if key is None:
+            pool.countDropped(uid)
+        else:
+            if key in self._pending:
+                pool.countCoalesced(uid)
+            self._pending[key] = data
+        me.getMe().getVectorClock().forgetPeer(uid)
+
+    def _write(self, data):
+        """
+        Write one frame. data is a string or a list of strings that make
+        up the frame, which are written without joining them.
+        """
+        if isinstance(data, list):
+            self._client.writeSequence(
+                [framing.frameHeader(sum(map(len, data)))] + data)
+        else:
+            self._client.writeSequence([framing.frameHeader(len(data)), data])
+        pool.touch(self._parentNode.getUid())
+
     def dispatchMessage(self, msg):
         """
         wrapper for super.write(). Add some sanity checking and debugging.
+        Dropped while the peer is backed up.
         """
         try:
-            self._client.write(msg.getSerialized())
+            if self._paused:
+                self._held(None, None)
+                return
+            self._write(msg.getSerialized())
         except:
             debug("Connection failed to write msg: " + msg.getCode(), 
                 error=True)
             traceback.print_exc(file=sys.stdout)
 
+    def dispatchFrame(self, data, key=None):
+        """
+        Write data that is already serialized as a single frame (a string,
+        or a list of strings). Lets one encoded batch be shared by every
+        neighbor in a round. While the peer is backed up, frames with the
+        same key replace each other.
+        """
+        try:
+            if self._paused:
+                self._held(data, key)
+                return
+            self._write(data)
+        except:
+            debug("Connection failed to write frame", error=True)
+            traceback.print_exc(file=sys.stdout)
+
 
 class HissTCPClientConnection(twisted.internet.tcp.Client):
     """
@@ -150,13 +275,236 @@ class HissTCPClientConnection(twisted.internet.tcp.Client):
         wrapper for super.write(). Add some sanity checking and debugging.
         """
         try:
-            self.write(msg.getSerialized())
+            data = msg.getSerialized()
+            self.writeSequence([framing.frameHeader(len(data)), data])
         except:
             debug("Connection failed to write msg: " + msg.getCode(), 
                 error=True)
             traceback.print_exc(file=sys.stdout)
 
 
+class ConnectionPool(object):
+    """
+    Manages outbound connections. At most one live connection per peer
+    (an inbound one counts, and is used for sending too). A failed
+    connect backs off exponentially, with jitter, before that peer is
+    tried again. The number of open connections is capped, and ones that
+    have been idle too long are closed.
+    """
+
+    def __init__(self, maxOpen=None, idleSeconds=None, backoffInitial=None,
+        backoffMax=None, jitter=None):
+        """
+        Constructor
+        """
+        if maxOpen is None:
+            maxOpen = config.CONNECTION_MAX_OPEN
+        if idleSeconds is None:
+            idleSeconds = config.CONNECTION_IDLE_SECONDS
+        if backoffInitial is None:
+            backoffInitial = config.CONNECTION_BACKOFF_INITIAL_SECONDS
+        if backoffMax is None:
+            backoffMax = config.CONNECTION_BACKOFF_MAX_SECONDS
+        if jitter is None:
+            jitter = config.CONNECTION_BACKOFF_JITTER
+        self._maxOpen = maxOpen
+        self._idleSeconds = idleSeconds
+        self._backoffInitial = backoffInitial
+        self._backoffMax = backoffMax
+        self._jitter = jitter
+
+        self._open = set([])
+        self._pending = {}
+        self._failures = {}
+        self._retryAt = {}
+        self._lastUsed = {}
+        self._backpressure = {}
+
+        self.connects = 0
+        self.failed = 0
+        self.refused = 0
+        self.reaped = 0
+
+    def connect(self, uid, now=None):
+        """
+        Start connecting to a node unless it's connected, already
+        connecting, backing off, or the pool is full. Returns whether a
+        connect was started.
+        """
+        if now is None:
+            now = time.time()
+        node = universe.get(uid)
+        if node is None or node is me.getMe() or node.hasTCPConnection() \
+            or uid in self._pending or now < self._retryAt.get(uid, 0):
+            return False
+        if len(self._open) + len(self._pending) >= self._maxOpen \
+            and not self._evict(now):
+            self.refused += 1
+            return False
+        self._pending[uid] = now
+        self.connects += 1
+        node.openTCPConnection()
+        return True
+
+    def isConnecting(self, uid):
+        """
+        Whether a connect to this node is in progress.
+        """
+        return uid in self._pending
+
+    def connected(self, uid, now=None):
+        """
+        A connect to this node succeeded.
+        """
+        self._pending.pop(uid, None)
+        self._failures.pop(uid, None)
+        self._retryAt.pop(uid, None)
+        self.touch(uid, now)
+
+    def connectFailed(self, uid, now=None):
+        """
+        A connect to this node failed or was lost before it was used.
+        Back off before trying it again.
+        """
+        if now is None:
+            now = time.time()
+        self._pending.pop(uid, None)
+        failures = self._failures.get(uid, 0) + 1
+        self._failures[uid] = failures
+        delay = min(self._backoffMax,
+            self._backoffInitial * (2 ** (failures - 1)))
+        delay *= random.uniform(1 - self._jitter, 1 + self._jitter)
+        self._retryAt[uid] = now + delay
+        self.failed += 1
+
+    def getRetryAt(self, uid):
+        """
+        Earliest time this node may be connected to again.
+        """
+        return self._retryAt.get(uid, 0)
+
+    def attached(self, uid, now=None):
+        """
+        A connection was attached to this node.
+        """
+        self._open.add(uid)
+        self._pending.pop(uid, None)
+        self.touch(uid, now)
+
+    def detached(self, uid):
+        """
+        This node's connection went away.
+        """
+        self._open.discard(uid)
+        self._lastUsed.pop(uid, None)
+
+    def touch(self, uid, now=None):
+        """
+        Traffic went over this node's connection.
+        """
+        self._lastUsed[uid] = now if now is not None else time.time()
+
+    def forget(self, uid):
+        """
+        Drop everything known about a node that left the universe.
+        """
+        self._open.discard(uid)
+        self._pending.pop(uid, None)
+        self._failures.pop(uid, None)
+        self._retryAt.pop(uid, None)
+        self._lastUsed.pop(uid, None)
+        self._backpressure.pop(uid, None)
+
+    def _countersOf(self, uid):
+        """
+        Backpressure counters of a peer: [paused, dropped, coalesced].
+        """
+        counters = self._backpressure.get(uid)
+        if counters is None:
+            counters = self._backpressure[uid] = [0, 0, 0]
+        return counters
+
+    def countPaused(self, uid):
+        """
+        The peer's write buffer filled up.
+        """
+        self._countersOf(uid)[0] += 1
+
+    def countDropped(self, uid):
+        """
+        A message to a backed up peer was dropped.
+        """
+        self._countersOf(uid)[1] += 1
+
+    def countCoalesced(self, uid):
+        """
+        A frame to a backed up peer replaced an older one.
+        """
+        self._countersOf(uid)[2] += 1
+
+    def getBackpressure(self, uid):
+        """
+        Backpressure counters of a peer.
+        """
+        (paused, dropped, coalesced) = self._backpressure.get(uid, (0, 0, 0))
+        return {"paused": paused, "dropped": dropped, "coalesced": coalesced}
+
+    def getOpenCount(self):
+        """
+        Number of attached connections.
+        """
+        return len(self._open)
+
+    def _close(self, uid):
+        """
+        Close a node's connection.
+        """
+        node = universe.get(uid)
+        if node is not None and node is not me.getMe():
+            debug("Closing idle connection to [ " + node.getShortUid() \
+                + " ]", info=True, threshold=1)
+            node.destroyTCPConnection()
+        self.detached(uid)
+
+    def _evict(self, now):
+        """
+        Make room by closing the least recently used connection, if it
+        has been quiet for a gossip round.
+        """
+        if not self._open:
+            return False
+        uid = min(self._open, key=lambda uid: self._lastUsed.get(uid, 0))
+        if now - self._lastUsed.get(uid, 0) < config.GOSSIP_WAIT_SECONDS:
+            return False
+        self._close(uid)
+        self.reaped += 1
+        return True
+
+    def reapIdle(self, now=None):
+        """
+        Close connections idle for longer than the timeout. Returns the
+        uids closed.
+        """
+        if now is None:
+            now = time.time()
+        idle = [uid for uid in self._open
+            if now - self._lastUsed.get(uid, 0) > self._idleSeconds]
+        for uid in idle:
+            self._close(uid)
+        self.reaped += len(idle)
+        return idle
+
+    def getStatistics(self):
+        """
+        Counters for the status page.
+        """
+        return {"open": len(self._open), "pending": len(self._pending),
+            "backingOff": len(self._retryAt), "connects": self.connects,
+            "failed": self.failed, "refused": self.refused,
+            "reaped": self.reaped,
+            "dropped": sum(c[1] for c in self._backpressure.values()),
+            "coalesced": sum(c[2] for c in self._backpressure.values())}
+
 ### Variables ################################################################
 
 universe = {}
@@ -170,11 +518,36 @@ knownDead = set([])
 UIDs known to be dead.
 """
 
+addresses = {}
+"""
+(ip, port) -> UID for every node in the universe.
+"""
+
+transports = {}
+"""
+Transport -> UID for every connection assigned to a node.
+"""
+
+nodeTransports = {}
+"""
+UID -> set of transports, so removing a node can clean up transports.
+"""
+
+membershipChanges = 0
+"""
+Count of nodes added to or removed from the universe.
+"""
+
 neighborStrategy = None
 """
 Neighbor Strategy
 """
 
+pool = ConnectionPool()
+"""
+Outbound connection manager.
+"""
+
 ### Functions ################################################################
 
 def init():
@@ -194,6 +567,9 @@ def init():
     neighborStrategy = neighbors.neighborStrategyFactory(
         config.GOSSIP_NEIGHBOR_STRATEGY)
 
+    if config.MEMBERSHIP_PROVIDER == "swim":
+        swim.init()
+
 def maintainMembers():
     """
     use the membersrefresh operation to maintain
@@ -212,30 +588,100 @@ def maintainMembers():
     tempUniverse = membership.getCurrentMemberDict()
     for uid in tempUniverse:
         if uid not in universe and not me.getMe().__eq__(tempUniverse[uid]):
-            universe[uid] = nodes.ExternalNode.fromBase(tempUniverse[uid])
+            addNode(nodes.ExternalNode.fromBase(tempUniverse[uid]))
         if uid in possibledead:
             possibledead.remove(uid)
 
-    # Remove dead nodes
+    # Remove dead nodes. Missing from the member list isn't enough on its
+    # own; the failure detector has to agree.
     for dead in possibledead:
-        deadNode(dead)
+        if failure_detector.isSuspect(dead):
+            deadNode(dead)
 
     # should I add me in here? not sure.
-    universe[me.getMe().getUid()] = me.getMe()
+    addNode(me.getMe())
 
     debug("has a universe of size: " + str(len(universe)), info=True)
 
+def addNode(node):
+    """
+    Add a node to the universe and the address index.
+    """
+    global membershipChanges
+    uid = node.getUid()
+    old = universe.get(uid)
+    if old is not None and addresses.get(
+        (old.getIp(), old.getPort())) == uid:
+        del addresses[(old.getIp(), old.getPort())]
+    universe[uid] = node
+    addresses[(node.getIp(), node.getPort())] = uid
+    if neighborStrategy:
+        neighborStrategy.nodeAdded(uid)
+    if old is None:
+        membershipChanges += 1
+
+def removeNode(uid):
+    """
+    Remove a node from the universe and every index. Returns the node,
+    or None if it wasn't there.
+    """
+    global membershipChanges
+    node = universe.pop(uid, None)
+    if node is not None:
+        address = (node.getIp(), node.getPort())
+        if addresses.get(address) == uid:
+            del addresses[address]
+    for transport in nodeTransports.pop(uid, ()):
+        transports.pop(transport, None)
+    if neighborStrategy:
+        neighborStrategy.nodeRemoved(uid)
+    if node is not None:
+        membershipChanges += 1
+    pool.forget(uid)
+    return node
+
+def indexTransport(uid, transport):
+    """
+    Remember which node a transport belongs to.
+    """
+    previous = transports.get(transport)
+    if previous is not None and previous != uid:
+        nodeTransports.get(previous, set([])).discard(transport)
+    transports[transport] = uid
+    nodeTransports.setdefault(uid, set([])).add(transport)
+
+def forgetTransport(transport):
+    """
+    Drop a transport from the index. Returns the uid it belonged to.
+    """
+    uid = transports.pop(transport, None)
+    if uid is not None:
+        nodeTransports.get(uid, set([])).discard(transport)
+    return uid
+
 def lookupNode(uid):
     """
     Find a neighbor in the neighbor dict.
     """
     return universe[uid]
 
+def lookupByAddress(ip, port):
+    """
+    Find the uid of the node listening at (ip, port), or None.
+    """
+    return addresses.get((ip, port))
+
+def lookupByTransport(transport):
+    """
+    Find the uid of the node a transport belongs to, or None.
+    """
+    return transports.get(transport)
+
 def isNeighbor(uid):
     """
     Is the id a neighbor of this node?
     """
-    return neighborStrategy.isNeighbor()
+    return neighborStrategy.isNeighbor(uid)
 
 def removeNeighbor(uid):
     """
@@ -258,19 +704,21 @@ def getNeighbors():
 
     return neighborStrategy.getNeighbors()
 
+def newGossipRound():
+    """
+    Start a gossip round; neighbors are chosen once per round.
+    """
+    if neighborStrategy:
+        neighborStrategy.newRound()
+
 def connectToNeighbors():
     """
     Make sure there's a client connection to all our neighbors
     """
     madeConnection = False
     for uid in getNeighbors():
-        externalnode = lookupNode(uid)
-        if not externalnode.hasTCPConnection():
-            #debug("opening a client connection", info=True)
-            externalnode.openTCPConnection()
+        if pool.connect(uid):
             madeConnection = True
-        else:
-            pass #all good.
     return madeConnection
 
 def openConnection(host, port):
@@ -287,36 +735,69 @@ def clientConnectionMade(client):
     local system we cannot grap IP addresses
     """
     #debug("connections.py: Connection has been made?", info=True)
-    pass
+    peer = client.getPeer()
+    uid = lookupByAddress(peer.host, peer.port)
+    if uid:
+        proximity.connectFinished(uid)
+        pool.connected(uid)
 
 def createNode(uid, ip, port=None):
-    create = Node(ip, port, uid)
-    universe[create.getUid()] = create
-    knownalive.add(uid)
+    """
+    Add a node to the universe. uid is a uuid object.
+    """
+    create = nodes.ExternalNode(ip, port, uid)
+    addNode(create)
+    knownDead.discard(create.getUid())
     return create
 
-def clientConnectionLost((host, port)):
+def clientConnectionLost(transport):
     """
-    Called when a connection is lost. Not sure how to use this yet.
+    Called when a client (outbound) connection is lost. Only detaches
+    the node's connection if it was this one; a connection lost before
+    the handshake counts as a failed connect.
     """
     debug("connections.py: Connection has been lost?", info=True)
+    if lookupByTransport(transport) is not None:
+        lostTransport(transport)
+    else:
+        peer = transport.getPeer()
+        lost = lookupByAddress(peer.host, peer.port)
+        if lost and pool.isConnecting(lost):
+            pool.connectFailed(lost)
+
+def _preferred(uid, outbound):
     """
-    Remove the connection from the node.
+    When both nodes connect to each other at once, both keep the
+    connection opened by the lower uid and close the other.
     """
-    todelete = None
-    for uid in universe:
-        if universe[uid].getPort() == port and universe[uid].getIp() == host:
-            todelete = uid
-            break
-    if todelete:
-        deadNode(todelete)
+    if outbound:
+        return me.getUid() < uid
+    return uid < me.getUid()
 
-def assignTransport(uid, transport):
+def assignTransport(uid, transport, outbound=False):
     """
-    Assign a transport to a given UID.
+    Assign a transport to a given UID. If the node already has a live
+    connection, only one of the two is kept.
     """
     try:
-        lookupNode(uid).setTCPConnection(transport)
+        node = lookupNode(uid)
+        if node is me.getMe():
+            return
+        if node.hasTCPConnection():
+            current = node.getTCPConnection()
+            if current.getTransport() is transport:
+                return
+            if current.isOutbound() == outbound \
+                or not _preferred(uid, outbound):
+                debug("Closing duplicate connection to [ " \
+                    + node.getShortUid() + " ]", info=True, threshold=1)
+                forgetTransport(transport)
+                transport.loseConnection()
+                return
+            forgetTransport(current.getTransport())
+            node.destroyTCPConnection()
+        node.setTCPConnection(transport, outbound)
+        indexTransport(uid, transport)
     except KeyError as ke:
         pass
     except Exception as e:
@@ -327,20 +808,31 @@ def informAlive():
     Inform my peers I exist (for new nodes to system)
     """
     alivemessage = message.NewNodeMessage(
-        (me.getMe().getUidAsObject(), me.getMe().getPort()))
+        (me.getMe().getUidAsObject(), me.getMe().getIp(), 
+            me.getMe().getPort()))
     alivemessage.send()
     debug("Informing friends I am alive", info=True)
 
-def deadNodeByConnector(connector):
+def lostConnectionByConnector(connector):
+    """
+    A connection attempt failed. Find the node it was for.
+    """
     dest = connector.getDestination()
-    todelete = None
-    for uid in universe:
-        if universe[uid].getIp() == dest.host \
-            and universe[uid].getPort() == dest.port:
-            todelete = uid
-            break
-    if todelete:
-        deadNode(todelete)
+    lost = lookupByAddress(dest.host, dest.port)
+    if lost:
+        pool.connectFailed(lost)
+
+def lostConnection(uid):
+    """
+    Drop the connection to a node so the next gossip round reconnects.
+    A failed or lost connection alone doesn't make a node dead; that is
+    up to the failure detector.
+    """
+    node = universe.get(uid)
+    if node is not None and node is not me.getMe():
+        node.destroyTCPConnection()
+        debug("Lost connection to [ " + node.getShortUid() + " ], phi " \
+            + str(round(failure_detector.phi(uid), 1)), info=True)
 
 def deadNode(uid):
     """
@@ -348,53 +840,63 @@ def deadNode(uid):
     """
     global universe
     try:
-        lookupNode(uid).destroyTCPConnection()
-        neighborStrategy.removeNeighbor(uid)
-        del universe[uid]
-        deadMessage = message.DeadNodeMessage(uid)
-        deadMessage.send()
+        if uid in universe:
+            lookupNode(uid).destroyTCPConnection()
+            if neighborStrategy:
+                neighborStrategy.removeNeighbor(uid)
+            removeNode(uid)
+            gossip.gossipThis(message.DeadNodeMessage(uid))
     finally:
         knownDead.add(uid)
+        vector_clock.bury(uid)
         debug("Dead#"+uid, monitor=True)
     debug("removing dead node uid:" + uid, info=True)
 
 def foundClientAsServer(transport):
     """
-    When a TCP Connection is created.
-    Would work well on external nodes, but since EVERYTHING
-    has same IP we have no way to distinguish.
-    """
-
-    """
-    global universe
-    ip = transport.getPeer().host
-    for node in universe.values():
-        if node.getIp() == ip:
-            node.setTCPConnection(transport)
-            debug("set transport to" + ip, success=True)
-            return True
-    """
-    #### TODO: Create node.
-    #nodes.ExternalNode()
-    #debug("Node " + ip + "does not exist yet. Creating it", info=True)
-    return False
+    When a TCP Connection is created. Matches the transport, or the
+    peer's address, against the indexes. Inbound connections usually
+    come from an ephemeral port, so most are only matched once the
+    handshake frame arrives (assignTransport).
+    """
+    uid = lookupByTransport(transport)
+    if uid is None:
+        peer = transport.getPeer()
+        uid = lookupByAddress(peer.host, peer.port)
+    node = universe.get(uid)
+    if node is None or node is me.getMe():
+        return False
+    assignTransport(uid, transport)
+    debug("set transport to [ " + node.getShortUid() + " ]", success=True)
+    return True
 
 def lostClientAsServer(transport):
     """
     When a TCP Connection is lost.
     """
+    return lostTransport(transport)
+
+def lostTransport(transport):
+    """
+    A transport closed. Detach it from its node if it is the node's
+    current connection.
     """
-    global universe
+    uid = forgetTransport(transport)
+    node = universe.get(uid)
+    if node is None or node is me.getMe():
+        return False
+    if node.hasTCPConnection() \
+        and node.getTCPConnection().getTransport() is transport:
+        node.destroyTCPConnection()
+        debug("Lost connection with [ " + node.getShortUid() + " ]", 
+            info=True)
+    return True
 
-    ip = transport.getPeer().host
-    for node in universe.values():
-        if node.getIp() == ip:
-            node.destroyTCPConnection()
-            debug("Lost connection with " + ip, info=True)
-            return True
-    debug("Could not find connection with " + ip + " to lose", info=True)
+def reapIdle():
+    """
+    Close connections that have been idle too long.
     """
-    return False
+    return pool.reapIdle()
 
 def createVectorClockMessage():
     """
@@ -416,6 +918,9 @@ def globalReset():
     me = None
     while(len(universe)) > 0:
         deadNode(universe.keys()[0])
-    universe = {}
+    universe.clear()
+    addresses.clear()
+    transports.clear()
+    nodeTransports.clear()
     simpledb.deleteAll("members")
     init()
@@ -0,0 +1,153 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# dedup.py                                                                   #
+# Remembers which gossiped messages this node has already seen so that       #
+# duplicates can be dropped instead of re-flooded.                           #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import time
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+
+### Interfaces ###############################################################
+class ISeenCache(zope.interface.Interface):
+    """
+    Seen-message cache interface
+    """
+
+    def check(key):
+        """
+        Record key. Return True if it had already been seen.
+        """
+
+    def add(key):
+        """
+        Record key without counting a hit or miss.
+        """
+
+    def getStatistics():
+        """
+        Get the cache counters as a dictionary.
+        """
+
+### Classes ##################################################################
+class SeenCache(object):
+    """
+    Bounded set of recently seen keys, kept as two generations. New keys go
+    into the current generation; when it fills up (half the capacity) or
+    gets older than half the expiry, the previous generation is thrown
+    away and the current one takes its place. A key is therefore
+    remembered for somewhere between expiry/2 and expiry seconds, and the
+    cache never holds more than capacity keys.
+    """
+
+    zope.interface.implements(ISeenCache)
+
+    def __init__(self, capacity, expiry):
+        """
+        Constructor
+        """
+        self._capacity = max(2, capacity)
+        self._expiry = expiry
+        self._current = set([])
+        self._previous = set([])
+        self._rotated = None
+
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def _rotate(self, now):
+        """
+        Start a new generation if the current one is full or stale.
+        """
+        if self._rotated is None:
+            self._rotated = now
+        elif len(self._current) >= self._capacity // 2 \
+            or now - self._rotated >= self._expiry / 2.0:
+            self._previous = self._current
+            self._current = set([])
+            self._rotated = now
+            self.rotations += 1
+
+    def check(self, key, now=None):
+        """
+        Return True if key was seen recently (a duplicate). Otherwise
+        remember it and return False.
+        """
+        if now is None:
+            now = time.time()
+        self._rotate(now)
+        if key in self._current or key in self._previous:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._current.add(key)
+        return False
+
+    def add(self, key, now=None):
+        """
+        Remember a key, e.g. one this node originated.
+        """
+        if now is None:
+            now = time.time()
+        self._rotate(now)
+        self._current.add(key)
+
+    def __contains__(self, key):
+        return key in self._current or key in self._previous
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+    def getStatistics(self):
+        """
+        Get the counters as a dictionary.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'rotations': self.rotations,
+            'size': len(self),
+            'capacity': self._capacity,
+            }
+
+### Variables ################################################################
+seen = SeenCache(config.DEDUP_CACHE_SIZE, config.DEDUP_CACHE_EXPIRY_SECONDS)
+"""
+Ids of gossiped messages this node has already seen.
+"""
+
+### Functions ################################################################
+def isDuplicate(messageId):
+    """
+    Whether a gossiped message with this id was already seen. Records the
+    id as seen either way.
+    """
+    return seen.check(messageId)
+
+def markSeen(messageId):
+    """
+    Record a message id as seen without counting it.
+    """
+    seen.add(messageId)
+
+def getStatistics():
+    """
+    Get hit/miss counters for the seen-message cache.
+    """
+    return seen.getStatistics()
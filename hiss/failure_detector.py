@@ -0,0 +1,224 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# failure_detector.py                                                        #
+# Phi-accrual failure detection (Hayashibara et al.). Each external node     #
+# keeps a window of heartbeat inter-arrival times; phi measures how          #
+# unlikely the current silence is given that history. Heartbeats come from   #
+# gossip we already receive: frames from a peer, and a peer's entry          #
+# advancing in a vector clock someone else sent us.                          #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import time
+import math
+from collections import deque
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+import connections
+import nodes
+from debug import debug
+
+### Interfaces ###############################################################
+class IFailureDetector(zope.interface.Interface):
+    """
+    Failure detector interface
+    """
+
+    def heartbeat():
+        """
+        Record a sign of life
+        """
+
+    def phi():
+        """
+        Get the current suspicion level
+        """
+
+    def isAvailable():
+        """
+        Whether the node should be considered alive
+        """
+
+### Classes ##################################################################
+class PhiAccrualDetector(object):
+    """
+    Phi-accrual failure detector for one node. Inter-arrival times are
+    modelled as a normal distribution; phi = -log10(P(silence this long)).
+    Heartbeats closer together than minInterval count as one, so a burst
+    of frames doesn't drag the mean towards zero.
+    """
+
+    zope.interface.implements(IFailureDetector)
+
+    def __init__(self, windowSize=None, minStdDev=None, pause=None,
+        firstInterval=None, minInterval=None, now=None):
+        """
+        Constructor. The window starts with one estimated interval so phi
+        means something before the second real heartbeat.
+        """
+        if windowSize is None:
+            windowSize = config.FAILURE_DETECTOR_WINDOW
+        if minStdDev is None:
+            minStdDev = config.FAILURE_DETECTOR_MIN_STD_SECONDS
+        if pause is None:
+            pause = config.FAILURE_DETECTOR_PAUSE_SECONDS
+        if firstInterval is None:
+            firstInterval = config.FAILURE_DETECTOR_FIRST_HEARTBEAT_SECONDS
+        if minInterval is None:
+            minInterval = config.FAILURE_DETECTOR_MIN_INTERVAL_SECONDS
+        if now is None:
+            now = time.time()
+
+        self._minStdDev = minStdDev
+        self._pause = pause
+        self._minInterval = minInterval
+        self._intervals = deque([firstInterval], windowSize)
+        self._sum = float(firstInterval)
+        self._squares = float(firstInterval) ** 2
+        self._last = now
+
+    def heartbeat(self, now=None):
+        """
+        Record a heartbeat.
+        """
+        if now is None:
+            now = time.time()
+        interval = now - self._last
+        if interval < self._minInterval:
+            return
+        if len(self._intervals) == self._intervals.maxlen:
+            dropped = self._intervals[0]
+            self._sum -= dropped
+            self._squares -= dropped ** 2
+        self._intervals.append(interval)
+        self._sum += interval
+        self._squares += interval ** 2
+        self._last = now
+
+    def getMean(self):
+        """
+        Mean heartbeat interval in the window.
+        """
+        return self._sum / len(self._intervals)
+
+    def getStdDev(self):
+        """
+        Standard deviation of the interval, never below the minimum.
+        """
+        mean = self.getMean()
+        variance = self._squares / len(self._intervals) - mean ** 2
+        return max(self._minStdDev, math.sqrt(max(variance, 0.0)))
+
+    def getLastHeartbeat(self):
+        """
+        Time of the last heartbeat.
+        """
+        return self._last
+
+    def phi(self, now=None):
+        """
+        Suspicion level. Uses the logistic approximation of the normal CDF
+        (as in Akka), which is accurate enough. y is clamped to +/- 20
+        standard deviations so exp() can't overflow or underflow; phi is
+        about 0 below that and far past any threshold above it.
+        """
+        if now is None:
+            now = time.time()
+        elapsed = now - self._last
+        mean = self.getMean() + self._pause
+        y = min(max((elapsed - mean) / self.getStdDev(), -20.0), 20.0)
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if elapsed > mean:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def isAvailable(self, now=None):
+        """
+        Whether phi is still below the dead threshold.
+        """
+        return self.phi(now) < config.FAILURE_DETECTOR_DEAD_PHI
+
+### Functions ################################################################
+def _detectorFor(uid):
+    """
+    Get the failure detector of a known external node, or None.
+    """
+    node = connections.universe.get(uid)
+    if isinstance(node, nodes.ExternalNode):
+        return node.getFailureDetector()
+    return None
+
+def heartbeat(uid, now=None):
+    """
+    Record a sign of life from a node. Clears suspicion.
+    """
+    detector = _detectorFor(uid)
+    if detector is not None:
+        detector.heartbeat(now)
+        node = connections.universe[uid]
+        if node.isSuspect():
+            node.setSuspect(False)
+            debug("Node [ " + node.getShortUid() + " ] no longer suspect.",
+                info=True)
+
+def heartbeats(uids, now=None):
+    """
+    Record signs of life from several nodes.
+    """
+    for uid in uids:
+        heartbeat(uid, now)
+
+def phi(uid, now=None):
+    """
+    Current phi for a node. Zero for unknown nodes.
+    """
+    detector = _detectorFor(uid)
+    if detector is None:
+        return 0.0
+    return detector.phi(now)
+
+def isSuspect(uid, now=None):
+    """
+    Whether a node has passed the suspect threshold.
+    """
+    return phi(uid, now) >= config.FAILURE_DETECTOR_SUSPECT_PHI
+
+def checkAll(now=None):
+    """
+    Check every external node. Mark the ones past the suspect threshold
+    as suspect and declare the ones past the dead threshold dead.
+    Returns the uids declared dead.
+    """
+    if now is None:
+        now = time.time()
+    dead = []
+    for uid in connections.universe.keys():
+        node = connections.universe.get(uid)
+        if not isinstance(node, nodes.ExternalNode):
+            continue
+        level = node.getFailureDetector().phi(now)
+        if level >= config.FAILURE_DETECTOR_DEAD_PHI:
+            debug("Node [ " + node.getShortUid() + " ] phi " \
+                + str(round(level, 1)) + ", declaring dead.", error=True)
+            dead.append(uid)
+        elif level >= config.FAILURE_DETECTOR_SUSPECT_PHI \
+            and not node.isSuspect():
+            node.setSuspect(True)
+            debug("Node [ " + node.getShortUid() + " ] suspect, phi " \
+                + str(round(level, 1)), info=True)
+    for uid in dead:
+        connections.deadNode(uid)
+    return dead
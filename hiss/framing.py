@@ -0,0 +1,147 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# framing.py                                                                 #
+# Length-prefixed framing for the gossip stream. Every frame on the wire is  #
+# a 4 byte big-endian length followed by that many bytes of payload, the     #
+# same layout as twisted's Int32StringReceiver.                              #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import struct
+
+# External Library Imports
+import zope.interface
+from twisted.internet.protocol import Protocol
+
+# Local Imports
+import config
+from debug import debug
+
+### Constants ################################################################
+FRAME_HEADER = struct.Struct("!I")
+"""
+Frame prefix. Unsigned 32 bit length, network byte order.
+"""
+
+FRAME_HEADER_SIZE = FRAME_HEADER.size
+
+### Interfaces ###############################################################
+class IFrameReceiver(zope.interface.Interface):
+    """
+    Interface for protocols that receive length-prefixed frames.
+    """
+
+    def frameReceived(frame):
+        """
+        Called once for every complete frame read off the transport.
+        """
+
+    def sendFrame(data):
+        """
+        Write one frame to the transport.
+        """
+
+### Functions ################################################################
+def frame(data):
+    """
+    Prefix data with its length so it can go on the wire as a single frame.
+    """
+    return FRAME_HEADER.pack(len(data)) + data
+
+def frameHeader(length):
+    """
+    Get just the length prefix for a frame of the given size. Useful with
+    writeSequence() when the body is already split into several buffers.
+    """
+    return FRAME_HEADER.pack(length)
+
+### Classes ##################################################################
+class FrameReceiver(Protocol):
+    """
+    Stream protocol that reassembles length-prefixed frames.
+
+    Reads that end in the middle of a frame are parked as a list of chunks
+    and only joined once enough bytes have arrived for the frame that is
+    waiting, so a large frame split across many reads is copied once rather
+    than once per read. Complete frames are sliced straight out of the read
+    buffer by offset; the buffer itself is never re-sliced per frame.
+    """
+
+    zope.interface.implements(IFrameReceiver)
+
+    MAX_LENGTH = config.FRAME_MAX_LENGTH
+    """
+    Frames longer than this are treated as a protocol error.
+    """
+
+    _chunks = None
+    _buffered = 0
+    _needed = FRAME_HEADER_SIZE
+
+    def dataReceived(self, data):
+        """
+        Decode zero or more complete frames from the stream.
+        """
+        if self._chunks:
+            self._chunks.append(data)
+            self._buffered += len(data)
+            if self._buffered < self._needed:
+                return
+            data = "".join(self._chunks)
+            self._chunks = None
+            self._buffered = 0
+
+        offset = 0
+        end = len(data)
+        self._needed = FRAME_HEADER_SIZE
+        while end - offset >= FRAME_HEADER_SIZE:
+            (length,) = FRAME_HEADER.unpack_from(data, offset)
+            if length > self.MAX_LENGTH:
+                self.lengthLimitExceeded(length)
+                return
+            start = offset + FRAME_HEADER_SIZE
+            if end - start < length:
+                self._needed = FRAME_HEADER_SIZE + length
+                break
+            offset = start + length
+            self.frameReceived(data[start:offset])
+
+        if offset < end:
+            self._chunks = [data[offset:]]
+            self._buffered = end - offset
+
+    def frameReceived(self, frame):
+        """
+        Override in subclasses to handle a complete frame.
+        """
+        raise NotImplementedError
+
+    def sendFrame(self, data):
+        """
+        Send data as a single frame.
+        """
+        if len(data) > self.MAX_LENGTH:
+            debug("Refusing to send frame of " + str(len(data)) + " bytes",
+                error=True)
+            return
+        self.transport.writeSequence([frameHeader(len(data)), data])
+
+    def lengthLimitExceeded(self, length):
+        """
+        Called when a frame header announces more than MAX_LENGTH bytes.
+        The stream can't be resynchronized after that, so drop it.
+        """
+        debug("Frame of " + str(length) + " bytes exceeds limit. " \
+            + "Dropping connection.", error=True)
+        self._chunks = None
+        self._buffered = 0
+        self.transport.loseConnection()
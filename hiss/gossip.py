@@ -12,10 +12,6 @@
 import sys
 import traceback
 import random
-try:
-    from Queue import Queue, Empty
-except ImportError: #Hack for Python2to3
-    from queue import Queue, Empty
 
 # External Library Imports
 import zope.interface
@@ -25,7 +21,7 @@ from twisted.internet import task, reactor
 from twisted.internet.protocol import Factory
 from twisted.internet.protocol import Protocol
 from twisted.internet.protocol import ServerFactory
-from twisted.internet.protocol import ReconnectingClientFactory
+from twisted.internet.protocol import ClientFactory
 from twisted.python import components, log
 
 # Local Imports
@@ -34,8 +30,16 @@ import config
 import connections
 import message
 import aggregation
+import vector_clock
+import failure_detector
 import membership
+import swim
 import message_queue
+import framing
+import outbound
+import udp
+import rumor
+import pacing
 from hiss_exceptions import GeneralError, ConnectionError
 from debug import debug
 
@@ -45,7 +49,7 @@ APIS = {
     }
 
 ### Globals ##################################################################
-gossipqueue = Queue()
+gossipqueue = outbound.OutboundQueue()
 
 ### Interfaces ###############################################################
 class IGossipServerProtocol(zope.interface.Interface):
@@ -86,13 +90,16 @@ def getFoot():
 
 ### Classes ##################################################################
 
-class GossipServerProtocol(Protocol):
+class GossipServerProtocol(framing.FrameReceiver):
     """
-    Gossip server protocol
+    Gossip server protocol. The first frame in each direction is the
+    sender's UID; every frame after that is one serialized message.
     """
 
     zope.interface.implements(IGossipServerProtocol)
 
+    _peerUid = None
+
     def connectionMade(self):
         """
         Callback called once a connection is made with a client.
@@ -104,7 +111,7 @@ class GossipServerProtocol(Protocol):
         # Send a response
         #response = message.MeMessage()
         #response.send(self.transport)
-        self.transport.write(me.getUid())
+        self.sendFrame(me.getUid())
 
     def connectionLost(self, reason):
         """
@@ -114,26 +121,39 @@ class GossipServerProtocol(Protocol):
         """
         self.factory.clientConnectionLost(self, reason)
 
-    def dataReceived(self, data):
+    def frameReceived(self, data):
         """
-        When gossip data is received.
+        When a complete gossip frame is received.
         """
         debug("DATA RECEIVED BOOYAH!", success=True, threshold=1)
-        if len(data) == 32:
+        if self._peerUid is None:
+            self._peerUid = data
             connections.assignTransport(data, self.transport)
+            failure_detector.heartbeat(data)
         else:
+            failure_detector.heartbeat(self._peerUid)
+            connections.pool.touch(self._peerUid)
             try:
                 msg = message.buildMessage(data)
-                msg.respond() # just respond polymorphically.
+                if msg:
+                    message.receiveMessage(msg) # respond polymorphically.
             except:
-                debug(data, error=True)
+                debug("Could not handle frame of " + str(len(data)) \
+                    + " bytes", error=True)
+            # A peer we didn't know at handshake time may have introduced
+            # itself in that frame. Reply over this connection.
+            peer = connections.universe.get(self._peerUid)
+            if peer is not None and not peer.hasTCPConnection():
+                connections.assignTransport(self._peerUid, self.transport)
 
-class GossipClientProtocol(Protocol):
+class GossipClientProtocol(framing.FrameReceiver):
     """
     Gossip client protocol
     """
     zope.interface.implements(IGossipClientProtocol)
 
+    _peerUid = None
+
     def connectionMade(self):
         """
         Callback when a connection is made.
@@ -145,7 +165,9 @@ class GossipClientProtocol(Protocol):
         ### Send a message to respond.
         #response = message.MeMessage()
         #response.send(self.transport)
-        self.transport.write(me.getUid())
+        self.sendFrame(me.getUid())
+        if config.MEMBERSHIP_PROVIDER == "swim":
+            self.sendFrame(swim.greeting().getSerialized())
 
     def connectionLost(self, reason):
         """
@@ -153,23 +175,31 @@ class GossipClientProtocol(Protocol):
         """
         debug("Client Protocol connection lost", 
             error=True, threshold=2)
-        connections.clientConnectionLost(self.transport.addr)
+        if self._peerUid is not None:
+            me.getMe().getVectorClock().forgetPeer(self._peerUid)
+        connections.clientConnectionLost(self.transport)
 
 
-    def dataReceived(self, data):
+    def frameReceived(self, data):
         """
         Data received? this seems a little odd.
         """
         debug("Data received via client", 
             strange=True, threshold=1)
-        if len(data) == 32:
-            connections.assignTransport(data, self.transport)
+        if self._peerUid is None:
+            self._peerUid = data
+            connections.assignTransport(data, self.transport, True)
+            failure_detector.heartbeat(data)
         else:
+            failure_detector.heartbeat(self._peerUid)
+            connections.pool.touch(self._peerUid)
             try:
                 msg = message.buildMessage(data)
-                msg.respond()
+                if msg:
+                    message.receiveMessage(msg)
             except:
-                debug("data: " + data, error=True)
+                debug("Could not handle frame of " + str(len(data)) \
+                    + " bytes", error=True)
 
 
 class GossipServerFactory(ServerFactory):
@@ -188,13 +218,32 @@ class GossipServerFactory(ServerFactory):
         """
         Factory Constructor
         """
-        # We want to run members refresh every once in awhile
-        self.membersLoop = task.LoopingCall(connections.maintainMembers)
-        self.membersLoop.start(membership.getRandomWaitTimeSecs(), True)
+        if config.MEMBERSHIP_PROVIDER == "swim":
+            # SWIM probes one member per period and owns failure detection.
+            self.swimLoop = task.LoopingCall(swim.probe)
+            self.swimLoop.start(config.SWIM_PROBE_INTERVAL, False)
+            reactor.callWhenRunning(swim.join)
+        else:
+            # We want to run members refresh every once in awhile
+            self.membersLoop = task.LoopingCall(connections.maintainMembers)
+            self.membersLoop.start(membership.getRandomWaitTimeSecs(), True)
 
         self.aggregationLoop = task.LoopingCall(aggregation.refreshAll)
         self.aggregationLoop.start(config.STATS_REFRESH_INTERVAL, False)
 
+        # Declare nodes dead when the failure detector says so.
+        if config.MEMBERSHIP_PROVIDER != "swim":
+            self.failureLoop = task.LoopingCall(failure_detector.checkAll)
+            self.failureLoop.start(config.FAILURE_DETECTOR_INTERVAL, False)
+
+        # Prune clock entries of dead nodes once every peer knows.
+        self.clockGcLoop = task.LoopingCall(vector_clock.collectGarbage)
+        self.clockGcLoop.start(config.VECTOR_CLOCK_GC_INTERVAL, False)
+
+        # Close connections nobody has used for a while.
+        self.reapLoop = task.LoopingCall(connections.reapIdle)
+        self.reapLoop.start(config.CONNECTION_IDLE_SECONDS / 2.0, False)
+
         debug("Gossip Server Factory created!", 
             success=True, threshold=1)
 
@@ -238,7 +287,7 @@ class GossipServerFactory(ServerFactory):
             info=True, threshold=2)
 
 
-class GossipClientFactory(ReconnectingClientFactory):
+class GossipClientFactory(ClientFactory):
     """
     Factory for gossip clients
     """
@@ -253,9 +302,10 @@ class GossipClientFactory(ReconnectingClientFactory):
         """
         debug("Client Factory Init", 
             info=True, threshold=1)
-        # Run gossip on a timer.
-        self.gossipLoop = task.LoopingCall(self.gossip)
-        self.gossipLoop.start(config.GOSSIP_WAIT_SECONDS, False)
+        # Run gossip on a jittered timer that speeds up when busy.
+        self._membershipSeen = connections.membershipChanges
+        self.gossipLoop = pacing.GossipScheduler(self.gossip, self.isBusy)
+        self.gossipLoop.start()
 
         self.callback = callback
         self.errback = errback
@@ -268,9 +318,9 @@ class GossipClientFactory(ReconnectingClientFactory):
             info=True, threshold=3)
         if self.errback:
             self.errback(reason)
-        connections.deadNodeByConnector(connector)
+        connections.lostConnectionByConnector(connector)
 
-    def clientConnectionLost(self, connector, unused_reason):
+    def clientConnectionLost(self, connector, reason):
         """
         Callback for when the client connection is lost.
         """
@@ -303,11 +353,22 @@ class GossipClientFactory(ReconnectingClientFactory):
         pass #good for disconnectiong databases, closing files.
 
 
+    def isBusy(self):
+        """
+        Whether there's something to spread: queued messages, hot rumors
+        or a membership change since the last round.
+        """
+        changed = connections.membershipChanges != self._membershipSeen
+        self._membershipSeen = connections.membershipChanges
+        return changed or not gossipqueue.empty() \
+            or rumor.monger.hasHot()
+
     def gossip(self):
         """
         Gossip procedure. This is basic. Hope to improve later.
         """
-        if connections.connectToNeighbors():
+        connections.newGossipRound()
+        if not udp.isEnabled() and connections.connectToNeighbors():
             debug("Connections in process. deferred gossip", info=True)
             return
 
@@ -328,43 +389,57 @@ class GossipClientFactory(ReconnectingClientFactory):
         # Put all messages in a list.
         gossipMessages = []
 
-        # Get a vector clock message
-        vcMessage = message.VectorMessage.createVectorClockMessage()
-        vcMessage.setRecipients(recipients)
-        gossipMessages.append(vcMessage)
-
-        # Put in each aggreggation. Tae out for now.
-
-        for aggName in aggregation.STATISTICS:
-            agg = aggregation.STATISTICS[aggName]
-            aggMessage = message.AggregateMessage.createAggregateMessage(agg)
-            aggMessage.setRecipients(recipients)
-            gossipMessages.append(aggMessage)
-        """
-        agg = random.choice(aggregation.STATISTICS.values())      
-        aggMessage = message.AggregateMessage.createAggregateMessage(agg)
-        aggMessage.setRecipients(recipients)
-        gossipMessages.append(aggMessage)
-        """
-        # Get a network message
-        gossipmsg = gossipPrepare()
-        while gossipmsg:
-            gossipmsg.setRecipients(recipients)
-            toAppend = copy.deepcopy(gossipmsg)
-            gossipMessages.append(toAppend)
-            gossipmsg = gossipPrepare()
-
-        debug("There are " \
-            + str(len(gossipMessages)) + " to send.", threshold=2, info=True)
-
-        # Send out the messages
-        for msg in gossipMessages:
-            try:
-                msg.send()
-            except ConnectionError as ce:
-                debug(ce.__str__(), error=True)
-            except GeneralError as ge:
-                debug(ge.__str__(), error=True)
+        if config.GOSSIP_MODE == "pushpull":
+            # Just the digest; neighbors reply with whatever we're missing.
+            digest = message.DigestMessage.createDigestMessage()
+            gossipMessages.append(digest)
+        else:
+            # Vector clock messages are per neighbor (deltas), see below.
+            # So are the aggregations: they only go to the neighbors this
+            # round's frame reaches.
+            (aggregateItems, deliverable) = createAggregateItems(recipients)
+        # Queued network messages, already serialized, most important
+        # first. Whatever doesn't fit this round's budget waits.
+        queued = gossipPrepare()
+
+        # Piggyback SWIM membership updates.
+        if config.MEMBERSHIP_PROVIDER == "swim":
+            swimMessage = swim.createUpdateMessage()
+            if swimMessage:
+                gossipMessages.append(swimMessage)
+
+        # Every few rounds under rumor mongering, ask one neighbor for
+        # any rumors we missed. It rides in that neighbor's batch.
+        pullUid = None
+        if rumor.isEnabled() and rumor.monger.pullDue():
+            pullUid = random.choice(list(recipients))
+            pull = message.RumorPullMessage.createRumorPullMessage()
+
+        debug("There are " + str(len(gossipMessages) + len(queued)) \
+            + " to send.", threshold=2, info=True)
+
+        # Each neighbor gets an equal share of our push-flow mass.
+        fraction = 1.0 / (len(recipients) + 1)
+
+        def perPeer(uid):
+            """
+            Messages for one neighbor only.
+            """
+            msgs = []
+            if uid == pullUid:
+                msgs.append(pull)
+            if config.GOSSIP_MODE != "pushpull":
+                msgs.append(
+                    message.VectorMessage.createVectorClockMessage(uid))
+                msgs.extend(
+                    message.AggregateFlowMessage.createAggregateFlowMessages(
+                        uid, fraction))
+                if uid in deliverable:
+                    msgs.extend(aggregateItems)
+            return msgs
+
+        # Send out the messages. One batch, one write per neighbor.
+        gossipBatch(gossipMessages, recipients, perPeer, queued)
 
 ### Classes for the REST API #################################################
 class HissRootResource(resource.Resource):
@@ -415,7 +490,10 @@ class HissStatsResource(resource.Resource):
                     aggDict[name] = aggregation.getAggregation(name)
                 return json.dumps(aggDict)
             elif name in aggregation.STATISTICS:
-                aggDict = aggregation.getAggregation(name)
+                quantile = None
+                if 'quantile' in requestArgs:
+                    quantile = float(requestArgs['quantile'][0])
+                aggDict = aggregation.getAggregation(name, quantile=quantile)
                 debug("Sent Stat response for " + name, 
                     success=True, threshold=2)
                 return json.dumps(aggDict)
@@ -480,6 +558,101 @@ def gossipClientConnect(host, port):
     except:
         debug("FAILED TO CONNECT", error=True)
 
+def isDeliverable(uid):
+    """
+    Whether a frame sent to uid now goes straight out: the node is known
+    and, over TCP, connected and not backed up.
+    """
+    node = connections.universe.get(uid)
+    if not node:
+        return False
+    if udp.isEnabled():
+        return True
+    return node.hasTCPConnection() \
+        and not node.getTCPConnection().isPaused()
+
+def createAggregateItems(recipients):
+    """
+    Serialized aggregate messages for this round, and the recipients
+    they may go to. Aggregators that split their state (push-sum) share
+    it among the deliverable recipients only: a share sent to a peer
+    with no connection, or held back and then replaced, would be lost.
+    """
+    deliverable = [uid for uid in recipients if isDeliverable(uid)]
+    if not deliverable:
+        return ([], [])
+    msgs = [message.AggregateMessage.createAggregateMessage(
+        aggregation.STATISTICS[name], deliverable)
+        for name in aggregation.STATISTICS]
+    return (message.BatchMessage.fromMessages(msgs).getPayload(),
+        deliverable)
+
+def gossipBatch(msgs, recipients, perPeer=None, items=None):
+    """
+    Send a list of messages to every recipient in a single batch frame.
+    The shared messages are encoded once. perPeer, if given, is called
+    with each recipient's uid and returns messages for that recipient
+    only (e.g. a vector clock delta), which go at the front of its batch.
+    items are already serialized messages to send ahead of msgs.
+    """
+    shared = (items or []) + \
+        message.BatchMessage.fromMessages(msgs).getPayload()
+    if udp.isEnabled():
+        return gossipDatagrams(shared, recipients, perPeer)
+    batch = message.SharedBatch(shared)
+
+    sent = []
+    for uid in recipients:
+        node = connections.universe.get(uid)
+        if not node:
+            debug("recipient " + uid + " not found.", error=True)
+        elif not node.hasTCPConnection():
+            debug("No connection to " + node.getShortUid(), error=True)
+        else:
+            peerItems = None
+            if perPeer is not None:
+                peerItems = message.BatchMessage.fromMessages(
+                    perPeer(uid)).getPayload()
+            node.getTCPConnection().dispatchFrame(
+                batch.getParts(peerItems), "batch")
+            sent.append(node.getShortUid())
+            debug("#".join(["Msg", me.getMe().getUid(), uid, "B"]),
+                monitor=True)
+    debug("Batch of " + str(batch.getCount()) + " sent to [ " \
+        + " ][ ".join(sent) + " ]", success=True, threshold=2)
+
+def gossipDatagrams(shared, recipients, perPeer=None):
+    """
+    gossipBatch over UDP. The shared messages are packed into datagrams
+    once; each recipient also gets its own messages in datagrams of their
+    own. Anything too big for a datagram goes over TCP.
+    """
+    (sharedDatagrams, sharedOversize) = udp.pack(shared)
+
+    sent = []
+    for uid in recipients:
+        node = connections.universe.get(uid)
+        if not node:
+            debug("recipient " + uid + " not found.", error=True)
+            continue
+        datagrams = sharedDatagrams
+        oversize = sharedOversize
+        if perPeer is not None:
+            (peerDatagrams, peerOversize) = udp.pack(
+                message.BatchMessage.fromMessages(perPeer(uid)).getPayload())
+            datagrams = peerDatagrams + datagrams
+            oversize = peerOversize + oversize
+        udp.sendPacked(node, datagrams, oversize)
+        sent.append(node.getShortUid())
+        if oversize:
+            if node.hasTCPConnection():
+                node.getTCPConnection().dispatchFrame(
+                    message.SharedBatch(oversize).getParts(), "batch")
+            else:
+                connections.pool.connect(uid)
+    debug("Datagrams of " + str(len(shared)) + " sent to [ " \
+        + " ][ ".join(sent) + " ]", success=True, threshold=2)
+
 def gossipRun():
     """
     Execute the gossip logic.
@@ -494,26 +667,35 @@ def gossipRun():
         str(config.RECEIVE_PORT) + ".", info=True)
 
     reactor.listenTCP(config.RECEIVE_PORT, gossipServerFactory)
+    if config.GOSSIP_TRANSPORT == "udp":
+        udp.listen(reactor)
 
 def gossipThis(msg):
     """
-    Receive a gossiped Message from another node.
+    Queue a Message to gossip on, ours or one received from another node.
     """
     global gossipqueue
 
     debug("Received Gossip message: " + msg.__class__.__name__ + 
-        " from " + msg.getSender() + " (" + msg.getCode() + ")", success=True)
+        " from " + msg.getSender().getShortUid() + " (" + msg.getCode() + ")", 
+        success=True)
 
-    gossipqueue.put_nowait(msg)
+    if rumor.isEnabled() \
+        and message.GossipNetworkStatusMessage.isGossipNetworkStatusMessage(
+            msg):
+        rumor.monger.spread(msg)
+    else:
+        gossipqueue.put(msg)
 
 def gossipPrepare():
     """
-    Get the next Message object to gossip to friends
+    Get this round's queued messages to gossip to friends, serialized.
+    Hot rumors go first.
     """
-    if not gossipqueue.empty():
-        return gossipqueue.get_nowait()
-    else:
-        return None
+    queued = gossipqueue.takeRound()
+    if rumor.isEnabled():
+        return rumor.monger.takeRound() + queued
+    return queued
 
 def quitMembersRefresh():
     """
@@ -0,0 +1,159 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# hyperloglog.py                                                             #
+# HyperLogLog (Flajolet et al.) distinct counter. A key's 64 bit hash picks  #
+# one of 2^p registers with its top p bits, and the register keeps the most  #
+# leading zeros (plus one) seen in the rest. Merging is a register-wise max, #
+# so merging the same counter twice changes nothing. Standard error is       #
+# 1.04 / sqrt(2^p); small counts use linear counting.                        #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import hashlib
+import math
+import struct
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+from hiss_exceptions import GeneralError
+
+### Constants ################################################################
+HASH = struct.Struct("!Q")
+"""
+First 8 bytes of a key's SHA-1, as an unsigned 64 bit integer.
+"""
+
+### Interfaces ###############################################################
+class IDistinctCounter(zope.interface.Interface):
+    """
+    Mergeable distinct counter interface
+    """
+
+    def add(key):
+        """
+        Count a key.
+        """
+
+    def merge(other):
+        """
+        Count every key the other counter has.
+        """
+
+    def getEstimate():
+        """
+        Estimated number of distinct keys.
+        """
+
+### Classes ##################################################################
+class HyperLogLog(object):
+    """
+    HyperLogLog with 2^precision one byte registers.
+    """
+
+    zope.interface.implements(IDistinctCounter)
+
+    def __init__(self, precision=None):
+        """
+        Constructor
+        """
+        if precision is None:
+            precision = config.AGGREGATE_HLL_PRECISION
+        if not 4 <= precision <= 16:
+            raise GeneralError("HyperLogLog precision must be 4 to 16")
+        self._precision = precision
+        self._size = 1 << precision
+        self._registers = bytearray(self._size)
+
+    def add(self, key):
+        """
+        Count a key (a string, or anything with a string form).
+        """
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        elif not isinstance(key, str):
+            key = str(key)
+        (hashed,) = HASH.unpack_from(hashlib.sha1(key).digest())
+        index = hashed >> (64 - self._precision)
+        rest = hashed & ((1 << (64 - self._precision)) - 1)
+        rank = 64 - self._precision - rest.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def merge(self, other):
+        """
+        Register-wise max with another counter of the same precision.
+        """
+        if other._precision != self._precision:
+            raise GeneralError(
+                "Cannot merge HyperLogLogs of different precision")
+        registers = self._registers
+        for (index, rank) in enumerate(other._registers):
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def clear(self):
+        """
+        Forget every key.
+        """
+        self._registers = bytearray(self._size)
+
+    def getEstimate(self):
+        """
+        Estimated number of distinct keys.
+        """
+        size = self._size
+        total = 0.0
+        zeros = 0
+        for rank in self._registers:
+            total += 2.0 ** -rank
+            if rank == 0:
+                zeros += 1
+        estimate = _alpha(size) * size * size / total
+        if estimate <= 2.5 * size and zeros:
+            return size * math.log(float(size) / zeros)
+        return estimate
+
+    def getStandardError(self):
+        """
+        Relative standard error of the estimate.
+        """
+        return 1.04 / math.sqrt(self._size)
+
+    def getWireState(self):
+        """
+        The registers as a string, one byte each.
+        """
+        return str(self._registers)
+
+    def setWireState(self, state):
+        """
+        Restore registers produced by getWireState().
+        """
+        if len(state) != self._size:
+            raise GeneralError("Malformed HyperLogLog registers")
+        self._registers = bytearray(state)
+
+### Functions ################################################################
+def _alpha(size):
+    """
+    Bias correction constant for size registers.
+    """
+    if size == 16:
+        return 0.673
+    elif size == 32:
+        return 0.697
+    elif size == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / size)
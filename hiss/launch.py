@@ -37,6 +37,8 @@ def parse_args():
     --port
     --logport
     --interval
+    --membership
+    --seed
     --iface
     --version
     """
@@ -64,6 +66,24 @@ def parse_args():
         help='The interval to send gossip messages. \
             (Integer, default: %(default)s)')
 
+    parser.add_argument('--membership',
+        default=config.MEMBERSHIP_PROVIDER,
+        choices=['simpledb', 'swim'],
+        help='How nodes find each other. \
+            (String, default: %(default)s)')
+
+    parser.add_argument('--transport',
+        default=config.GOSSIP_TRANSPORT,
+        choices=['tcp', 'udp'],
+        help='What gossip rounds travel over. \
+            (String, default: %(default)s)')
+
+    parser.add_argument('--seed',
+        action='append',
+        default=[],
+        help='host:port of a node to join through, with --membership swim. \
+            (Repeatable)')
+
     parser.add_argument('--iface', 
         default='localhost',
         help='The interface to communicate on. \
@@ -85,6 +105,10 @@ def applyArgs(namespace):
     config.SEND_PORT = namespace.sendport
     config.GOSSIP_WAIT_SECONDS = namespace.interval
     config.INTERFACE = namespace.iface
+    config.MEMBERSHIP_PROVIDER = namespace.membership
+    config.GOSSIP_TRANSPORT = namespace.transport
+    if namespace.seed:
+        config.SWIM_SEEDS = namespace.seed
 
 
 ### Main #####################################################################
@@ -21,4 +21,9 @@ def getMe():
     """
     Getter function for this node.
     """
-    return me
\ No newline at end of file
+    return me
+def getUid():
+    """
+    Shortcut for this node's uid.
+    """
+    return me.getUid()
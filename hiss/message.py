@@ -10,6 +10,9 @@
 ### Imports ##################################################################
 # Python Library Imports
 import time
+import struct
+import itertools
+import uuid
 import cPickle
 
 # External Library Imports
@@ -18,8 +21,16 @@ import zope.interface
 # Local Imports
 import config
 import me
-import vectorClock
+import vector_clock as vectorClock
 import connections
+import gossip
+import nodes
+import aggregation
+import dedup
+import rumor
+import failure_detector
+import swim
+import wire
 from hiss_exceptions import GeneralError, ConnectionError
 from debug import debug
 
@@ -79,15 +90,198 @@ class IMessageDispatcher(zope.interface.Interface):
         Dispatch a message
         """
 
+class IMessageCodec(zope.interface.Interface):
+    """
+    Turns messages into bytes for the wire and back.
+    """
+
+    def encode(message):
+        """
+        Serialize a message
+        """
+
+    def decode(data):
+        """
+        Build a message from serialized data
+        """
+
+### Codecs ###################################################################
+WIRE_VERSION = 3
+"""
+Version of the binary wire schema. Bump whenever a header or payload
+layout changes; decoders refuse messages from other versions.
+3: vector clock tombstones, digests with tombstones, push-flow, sketch,
+HyperLogLog and windowed aggregate states, rumor pulls.
+"""
+
+HEADER = struct.Struct("!B3sb16sd")
+"""
+Binary message header: schema version, message code (NUL padded),
+gossip TTL, sender UID (raw 16 bytes), created timestamp.
+"""
+
+GOSSIP_ID = struct.Struct("!16sQ")
+"""
+Follows the header on gossiped messages: origin UID and sequence number.
+"""
+
+NEW_NODE = struct.Struct("!16sH")
+
+class PickleCodec(object):
+    """
+    The original wire format. Pickles the whole message object, sender,
+    recipients and all. Kept for compatibility and benchmarking.
+    """
+
+    zope.interface.implements(IMessageCodec)
+
+    def encode(self, message):
+        """
+        Pickle a message
+        """
+        return cPickle.dumps(message)
+
+    def decode(self, data):
+        """
+        Unpickle a message
+        """
+        return cPickle.loads(data)
+
+class BinaryCodec(object):
+    """
+    Compact binary codec. A fixed header followed by a payload whose
+    layout is owned by the message class (packPayload/unpackPayload).
+    Recipients are never sent.
+    """
+
+    zope.interface.implements(IMessageCodec)
+
+    def encode(self, message):
+        """
+        Encode a message to header + typed payload.
+        """
+        ttl = 0
+        if isinstance(message, GossipNetworkStatusMessage):
+            ttl = max(-128, min(127, message.getTtl()))
+        header = HEADER.pack(
+            WIRE_VERSION,
+            message.getCode(),
+            ttl,
+            _senderUidBytes(message.getSender()),
+            message.getTime())
+        if isinstance(message, GossipNetworkStatusMessage):
+            (origin, sequence) = message.getMessageId()
+            header += GOSSIP_ID.pack(wire.uidToBytes(origin), sequence)
+        return header + message.packPayload()
+
+    def decode(self, data):
+        """
+        Decode a message encoded by encode().
+        """
+        try:
+            version, code, ttl, uidBytes, timestamp = \
+                HEADER.unpack_from(data)
+        except struct.error:
+            raise GeneralError("Truncated message header")
+        if version != WIRE_VERSION:
+            raise GeneralError("Unsupported wire version " + str(version))
+        code = code.rstrip("\x00")
+        if code not in MESSAGE_TYPES:
+            raise GeneralError("Unknown message code " + code)
+
+        cls = MESSAGE_TYPES[code]
+        msg = cls.__new__(cls)
+        msg._code = code
+        msg._time = timestamp
+        msg._sender = _senderFromUid(wire.bytesToUid(uidBytes))
+        msg._recipients = []
+        offset = HEADER.size
+        if isinstance(msg, GossipNetworkStatusMessage):
+            msg._gossipttl = ttl
+            try:
+                originBytes, msg._sequence = \
+                    GOSSIP_ID.unpack_from(data, offset)
+            except struct.error:
+                raise GeneralError("Truncated gossip id")
+            msg._origin = wire.bytesToUid(originBytes)
+            offset += GOSSIP_ID.size
+        msg.unpackPayload(data, offset)
+        return msg
+
+CODECS = {
+    'pickle': PickleCodec(),
+    'binary': BinaryCodec(),
+    }
+"""
+Available wire codecs, by name. Every node in a cluster must use the same
+one (config.MESSAGE_CODEC).
+"""
+
+def getCodec(name=None):
+    """
+    Get a codec by name. Defaults to the configured codec.
+    """
+    if not name:
+        name = config.MESSAGE_CODEC
+    return CODECS[name]
+
+def _senderUidBytes(sender):
+    """
+    Raw UID bytes for a sender given as a node or a hex UID string.
+    """
+    if isinstance(sender, basestring):
+        return wire.uidToBytes(sender)
+    return sender.getUidAsObject().bytes
+
+def _senderFromUid(uid):
+    """
+    Rebuild the sender of a received message. Uses what we know about the
+    node if it's in the universe, otherwise a bare node with just the UID.
+    """
+    node = connections.universe.get(uid)
+    if node:
+        return node.getBaseData()
+    return nodes.BaseNode(None, None, uuid.UUID(hex=uid))
+
 ### Message Functions ########################################################
+_gossipSequence = itertools.count(1)
+"""
+Sequence numbers for gossiped messages originated at this node.
+"""
+
+def nextGossipSequence():
+    """
+    Get the next gossip sequence number for this node.
+    """
+    return _gossipSequence.next()
+
 def buildMessage(serializedMessage):
     """
     build a message from a serialized code.
     """
     try:
-        return cPickle.loads(serializedMessage)
+        return getCodec().decode(serializedMessage)
     except:
-        debug("Could not de-pickle serialized message", error=True)
+        debug("Could not decode serialized message", error=True)
+
+def receiveMessage(msg):
+    """
+    Respond to a message that arrived off the network. Gossiped network
+    events this node originated or has already seen are dropped here,
+    before respond() (and so before they can be re-gossiped). Under rumor
+    mongering a duplicate also counts towards the rumor going cold.
+    Returns whether the message was responded to.
+    """
+    if GossipNetworkStatusMessage.isGossipNetworkStatusMessage(msg):
+        messageId = msg.getMessageId()
+        if messageId[0] == me.getMe().getUid() \
+            or dedup.isDuplicate(messageId):
+            rumor.monger.heard(messageId)
+            debug("Dropped duplicate gossip (" + msg.getCode() + ")",
+                info=True, threshold=1)
+            return False
+    msg.respond()
+    return True
 
 ### Classes of Message #######################################################
 class GenericMessage(object):
@@ -151,9 +345,23 @@ class GenericMessage(object):
         get a string of the payload.
         """
         try:
-            return cPickle.dumps(self)
+            return getCodec().encode(self)
         except:
-            debug("Failed to pickle message", error=True)
+            debug("Failed to serialize message", error=True)
+
+    def packPayload(self):
+        """
+        Pack the payload for the binary codec. Messages with a fixed layout
+        override this; the default packs any primitive value.
+        """
+        return wire.pack(self._payload)
+
+    def unpackPayload(self, data, offset):
+        """
+        Inverse of packPayload. Called on a message that was built without
+        running the constructor, after the header fields are set.
+        """
+        self._payload = wire.unpack(data, offset)
 
     def getTime(self):
         """
@@ -183,26 +391,24 @@ class GenericMessage(object):
                 # Handles exception case if this were a node instead of a UID.
                 uid = recipient.getUid()
 
-            if uid in connections.universe:
-                node = connections.lookupNode(uid)
-                if not node.hasTCPConnection():
-                    debug("No connection to " + node.getShortUid(), 
-                        error=True)
-                else:
-                    # Ok, stop messing around and send the message!
-                    try:
-                        tcpConn = node.getTCPConnection().dispatchMessage(
-                            self)
-                        recs.append(node.getShortUid())
-                        debug("#".join(
-                            ["Msg", me.getUid(), uid, self.getCode()]),
-                            monitor=True)
-                    except:
-                        debug("Failed to send message to [ " \
-                            + node.getShortUid() + " ]", error=True)
-            else:
+            node = connections.universe.get(uid)
+            if node is None:
                 raise GeneralError(
                     "recipient " + uid + " not found.")
+            elif not node.hasTCPConnection():
+                debug("No connection to " + node.getShortUid(), 
+                    error=True)
+            else:
+                # Ok, stop messing around and send the message!
+                try:
+                    tcpConn = node.getTCPConnection().dispatchMessage(self)
+                    recs.append(node.getShortUid())
+                    debug("#".join(
+                        ["Msg", me.getUid(), uid, self.getCode()]),
+                        monitor=True)
+                except:
+                    debug("Failed to send message to [ " \
+                        + node.getShortUid() + " ]", error=True)
         if self.getCode() != 'AG':
             debug("(" + self.getCode() + ") message sent to [ " \
                 + " ][ ".join(recs) + " ]", success=True)
@@ -250,6 +456,7 @@ class VectorMessage(GenericMessage):
                 self._clockKey = me.getMe().getUid()
 
         self._code = "V"
+        self._tombstones = []
         
     def getVectorClock(self):
         """
@@ -257,21 +464,67 @@ class VectorMessage(GenericMessage):
         """
         return vectorClock.VectorClock(self._clockKey, self.getPayload())
 
+    def getClockKey(self):
+        """
+        Get the uid of the clock this message came from.
+        """
+        return self._clockKey
+
+    def getTombstones(self):
+        """
+        Get the uids the sender has tombstoned.
+        """
+        return self._tombstones
+
+    def setTombstones(self, tombstones):
+        """
+        Set the uids the sender has tombstoned.
+        """
+        self._tombstones = tombstones
+
     def respond(self):
         """
         How the systemm should respon to receiving this vector clock message.
         """
         try:
-            me.getMe().getVectorClock().receiveMessage(self)
+            advanced = me.getMe().getVectorClock().receiveMessage(self)
+            # A node's entry only moves when it does something: that's
+            # a heartbeat, even if it came to us second hand.
+            failure_detector.heartbeats(advanced)
             debug("Responded to vector message.", 
                 info=True, threshold=2)
         except Exception as e:
             debug(e)
 
+    def packPayload(self):
+        """
+        Pack the clock as all the uids followed by all the counters, then
+        the tombstoned uids.
+        """
+        clocks = self.getPayload()
+        uids = clocks.keys()
+        return wire.packUids(uids) + \
+            wire.packCounters([clocks[uid] for uid in uids]) + \
+            wire.packUids(self.getTombstones())
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack a clock packed by packPayload. The clock key is the sender.
+        """
+        uids, offset = wire.unpackUids(data, offset)
+        counters, offset = wire.unpackCounters(data, offset, len(uids))
+        self._tombstones, offset = wire.unpackUids(data, offset)
+        self._payload = dict(zip(uids, counters))
+        self._clockKey = self._sender.getUid()
+
     @staticmethod
-    def createVectorClockMessage():
+    def createVectorClockMessage(peer=None):
+        """
+        Build a message from this node's clock. Given a peer uid, only
+        the entries that changed since the last message to it are sent.
+        """
         try:
-            return me.getMe().getVectorClock().createMessage()
+            return me.getMe().getVectorClock().createMessage(peer)
         except Exception as e:
             debug(e)
 
@@ -357,10 +610,9 @@ class MeMessage(NetworkStatusMessage):
         Insert the received node into this table.
         """
         try:
-            nodeData = node.buildNode(self._payload)
+            nodeData = nodes.buildNode(self._payload)
             if nodeData.getUid() not in connections.universe:
-                connections.universe[nodeData.getUid()] = \
-                    nodes.ExternalNode.fromBase(nodeData)
+                connections.addNode(nodes.ExternalNode.fromBase(nodeData))
             connections.universe[nodeData.getUid()].knownAlive = True
             debug('Reponded to a MeMessage', success=True)
         except:
@@ -418,10 +670,25 @@ class NodeResponseMessage(NetworkStatusMessage):
         try:
             uid = self._payload.getUid()
             if uid not in connections.universe:
-                connections.universe[uid] = self._payload
+                connections.addNode(
+                    nodes.ExternalNode.fromBase(self._payload))
         except:
             pass
 
+    def packPayload(self):
+        """
+        Pack the node as (uid, ip, port) rather than pickling it.
+        """
+        node = self._payload
+        return wire.pack((node.getUid(), node.getIp(), node.getPort()))
+
+    def unpackPayload(self, data, offset):
+        """
+        Rebuild the node from (uid, ip, port).
+        """
+        (uid, ip, port) = wire.unpack(data, offset)
+        self._payload = nodes.ExternalNode(ip, port, uuid.UUID(hex=uid))
+
 
 class GossipNetworkStatusMessage(NetworkStatusMessage):
     """
@@ -437,8 +704,10 @@ class GossipNetworkStatusMessage(NetworkStatusMessage):
         super(GossipNetworkStatusMessage, self).__init__(
             updates, sender, recipients)
 
-        self._gossipttl = config.GOSSIPTTL
+        self._gossipttl = rumor.gossipTtl()
         self._code = 'G'
+        self._origin = me.getMe().getUid()
+        self._sequence = nextGossipSequence()
 
     def decrementTtl(self):
         self._gossipttl -= 1
@@ -446,6 +715,13 @@ class GossipNetworkStatusMessage(NetworkStatusMessage):
     def getTtl(self):
         return self._gossipttl
 
+    def getMessageId(self):
+        """
+        Unique id of this gossip: (origin uid, origin sequence number).
+        Stays the same as the message is passed along.
+        """
+        return (self._origin, self._sequence)
+
     def respond(self):
         """
         Defines how to respond when one of these messages is recieved
@@ -492,6 +768,18 @@ class UniverseMessage(GossipNetworkStatusMessage):
         # Put in newer vector clock.
         super(UniverseMessage, self).respond()
 
+    def packPayload(self):
+        """
+        Pack the uids as a count then raw 16 byte uids.
+        """
+        return wire.packUids(self.getPayload())
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack the uid list.
+        """
+        self._payload, offset = wire.unpackUids(data, offset)
+
     @staticmethod
     def isUniverseMessae(msg):
         """
@@ -520,6 +808,13 @@ class DeadNodeMessage(GossipNetworkStatusMessage):
         """
         try:
             uid = self.getPayload()
+            if uid in connections.universe \
+                and not failure_detector.isSuspect(uid):
+                debug("Ignoring death of [ " \
+                    + connections.universe[uid].getShortUid() \
+                    + " ], heard from it recently.", info=True)
+                return
+            vectorClock.bury(uid)
             if uid in connections.universe:
                 connections.removeNode(uid)
                 super(DeadNodeMessage, self).respond()
@@ -530,6 +825,18 @@ class DeadNodeMessage(GossipNetworkStatusMessage):
         except:
             debug("failed to respond to dead node message", error=True)
 
+    def packPayload(self):
+        """
+        The payload is a single uid. Send it raw.
+        """
+        return wire.uidToBytes(self.getPayload())
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack the dead uid.
+        """
+        self._payload = wire.bytesToUid(data[offset:offset + 16])
+
     @staticmethod
     def isDeadNodeMessage(msg):
         """
@@ -541,6 +848,7 @@ class DeadNodeMessage(GossipNetworkStatusMessage):
 class NewNodeMessage(GossipNetworkStatusMessage):
     """
     New node message. A node has entered the system.
+    Payload: (uuid object, ip, port)
     """
 
     def __init__(self, node, sender=None, recipients=None):
@@ -555,10 +863,9 @@ class NewNodeMessage(GossipNetworkStatusMessage):
         How to respond to a new node message.
         """
         try:
-            (uidObject, ip) = self.getPayload()
+            (uidObject, ip, port) = self.getPayload()
             if uidObject.hex not in connections.universe: 
-                connections.createNode(
-                    uidObject, ip, connections.DEFAULT_SEND_PORT)
+                connections.createNode(uidObject, ip, port)
                 super(NewNodeMessage, self).respond()
             else:
                 pass # don't need to gossip if we've already gossipped this.
@@ -566,6 +873,21 @@ class NewNodeMessage(GossipNetworkStatusMessage):
         except:
             debug("Failed to respond to new node message", error=True)
 
+    def packPayload(self):
+        """
+        Pack as raw uid, port, then the ip string.
+        """
+        (uidObject, ip, port) = self.getPayload()
+        return NEW_NODE.pack(uidObject.bytes, port) + ip
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack (uuid object, ip, port).
+        """
+        uidBytes, port = NEW_NODE.unpack_from(data, offset)
+        ip = data[offset + NEW_NODE.size:]
+        self._payload = (uuid.UUID(bytes=uidBytes), ip, port)
+
     @staticmethod
     def isNewNodeMessage(msg):
         """
@@ -598,12 +920,34 @@ class AggregateMessage(GossipNetworkStatusMessage):
         except:
             debug("Did not respond to aggregation message.", error=True)
 
+    def packPayload(self):
+        """
+        Pack the statistic name and the aggregator's wire state. Only the
+        values travel; the receiver rebuilds the aggregator around its own
+        statistic of the same name.
+        """
+        aggstat = self.getPayload()
+        return wire.pack((aggstat.getName(), aggstat.getWireState()))
+
+    def unpackPayload(self, data, offset):
+        """
+        Rebuild the aggregator from its name and wire state.
+        """
+        (name, state) = wire.unpack(data, offset)
+        self._payload = aggregation.fromWireState(name, state)
+
     @staticmethod
-    def createAggregateMessage(agg):
+    def createAggregateMessage(agg, recipients=None):
         """
-        Build an aggregate message for the aggregation in the param.
+        Build an aggregate message for the aggregation in the param, to
+        go to recipients (one peer if not given). Aggregators that split
+        their state share it among exactly these, so pass only the peers
+        the message will reach.
         """
-        return AggregateMessage(agg, me.getUid())
+        count = 1
+        if recipients:
+            count = len(recipients)
+        return AggregateMessage(agg.share(count), recipients=recipients)
 
     @staticmethod
     def isAggregateMessage(msg):
@@ -613,6 +957,434 @@ class AggregateMessage(GossipNetworkStatusMessage):
         """
         return msg.getCode() == "AG"
 
+class AggregateFlowMessage(GenericMessage):
+    """
+    Push-flow aggregation: this node's flow to the recipient for every
+    average, sum and count. Different for each recipient.
+    Payload: list of (name, part, epoch, sum flow, weight flow, estimate),
+    sums and counts followed by the leader's uid
+    """
+
+    def __init__(self, flows, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(AggregateFlowMessage, self).__init__(
+            flows, sender, recipients)
+        self._code = "AF"
+
+    def respond(self):
+        """
+        Take the sender's flows.
+        """
+        aggregation.receiveFlows(self.getSender().getUid(),
+            self.getPayload())
+        debug("Took aggregate flows from " + self.getSender().getShortUid(),
+            info=True, threshold=3)
+
+    @staticmethod
+    def createAggregateFlowMessages(uid, fraction=0.5):
+        """
+        Move fraction of our mass to node uid. Returns a list with the
+        message to send it, or an empty list if we keep no push-flow
+        aggregates.
+        """
+        flows = aggregation.getFlows(uid, fraction)
+        if not flows:
+            return []
+        return [AggregateFlowMessage(flows, recipients=[uid])]
+
+    @staticmethod
+    def isAggregateFlowMessage(msg):
+        """
+        Return whether the given message is an AggregateFlowMessage
+        """
+        return msg.getCode() == "AF"
+
+class DigestMessage(GenericMessage):
+    """
+    Push-pull anti-entropy digest: the sender's vector clock and a short
+    hash of each of its aggregates that settles (see getDigestState). The
+    receiver answers with only the clock entries and aggregates the
+    sender is missing or has stale, so a converged cluster exchanges
+    little more than the digests themselves.
+    Payload: (clocks, digests, reply, tombstones)
+    """
+
+    def __init__(self, clocks, digests, reply=False, tombstones=None,
+        sender=None, recipients=None):
+        """
+        Constructor
+        """
+        if tombstones is None:
+            tombstones = []
+        super(DigestMessage, self).__init__(
+            (clocks, digests, reply, tombstones), sender, recipients)
+        self._code = "DG"
+
+    def isReply(self):
+        """
+        Whether this digest was sent in answer to another one. Replies
+        are answered with data but never with a further digest.
+        """
+        return self.getPayload()[2]
+
+    def respond(self):
+        """
+        Send the sender what it lacks, and unless this is already a reply,
+        our own digest so it can do the same for us.
+        """
+        (clocks, digests, reply, tombstones) = self.getPayload()
+        senderUid = self.getSender().getUid()
+        vectorClock.collector.acknowledge(senderUid, tombstones)
+        vc = me.getMe().getVectorClock()
+        replies = []
+
+        delta = vc.getDelta(clocks)
+        if delta:
+            replies.append(VectorMessage(delta))
+
+        # A share of a split aggregate is only sent if it gets there.
+        if gossip.isDeliverable(senderUid):
+            for name in aggregation.STATISTICS:
+                agg = aggregation.STATISTICS[name]
+                ours = aggregation.getDigest(agg)
+                if ours is not None and digests.get(name) != ours:
+                    replies.append(
+                        AggregateMessage.createAggregateMessage(agg))
+
+        replies.extend(
+            AggregateFlowMessage.createAggregateFlowMessages(senderUid))
+
+        if not reply:
+            replies.append(DigestMessage.createDigestMessage(reply=True))
+
+        if replies:
+            gossip.gossipBatch(replies, [senderUid])
+        debug("Answered digest from " + self.getSender().getShortUid() \
+            + " with " + str(len(replies)) + " messages.", 
+            info=True, threshold=2)
+
+    def packPayload(self):
+        """
+        Pack the clock and tombstones like a VectorMessage, then the
+        digests and flag.
+        """
+        (clocks, digests, reply, tombstones) = self.getPayload()
+        uids = clocks.keys()
+        return wire.packUids(uids) + \
+            wire.packCounters([clocks[uid] for uid in uids]) + \
+            wire.packUids(tombstones) + \
+            wire.pack((digests, reply))
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack a digest packed by packPayload.
+        """
+        uids, offset = wire.unpackUids(data, offset)
+        counters, offset = wire.unpackCounters(data, offset, len(uids))
+        tombstones, offset = wire.unpackUids(data, offset)
+        (digests, reply) = wire.unpack(data, offset)
+        self._payload = (dict(zip(uids, counters)), digests, reply, 
+            tombstones)
+
+    @staticmethod
+    def createDigestMessage(reply=False):
+        """
+        Build a digest of this node's current clock and aggregates. It
+        isn't an event on our clock: a peer that has seen our clock then
+        has nothing to send back.
+        """
+        vc = me.getMe().getVectorClock()
+        return DigestMessage(vc.getClocks(), aggregation.getDigests(), 
+            reply, vectorClock.collector.getTombstones())
+
+    @staticmethod
+    def isDigestMessage(msg):
+        """
+        Return whether the given message is a DigestMessage
+        """
+        return msg.getCode() == "DG"
+
+class RumorPullMessage(GenericMessage):
+    """
+    Rumor mongering pull: the ids of the rumors the sender knows of. The
+    receiver sends back any it retains that aren't among them.
+    Payload: list of (origin uid, sequence)
+    """
+
+    def __init__(self, messageIds, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(RumorPullMessage, self).__init__(
+            messageIds, sender, recipients)
+        self._code = "RP"
+
+    def respond(self):
+        """
+        Send the sender the rumors it hasn't heard.
+        """
+        senderUid = self.getSender().getUid()
+        missing = rumor.monger.missingFrom(self.getPayload())
+        if missing:
+            gossip.gossipBatch([], [senderUid], items=missing)
+        debug("Answered rumor pull from " + self.getSender().getShortUid() \
+            + " with " + str(len(missing)) + " rumors.",
+            info=True, threshold=2)
+
+    def packPayload(self):
+        """
+        Pack the ids as all the origins followed by all the sequences.
+        """
+        messageIds = self.getPayload()
+        return wire.packUids([origin for (origin, seq) in messageIds]) + \
+            wire.packCounters([seq for (origin, seq) in messageIds])
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack ids packed by packPayload.
+        """
+        origins, offset = wire.unpackUids(data, offset)
+        sequences, offset = wire.unpackCounters(data, offset, len(origins))
+        self._payload = zip(origins, sequences)
+
+    @staticmethod
+    def createRumorPullMessage():
+        """
+        Build a pull request with the rumors this node knows of.
+        """
+        return RumorPullMessage(rumor.monger.getRecentIds())
+
+    @staticmethod
+    def isRumorPullMessage(msg):
+        """
+        Return whether the given message is a RumorPullMessage
+        """
+        return msg.getCode() == "RP"
+
+class SwimPingMessage(GenericMessage):
+    """
+    SWIM direct probe. Answered with a SwimAckMessage.
+    Payload: (sequence, membership updates)
+    """
+
+    def __init__(self, seq, updates, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(SwimPingMessage, self).__init__(
+            (seq, updates), sender, recipients)
+        self._code = "SP"
+
+    def respond(self):
+        """
+        Ack the ping.
+        """
+        if swim.engine is not None:
+            (seq, updates) = self.getPayload()
+            swim.engine.onPing(self.getSender().getUid(), seq, updates)
+
+class SwimPingReqMessage(GenericMessage):
+    """
+    SWIM indirect probe: ping target for me and relay its ack.
+    Payload: (sequence, (target uid, ip, port), membership updates)
+    """
+
+    def __init__(self, seq, target, updates, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(SwimPingReqMessage, self).__init__(
+            (seq, target, updates), sender, recipients)
+        self._code = "SR"
+
+    def respond(self):
+        """
+        Probe the target on the sender's behalf.
+        """
+        if swim.engine is not None:
+            (seq, target, updates) = self.getPayload()
+            swim.engine.onPingReq(
+                self.getSender().getUid(), seq, target, updates)
+
+class SwimAckMessage(GenericMessage):
+    """
+    SWIM ack for a direct or relayed probe of target.
+    Payload: (sequence, target uid, membership updates)
+    """
+
+    def __init__(self, seq, target, updates, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(SwimAckMessage, self).__init__(
+            (seq, target, updates), sender, recipients)
+        self._code = "SA"
+
+    def respond(self):
+        """
+        Settle the probe this acks.
+        """
+        if swim.engine is not None:
+            (seq, target, updates) = self.getPayload()
+            swim.engine.onAck(self.getSender().getUid(), seq, target, updates)
+
+class SwimUpdateMessage(GenericMessage):
+    """
+    SWIM membership updates on their own, piggybacked on a gossip batch
+    or sent as a greeting on a new connection.
+    Payload: list of (uid, ip, port, state, incarnation)
+    """
+
+    def __init__(self, updates, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(SwimUpdateMessage, self).__init__(updates, sender, recipients)
+        self._code = "SU"
+
+    def respond(self):
+        """
+        Apply the updates.
+        """
+        if swim.engine is not None:
+            swim.engine.onUpdate(self.getSender().getUid(), self.getPayload())
+
+class BatchMessage(GenericMessage):
+    """
+    Envelope carrying several already-serialized messages, so a gossip
+    round costs one frame and one write per neighbor.
+    Payload: list of serialized messages.
+    """
+
+    def __init__(self, items, sender=None, recipients=None):
+        """
+        Constructor
+        """
+        super(BatchMessage, self).__init__(items, sender, recipients)
+        self._code = 'B'
+
+    def respond(self):
+        """
+        Decode and respond to each message in the batch, in order.
+        """
+        for item in self.getPayload():
+            msg = buildMessage(item)
+            if msg:
+                try:
+                    receiveMessage(msg)
+                except:
+                    debug("Failed to respond to batched message " \
+                        + msg.getCode(), error=True)
+
+    def packPayload(self):
+        """
+        Pack the items as a count then length-prefixed byte strings.
+        """
+        items = self.getPayload()
+        return wire.LENGTH.pack(len(items)) + BatchMessage.packItems(items)
+
+    @staticmethod
+    def packItems(items):
+        """
+        The length-prefixed items, without the count.
+        """
+        out = []
+        for item in items:
+            out.append(wire.LENGTH.pack(len(item)))
+            out.append(item)
+        return "".join(out)
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack the items in a single pass over the buffer. A frame cut
+        short raises GeneralError.
+        """
+        try:
+            (count,) = wire.LENGTH.unpack_from(data, offset)
+        except struct.error:
+            raise GeneralError("Truncated value")
+        offset += wire.LENGTH.size
+        items = []
+        for i in xrange(count):
+            try:
+                (length,) = wire.LENGTH.unpack_from(data, offset)
+            except struct.error:
+                raise GeneralError("Truncated value")
+            offset += wire.LENGTH.size
+            item = data[offset:offset + length]
+            if len(item) != length:
+                raise GeneralError("Truncated value")
+            items.append(item)
+            offset += length
+        self._payload = items
+
+    @staticmethod
+    def fromMessages(msgs):
+        """
+        Build a batch from message objects, serializing each one once.
+        Strings are taken as already serialized. Messages that fail to
+        serialize are left out.
+        """
+        items = []
+        for msg in msgs:
+            if isinstance(msg, str):
+                data = msg
+            else:
+                data = msg.getSerialized()
+            if data:
+                items.append(data)
+        return BatchMessage(items)
+
+    @staticmethod
+    def isBatchMessage(msg):
+        """
+        Return whether a message is a batch envelope.
+        """
+        return msg.getCode() == 'B'
+
+
+class SharedBatch(object):
+    """
+    One gossip round's batch. The messages shared by every recipient are
+    encoded once; each recipient's frame is its own messages (if any)
+    followed by a reference to the same shared bytes.
+    """
+
+    def __init__(self, items):
+        """
+        Constructor. items are serialized messages.
+        """
+        self._items = items
+        self._binary = isinstance(getCodec(), BinaryCodec)
+        if self._binary:
+            # An empty batch's encoding is the header plus a zero count.
+            self._head = BatchMessage([]).getSerialized()[:-wire.LENGTH.size]
+            self._body = BatchMessage.packItems(items)
+            self._shared = [self._head + wire.LENGTH.pack(len(items)),
+                self._body]
+        else:
+            self._shared = [BatchMessage(items).getSerialized()]
+
+    def getCount(self):
+        """
+        Number of shared messages.
+        """
+        return len(self._items)
+
+    def getParts(self, peerItems=None):
+        """
+        The frame for one recipient, as a list of strings to write in
+        order. Without peerItems every recipient gets the same list.
+        """
+        if not peerItems:
+            return self._shared
+        if not self._binary:
+            return [BatchMessage(peerItems + self._items).getSerialized()]
+        return [self._head \
+            + wire.LENGTH.pack(len(peerItems) + len(self._items)) \
+            + BatchMessage.packItems(peerItems), self._body]
 
 
 ### Logging Messages #########################################################
@@ -649,6 +1421,18 @@ class LogMessage(GenericMessage):
     def respond(self):
         pass
 
+    def packPayload(self):
+        """
+        Pack the level along with the payload.
+        """
+        return wire.pack((self._level, self._payload))
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack the level and payload.
+        """
+        (self._level, self._payload) = wire.unpack(data, offset)
+
     @staticmethod
     def isLogMessage(msg):
         """
@@ -703,6 +1487,18 @@ class ExternalLogMessage(LogMessage):
     def respond(self):
         pass
 
+    def packPayload(self):
+        """
+        Pack the level and log type along with the payload.
+        """
+        return wire.pack((self._level, self._type, self._payload))
+
+    def unpackPayload(self, data, offset):
+        """
+        Unpack the level, log type and payload.
+        """
+        (self._level, self._type, self._payload) = wire.unpack(data, offset)
+
     @staticmethod
     def isExternalLogMessage(msg):
         """
@@ -740,3 +1536,34 @@ class MessageDispatcher:
                       message.getPayload())
         else:
             raise "Connection not valid"
+
+### Message Registry #########################################################
+MESSAGE_TYPES = {
+    '?': GenericMessage,
+    'V': VectorMessage,
+    'S': NetworkStatusMessage,
+    'A': IsAliveMessage,
+    'M': MeMessage,
+    'NRQ': NodeRequestMessage,
+    'NRS': NodeResponseMessage,
+    'G': GossipNetworkStatusMessage,
+    'U': UniverseMessage,
+    'D': DeadNodeMessage,
+    'N': NewNodeMessage,
+    'AG': AggregateMessage,
+    'AF': AggregateFlowMessage,
+    'DG': DigestMessage,
+    'RP': RumorPullMessage,
+    'SP': SwimPingMessage,
+    'SR': SwimPingReqMessage,
+    'SA': SwimAckMessage,
+    'SU': SwimUpdateMessage,
+    'B': BatchMessage,
+    'L': LogMessage,
+    'IL': InternalLogMessage,
+    'EL': ExternalLogMessage,
+    }
+"""
+Message class for each wire code. The binary codec uses this to decide
+what to build when decoding. Register new message types here.
+"""
@@ -17,13 +17,18 @@
 ### Imports ##################################################################
 # Python Library Imports
 import random
+import bisect
+import math
+import heapq
 
 # External Library Imports
 import zope.interface
 
 # Local Imports
+import config
 import me
 import connections
+import proximity
 
 ### Interfaces ###############################################################
 class INeighborStrategy(zope.interface.Interface):
@@ -39,7 +44,9 @@ class INeighborStrategy(zope.interface.Interface):
 ### Classes ##################################################################
 class BaseNeighborStrategy(object):
     """
-    Base Class for Neighbor Strategies
+    Base Class for Neighbor Strategies. Keeps a sorted view of the
+    universe's uids, updated by connections.addNode/removeNode, and
+    caches the chosen neighbors until the next gossip round.
     """
 
     zope.interface.implements(INeighborStrategy)
@@ -50,17 +57,65 @@ class BaseNeighborStrategy(object):
         """
         self.neighborSet = set([])
         self.removedSet = set([])
+        self._sortedUids = []
+        self._members = set([])
+        self._round = 0
+        self._cacheRound = None
+        for uid in connections.universe.keys():
+            self.nodeAdded(uid)
 
     def getNeighbors(self):
         """
-        Get neighbors
+        Get neighbors. Chosen once per round, then served from the cache.
         """
-        pass
+        if self._cacheRound != self._round:
+            self.neighborSet = set(self._chooseNeighbors())
+            self._cacheRound = self._round
+        return set(self.neighborSet)
+
+    def _chooseNeighbors(self):
+        """
+        Pick this round's neighbors. Subclasses override.
+        """
+        return []
+
+    def newRound(self):
+        """
+        Start a gossip round. The next getNeighbors chooses again.
+        """
+        self._round += 1
+
+    def invalidate(self):
+        """
+        Drop the cached neighbors.
+        """
+        self._cacheRound = None
+
+    def nodeAdded(self, uid):
+        """
+        A node joined the universe.
+        """
+        if uid not in self._members:
+            self._members.add(uid)
+            bisect.insort(self._sortedUids, uid)
+            self.removedSet.discard(uid)
+
+    def nodeRemoved(self, uid):
+        """
+        A node left the universe.
+        """
+        if uid in self._members:
+            self._members.remove(uid)
+            del self._sortedUids[bisect.bisect_left(self._sortedUids, uid)]
+            if uid in self.neighborSet:
+                self.neighborSet.remove(uid)
+                self.invalidate()
 
     def removeNeighbor(self, uid):
         self.removedSet.add(uid)
         if uid in self.neighborSet:
             self.neighborSet.remove(uid)
+            self.invalidate()
         return self.neighborSet
 
     def isNeighbor(self, uid):
@@ -68,9 +123,34 @@ class BaseNeighborStrategy(object):
 
     def _universeUids(self):
         """
-        Helper method to get uids.
+        Helper method to get uids, sorted.
+        """
+        return list(self._sortedUids)
+
+    def _universeSize(self):
+        """
+        Number of known nodes, including this one.
         """
-        return sorted(connections.universe.keys())
+        return len(self._sortedUids)
+
+    def _sampleOthers(self, count):
+        """
+        Sample count uids other than this node. O(count) for a large
+        universe: draw one extra and drop this node (or the extra).
+        """
+        myUid = me.getUid()
+        others = self._universeSize() - (1 if myUid in self._members else 0)
+        count = min(count, others)
+        if count <= 0:
+            return []
+        if myUid not in self._members:
+            return random.sample(self._sortedUids, count)
+        sample = random.sample(self._sortedUids, count + 1)
+        if myUid in sample:
+            sample.remove(myUid)
+        else:
+            sample.pop()
+        return sample
 
 class DefaultNeighborStrategy(BaseNeighborStrategy):
 
@@ -81,22 +161,14 @@ class DefaultNeighborStrategy(BaseNeighborStrategy):
         super(DefaultNeighborStrategy, self).__init__()
         self.count = 2
 
-    def getNeighbors(self):
+    def _chooseNeighbors(self):
         """
         Get Neighbors
         """
-        unilength = len(self._universeUids())
-        if unilength > 2:
-            if not self.count:
-                idealcount = int(math.ceil(math.log10(unilength)))
-                self.count = max(2, idealcount)
-            samplespace = self._universeUids()
-            if me.getUid() in samplespace:
-                samplespace.remove(me.getMe().getUid())
-            self.neighborSet = random.sample(samplespace, self.count)
-            return set(self.neighborSet)
+        if self._universeSize() > 2:
+            return self._sampleOthers(self.count)
         else:
-            return set([])
+            return []
 
 
 class RandomNeighborStrategy(BaseNeighborStrategy):
@@ -111,11 +183,11 @@ class RandomNeighborStrategy(BaseNeighborStrategy):
         """
         super(RandomNeighborStrategy, self).__init__()
 
-    def getNeighbors(self):
+    def _chooseNeighbors(self):
         """
         Get random neighbors.
         """
-        return None
+        return self._sampleOthers(random.randint(1, 3))
 
 
 class AllNeighborStrategoy(BaseNeighborStrategy):
@@ -130,12 +202,12 @@ class AllNeighborStrategoy(BaseNeighborStrategy):
         """
         super(AllNeighborStrategoy, self).__init__()
 
-    def getNeighbors(self):
+    def _chooseNeighbors(self):
         """
         Get all neighbors
         """
-        self.neighborSet = self._universeUids()
-        return self.neighborSet()
+        myUid = me.getUid()
+        return [uid for uid in self._sortedUids if uid != myUid]
 
 class SingleNeighborStrategy(BaseNeighborStrategy):
     """
@@ -148,56 +220,176 @@ class SingleNeighborStrategy(BaseNeighborStrategy):
         """
         super(SingleNeighborStrategy, self).__init__()
 
-    def getNeighbors(self):
+    def _chooseNeighbors(self):
         """
-        Get a single neighbor.
+        Get a single neighbor: the next uid after mine, wrapping around.
         """
-        sortedkeys = self._universeUids()
-        ix = sortedkeys.index(me.getUid())
-        if ix == (len(sortedkeys)-1):
-            self.neighborSet = sortedkeys[0]
-        else:
-            self.neighborSet = sortedkeys[ix+1]
-        return self.neighborSet
+        sortedkeys = self._sortedUids
+        myUid = me.getUid()
+        if not sortedkeys or sortedkeys == [myUid]:
+            return []
+        ix = bisect.bisect_right(sortedkeys, myUid)
+        if ix == len(sortedkeys):
+            ix = 0
+        return [sortedkeys[ix]]
+
+class StableNeighborStrategy(BaseNeighborStrategy):
+    """
+    Keep the same neighbors from round to round so their connections stay
+    open. Every rotatePeriod rounds one neighbor is swapped out for mixing.
+    When filling a slot, already connected peers win.
+    """
 
-class LogarithmicNeighborStrategy(BaseNeighborStrategy):
+    def __init__(self, rotatePeriod=None):
+        """
+        Constructor
+        """
+        super(StableNeighborStrategy, self).__init__()
+        if rotatePeriod is None:
+            rotatePeriod = config.GOSSIP_NEIGHBOR_ROTATE_ROUNDS
+        self._rotatePeriod = rotatePeriod
+        self._rotatedRound = 0
+
+    def _targetCount(self):
+        """
+        How many neighbors to keep. Subclasses override.
+        """
+        return 1
+
+    def _isConnected(self, uid):
+        """
+        Whether there's already a TCP connection to this node.
+        """
+        node = connections.universe.get(uid)
+        return node is not None and node is not me.getMe() \
+            and node.hasTCPConnection()
+
+    def _chooseNeighbors(self):
+        """
+        Keep the current neighbors that are still around, rotate one out
+        if it's time, then fill up to the target count.
+        """
+        myUid = me.getUid()
+        keep = [uid for uid in self.neighborSet
+            if uid in self._members and uid != myUid]
+        others = self._universeSize() - (1 if myUid in self._members else 0)
+        target = min(self._targetCount(), others)
+
+        dropped = None
+        if len(keep) > target:
+            keep.sort(key=self._isConnected, reverse=True)
+            keep = keep[:target]
+        elif keep and others > len(keep) \
+            and self._round - self._rotatedRound >= self._rotatePeriod:
+            unconnected = [uid for uid in keep if not self._isConnected(uid)]
+            dropped = random.choice(unconnected or keep)
+            keep.remove(dropped)
+            self._rotatedRound = self._round
+
+        need = target - len(keep)
+        if need > 0:
+            exclude = set(keep)
+            if dropped is not None and others > target:
+                exclude.add(dropped)
+            # Draw a few spare candidates so connected ones can be preferred.
+            candidates = [uid for uid in
+                self._sampleOthers(min(2 * need + len(exclude), others))
+                if uid not in exclude]
+            candidates.sort(key=self._isConnected, reverse=True)
+            keep.extend(candidates[:need])
+        return keep
+
+class LogarithmicNeighborStrategy(StableNeighborStrategy):
     """
     Return a number of neighbors logarithmic in size of the universe.
     Scales well, but not infinitely.
     """
 
-    def __init__(self, base=10):
+    def __init__(self, base=10, rotatePeriod=None):
         """
         Constructor
         """
-        super(LogarithmicNeighborStrategy, self).__init__()
+        super(LogarithmicNeighborStrategy, self).__init__(rotatePeriod)
         self._base = base
 
-    def getNeighbors(self):
+    def _targetCount(self):
         """
         Get logarithmic count of neighbors
         """
+        size = self._universeSize()
+        if size < 2:
+            return 1
+        return max(1, int(math.ceil(math.log(size, self._base))))
 
 
-class ConstantNeighborStrategy(BaseNeighborStrategy):
+class ConstantNeighborStrategy(StableNeighborStrategy):
     """
     Return the same neighbors of constant number. May change
-    when nodes die or leave system.
+    when nodes die or leave system, and one rotates out every so often.
     """
 
-    def __init__(self, count):
+    def __init__(self, count=None, rotatePeriod=None):
         """
         Constructor
         """
-        super(ConstantNeighborStrategy, self).__init()
+        super(ConstantNeighborStrategy, self).__init__(rotatePeriod)
+        if count is None:
+            count = config.GOSSIP_NEIGHBOR_COUNT
         self._count = count
-        self.neighborSet = set([])
 
-    def getNeighbors(self):
+    def _targetCount(self):
         """
-        Get constant set of neighbors
+        Get constant count of neighbors
         """
-        return None
+        return self._count
+
+class ProximityNeighborStrategy(BaseNeighborStrategy):
+    """
+    Gossip mostly with the nearest nodes by smoothed round trip time,
+    plus a random share for mixing (and so unmeasured nodes get tried).
+    """
+
+    def __init__(self, count=None, randomFraction=None):
+        """
+        Constructor
+        """
+        super(ProximityNeighborStrategy, self).__init__()
+        if count is None:
+            count = config.GOSSIP_NEIGHBOR_COUNT
+        if randomFraction is None:
+            randomFraction = config.PROXIMITY_RANDOM_FRACTION
+        self._count = count
+        self._randomFraction = randomFraction
+
+    def _chooseNeighbors(self):
+        """
+        The nearest measured nodes, topped up at random.
+        """
+        myUid = me.getUid()
+        others = self._universeSize() - (1 if myUid in self._members else 0)
+        count = min(self._count, others)
+        if count <= 0:
+            return []
+        randomCount = int(math.ceil(count * self._randomFraction))
+        if count > 1:
+            randomCount = min(randomCount, count - 1)
+
+        measured = []
+        for uid in self._sortedUids:
+            rtt = proximity.getRtt(uid)
+            if rtt is not None and uid != myUid:
+                measured.append((rtt, uid))
+        chosen = [uid for (rtt, uid) in
+            heapq.nsmallest(count - randomCount, measured)]
+
+        need = count - len(chosen)
+        if need > 0:
+            exclude = set(chosen)
+            candidates = [uid for uid in
+                self._sampleOthers(min(need + len(exclude), others))
+                if uid not in exclude]
+            chosen.extend(candidates[:need])
+        return chosen
 
 ### Functions ################################################################
 def neighborStrategyFactory(name):
@@ -216,5 +408,7 @@ def neighborStrategyFactory(name):
         return LogarithmicNeighborStrategy()
     elif name == "constant":
         return ConstantNeighborStrategy()
+    elif name == "proximity":
+        return ProximityNeighborStrategy()
     else:
         return None
@@ -25,7 +25,9 @@ import twisted.internet.reactor
 import config
 import connections
 import me
-import vectorClock
+import vector_clock as vectorClock
+import failure_detector
+import proximity
 from debug import debug
 from hiss_exceptions import GeneralError
 
@@ -183,62 +185,36 @@ class ExternalNode(BaseNode):
         super(ExternalNode, self).__init__(ip, port, uid)
         self._tcpConnection = None
         self._knownAlive = True
+        self._suspect = False
+        self._failureDetector = failure_detector.PhiAccrualDetector()
+        self._rttEstimator = proximity.RttEstimator()
+        self._connectStarted = None
 
-    def openTCPConnection(self, bindAddress=None):
+    def openTCPConnection(self):
         """
-        Open a new TCP connection from the local node to this node.
+        Open a new TCP connection from the local node to this node. The
+        connection is attached once the handshake frame arrives. Use
+        connections.pool.connect rather than calling this directly.
         """
         debug("Trying to a new connection to [ " + self.getShortUid() + " ]",
             info=True)
-        connector = connections.openConnection(self.getIp(), self.getPort())
-        
-        if not bindAddress:
-            bindAddress = (me.getMe().getIp(), config.getNextSendPort())
-            #bindAddress = twisted.internet.address.IPv4Address(
-            #    'TCP', me.getMe().getIp(), config.SEND_PORT)
-            #config.getNextSendPort()
-        """
-        c = connections.HissTCPClientConnection.fromPrimitives(
-            self,
-            self.getIp(), 
-            self.getPort(), 
-            bindAddress,
-            connector)
-        """
-        '''
-        c = connections.HissTCPClientConnection.fromPrimitives(
-            self,
-            self.getIp(), 
-            self.getPort(), 
-            None,
-            connector)
-        self._tcpConnection = c
-        '''
-        c = connections.HissConnection.fromPrimitives(
-            self,
-            self.getIp(), 
-            self.getPort(), 
-            None,
-            connector)
-        self._tcpConnection = c
-
-    def setTCPConnection(self, tcpConn):
+        proximity.connectStarted(self.getUid())
+        connections.openConnection(self.getIp(), self.getPort())
+
+    def setTCPConnection(self, tcpConn, outbound=False):
         """
         Assign a TCP connection to this node.
         """
         debug("Setting up connection to [ " + self.getShortUid() + " ]", 
             info=True)
-        #self._tcpConnection = connections.HissTCPClientConnection(
-        #    self, tcpConn)
         self._tcpConnection = connections.HissConnection(
-            self, tcpConn)
+            self, tcpConn, outbound)
+        connections.pool.attached(self.getUid())
 
     def getTCPConnection(self):
         """
-        return the TCP Connection (twisted Client) to this node.
+        return the TCP Connection (twisted Client) to this node, or None.
         """
-        if not self.hasTCPConnection():
-            self.openTCPConnection()
         return self._tcpConnection
 
     def hasTCPConnection(self):
@@ -257,9 +233,34 @@ class ExternalNode(BaseNode):
             if self.hasTCPConnection():
                 self.getTCPConnection().loseConnection()
             self._tcpConnection = None
+            connections.pool.detached(self.getUid())
         except:
             debug("error destroying tcp connection", error=True)
 
+    def getFailureDetector(self):
+        """
+        Get the phi-accrual failure detector for this node.
+        """
+        return self._failureDetector
+
+    def getRttEstimator(self):
+        """
+        Get the round trip time estimate for this node.
+        """
+        return self._rttEstimator
+
+    def isSuspect(self):
+        """
+        Whether the failure detector suspects this node.
+        """
+        return self._suspect
+
+    def setSuspect(self, suspect):
+        """
+        Mark or clear suspicion.
+        """
+        self._suspect = suspect
+
     @staticmethod
     def fromBase(basenode):
         """
@@ -0,0 +1,195 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# outbound.py                                                                #
+# Queue of messages waiting to be gossiped. Bounded, ordered by priority     #
+# (membership before aggregates before logs), and keyed so that only the     #
+# latest update about a node or statistic waits to go out. Each round        #
+# takes what fits in a byte budget; the rest waits for the next round.       #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import itertools
+from collections import OrderedDict
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+from debug import debug
+
+### Constants ################################################################
+PRIORITY_MEMBERSHIP = 0
+PRIORITY_AGGREGATE = 1
+PRIORITY_LOG = 2
+"""
+Lower goes first.
+"""
+
+PRIORITIES = {
+    'D': PRIORITY_MEMBERSHIP,
+    'N': PRIORITY_MEMBERSHIP,
+    'U': PRIORITY_MEMBERSHIP,
+    'G': PRIORITY_MEMBERSHIP,
+    'AG': PRIORITY_AGGREGATE,
+    'L': PRIORITY_LOG,
+    'IL': PRIORITY_LOG,
+    'EL': PRIORITY_LOG,
+    }
+"""
+Message code -> priority. Anything else is treated as an aggregate.
+"""
+
+### Interfaces ###############################################################
+class IOutboundQueue(zope.interface.Interface):
+    """
+    Outbound gossip queue interface
+    """
+
+    def put(msg):
+        """
+        Queue a message to gossip.
+        """
+
+    def takeRound(budget):
+        """
+        Take serialized messages for one round, up to budget bytes.
+        """
+
+### Classes ##################################################################
+class OutboundQueue(object):
+    """
+    Bounded priority queue of serialized messages. Messages are serialized
+    when queued, which also snapshots them. A message with the same key as
+    one already waiting replaces it in place. When full, the oldest entry
+    of the lowest priority goes, unless the new message is lower still.
+    """
+
+    zope.interface.implements(IOutboundQueue)
+
+    def __init__(self, maxItems=None):
+        """
+        Constructor
+        """
+        if maxItems is None:
+            maxItems = config.GOSSIP_QUEUE_MAX_ITEMS
+        self._maxItems = maxItems
+        self._levels = [OrderedDict() for level in
+            range(max(PRIORITIES.values()) + 1)]
+        self._levelOf = {}
+        self._unique = itertools.count()
+
+        self.merged = 0
+        self.dropped = 0
+        self.carried = 0
+
+    def put(self, msg):
+        """
+        Queue a message. Returns False if it was dropped.
+        """
+        data = msg.getSerialized()
+        if not data:
+            return False
+        priority = PRIORITIES.get(msg.getCode(), PRIORITY_AGGREGATE)
+        key = keyOf(msg)
+        if key is None:
+            key = ('unique', self._unique.next())
+
+        previous = self._levelOf.get(key)
+        if previous == priority:
+            self._levels[priority][key] = data
+            self.merged += 1
+            return True
+        if previous is not None:
+            del self._levels[previous][key]
+            self.merged += 1
+        elif len(self._levelOf) >= self._maxItems \
+            and not self._evict(priority):
+            self.dropped += 1
+            return False
+        self._levels[priority][key] = data
+        self._levelOf[key] = priority
+        return True
+
+    def _evict(self, priority):
+        """
+        Make room for a message of this priority. Returns False if
+        everything waiting is more important.
+        """
+        for level in range(len(self._levels) - 1, priority - 1, -1):
+            if self._levels[level]:
+                (key, data) = self._levels[level].popitem(last=False)
+                del self._levelOf[key]
+                self.dropped += 1
+                return True
+        return False
+
+    def takeRound(self, budget=None):
+        """
+        Take serialized messages, most important first, until the next
+        one would go over budget bytes. At least one message is taken so
+        a large one can't block the queue.
+        """
+        if budget is None:
+            budget = config.GOSSIP_ROUND_BYTES
+        items = []
+        used = 0
+        for level in self._levels:
+            while level:
+                key = next(iter(level))
+                data = level[key]
+                if items and used + len(data) > budget:
+                    self.carried += len(self)
+                    debug(str(len(self)) + " gossip messages carried " \
+                        + "over to the next round.", info=True, threshold=2)
+                    return items
+                del level[key]
+                del self._levelOf[key]
+                items.append(data)
+                used += len(data)
+        return items
+
+    def empty(self):
+        """
+        Whether nothing is waiting.
+        """
+        return not self._levelOf
+
+    def __len__(self):
+        """
+        Number of messages waiting.
+        """
+        return len(self._levelOf)
+
+    def getStatistics(self):
+        """
+        Counters for the status page.
+        """
+        return {"waiting": len(self), "merged": self.merged,
+            "dropped": self.dropped, "carried": self.carried}
+
+### Functions ################################################################
+def keyOf(msg):
+    """
+    Merge key of a message: the node a membership message is about, or
+    the statistic an aggregate is for. None if it doesn't merge.
+    """
+    code = msg.getCode()
+    if code == 'D':
+        return ('node', msg.getPayload())
+    elif code == 'N':
+        return ('node', msg.getPayload()[0].hex)
+    elif code == 'U':
+        return ('universe',)
+    elif code == 'AG':
+        return ('stat', msg.getPayload().getName())
+    return None
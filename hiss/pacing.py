@@ -0,0 +1,154 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# pacing.py                                                                  #
+# Paces gossip rounds. Replaces a fixed LoopingCall so the nodes of a        #
+# cluster don't all fire together: the first round starts at a random        #
+# offset and every interval is jittered. The interval halves while there is  #
+# something to spread (queued messages, a membership change) and grows back  #
+# slowly while the cluster is quiet, staying within configured bounds.       #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import random
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+from debug import debug
+
+### Interfaces ###############################################################
+class IGossipScheduler(zope.interface.Interface):
+    """
+    Gossip round scheduler interface
+    """
+
+    def start():
+        """
+        Start running rounds.
+        """
+
+    def stop():
+        """
+        Stop running rounds.
+        """
+
+    def getInterval():
+        """
+        Current interval between rounds, before jitter.
+        """
+
+### Classes ##################################################################
+class GossipScheduler(object):
+    """
+    Calls a function once per gossip round. busy is called after each
+    round and returns whether there's more to spread soon.
+    """
+
+    zope.interface.implements(IGossipScheduler)
+
+    def __init__(self, call, busy, clock=None, interval=None,
+        minSeconds=None, maxSeconds=None, jitter=None, growth=None):
+        """
+        Constructor
+        """
+        if clock is None:
+            from twisted.internet import reactor
+            clock = reactor
+        if interval is None:
+            interval = config.GOSSIP_WAIT_SECONDS
+        if minSeconds is None:
+            minSeconds = interval * config.GOSSIP_WAIT_MIN_FRACTION
+        if maxSeconds is None:
+            maxSeconds = interval * config.GOSSIP_WAIT_MAX_FRACTION
+        if jitter is None:
+            jitter = config.GOSSIP_WAIT_JITTER
+        if growth is None:
+            growth = config.GOSSIP_WAIT_GROWTH
+        self._call = call
+        self._busy = busy
+        self._clock = clock
+        self._minSeconds = minSeconds
+        self._maxSeconds = maxSeconds
+        self._jitter = jitter
+        self._growth = growth
+        self._interval = min(max(interval, minSeconds), maxSeconds)
+        self._delayed = None
+
+        self.running = False
+        self.rounds = 0
+
+    def start(self):
+        """
+        Start running rounds. The first one is at a random point within
+        the first interval, so nodes started together drift apart.
+        """
+        self.running = True
+        self._schedule(random.uniform(0, self._interval))
+
+    def stop(self):
+        """
+        Stop running rounds.
+        """
+        self.running = False
+        if self._delayed is not None and self._delayed.active():
+            self._delayed.cancel()
+        self._delayed = None
+
+    def _schedule(self, delay):
+        """
+        Run the next round after delay seconds.
+        """
+        self._delayed = self._clock.callLater(delay, self._round)
+
+    def _round(self):
+        """
+        Run one round, then adapt the interval and schedule the next.
+        """
+        self._delayed = None
+        self.rounds += 1
+        try:
+            self._call()
+        except:
+            debug("Gossip round failed", error=True)
+        if not self.running:
+            return
+        self._adapt(self._busy())
+        self._schedule(self._jittered())
+
+    def _adapt(self, busy):
+        """
+        Halve the interval when busy, grow it when quiet.
+        """
+        previous = self._interval
+        if busy:
+            self._interval = max(self._minSeconds, self._interval / 2.0)
+        else:
+            self._interval = min(self._maxSeconds,
+                self._interval * self._growth)
+        if self._interval != previous:
+            debug("Gossip interval now " + "%.2f" % self._interval \
+                + " seconds.", info=True, threshold=3)
+
+    def _jittered(self):
+        """
+        The interval scaled by a random factor in 1 +/- jitter.
+        """
+        return self._interval * random.uniform(
+            1 - self._jitter, 1 + self._jitter)
+
+    def getInterval(self):
+        """
+        Current interval between rounds, before jitter.
+        """
+        return self._interval
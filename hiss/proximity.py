@@ -0,0 +1,106 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# proximity.py                                                               #
+# Round trip time estimates per external node, for latency-aware neighbor    #
+# selection. Samples come from TCP connection setup (connect to              #
+# connectionMade) and SWIM ping/ack round trips.                             #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import time
+
+# External Library Imports
+
+# Local Imports
+import config
+import connections
+import nodes
+
+### Classes ##################################################################
+class RttEstimator(object):
+    """
+    Smoothed round trip time, an exponentially weighted moving average
+    of the samples (as TCP's SRTT).
+    """
+
+    def __init__(self, alpha=None):
+        """
+        Constructor
+        """
+        if alpha is None:
+            alpha = config.PROXIMITY_RTT_ALPHA
+        self._alpha = alpha
+        self._rtt = None
+        self._samples = 0
+
+    def sample(self, rtt):
+        """
+        Fold in one round trip measurement, in seconds.
+        """
+        if rtt < 0:
+            return
+        if self._rtt is None:
+            self._rtt = float(rtt)
+        else:
+            self._rtt += self._alpha * (rtt - self._rtt)
+        self._samples += 1
+
+    def getRtt(self):
+        """
+        The smoothed round trip time, or None before any sample.
+        """
+        return self._rtt
+
+    def getSampleCount(self):
+        """
+        Number of samples seen.
+        """
+        return self._samples
+
+### Functions ################################################################
+def recordRtt(uid, rtt):
+    """
+    Record a round trip measurement for a known external node.
+    """
+    node = connections.universe.get(uid)
+    if isinstance(node, nodes.ExternalNode):
+        node.getRttEstimator().sample(rtt)
+
+def connectStarted(uid, now=None):
+    """
+    A TCP connect to this node started.
+    """
+    node = connections.universe.get(uid)
+    if isinstance(node, nodes.ExternalNode):
+        node._connectStarted = now if now is not None else time.time()
+
+def connectFinished(uid, now=None):
+    """
+    A TCP connect to this node completed; the handshake took one round
+    trip.
+    """
+    node = connections.universe.get(uid)
+    if isinstance(node, nodes.ExternalNode) \
+        and node._connectStarted is not None:
+        if now is None:
+            now = time.time()
+        node.getRttEstimator().sample(now - node._connectStarted)
+        node._connectStarted = None
+
+def getRtt(uid):
+    """
+    Smoothed round trip time to a node, or None if unmeasured.
+    """
+    node = connections.universe.get(uid)
+    if isinstance(node, nodes.ExternalNode):
+        return node.getRttEstimator().getRtt()
+    return None
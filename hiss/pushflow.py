@@ -0,0 +1,280 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# pushflow.py                                                                #
+# Push-flow averaging (Gansterer et al.), a loss tolerant form of push-sum.  #
+# Every node holds a local value x and a weight of 1. Instead of handing     #
+# over (sum, weight) mass, a node keeps a running flow to each neighbor:     #
+# sending moves a share of its mass into the flow and sends the whole flow,  #
+# and receiving a neighbor's flow f sets ours to -f. A node's mass is its    #
+# value less everything that flowed out, so the cluster-wide sum never       #
+# changes and a lost message is made good by the next one. The average is    #
+# sum / weight. Flows restart each epoch so old errors don't linger.         #
+# If only one node holds weight, sum / weight is the cluster-wide total      #
+# (PushFlowSum).                                                             #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+from __future__ import division
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+
+### Constants ################################################################
+MIN_WEIGHT = 1e-9
+"""
+Below this a node's weight is too small to divide by; the last good
+estimate stands.
+"""
+
+### Interfaces ###############################################################
+class IPushFlow(zope.interface.Interface):
+    """
+    Push-flow averaging interface
+    """
+
+    def flowTo(peer, fraction):
+        """
+        Move a share of our mass to a peer. Returns the flow to send.
+        """
+
+    def receiveFlow(peer, epoch, flowSum, flowWeight, estimate):
+        """
+        Take a peer's flow to us.
+        """
+
+    def getEstimate():
+        """
+        Current estimate of the cluster-wide average.
+        """
+
+### Classes ##################################################################
+class PushFlow(object):
+    """
+    One node's share of a push-flow average.
+    """
+
+    zope.interface.implements(IPushFlow)
+
+    def __init__(self, value, epoch=0, warmup=None):
+        """
+        Constructor
+        """
+        if warmup is None:
+            warmup = config.AGGREGATE_EPOCH_WARMUP
+        self._value = value
+        self._weight = 1.0
+        self._epoch = epoch
+        self._warmup = warmup
+        self._flows = {}
+        self._peerEstimates = {}
+        self._exchanges = 0
+        self._estimate = value
+        self._previous = None
+
+    def setLocal(self, value):
+        """
+        New local reading. The average follows without a restart.
+        """
+        if value is not None:
+            self._value = value
+            self._update()
+
+    def _mass(self):
+        """
+        (sum, weight) held here: the value less what flowed out.
+        """
+        flowSum = 0.0
+        flowWeight = 0.0
+        for (outSum, outWeight) in self._flows.itervalues():
+            flowSum += outSum
+            flowWeight += outWeight
+        return (self._value - flowSum, self._weight - flowWeight)
+
+    def _setWeight(self, weight):
+        """
+        Change the weight this node holds.
+        """
+        self._weight = weight
+        self._update()
+
+    def _update(self):
+        """
+        Recompute the estimate from our mass.
+        """
+        (massSum, massWeight) = self._mass()
+        if massWeight > MIN_WEIGHT:
+            self._estimate = massSum / massWeight
+
+    def flowTo(self, peer, fraction=0.5):
+        """
+        Move fraction of our mass to peer. Returns (epoch, sum flow,
+        weight flow, estimate) to send it.
+        """
+        (massSum, massWeight) = self._mass()
+        (outSum, outWeight) = self._flows.get(peer, (0.0, 0.0))
+        self._flows[peer] = (outSum + massSum * fraction,
+            outWeight + massWeight * fraction)
+        self._update()
+        return (self._epoch, self._flows[peer][0], self._flows[peer][1],
+            self._estimate)
+
+    def receiveFlow(self, peer, epoch, flowSum, flowWeight, estimate):
+        """
+        A peer's total flow to us. A newer epoch restarts us; an older
+        one is ignored. Returns whether it was taken.
+        """
+        if epoch < self._epoch:
+            return False
+        if epoch > self._epoch:
+            self.restart(epoch)
+        self._flows[peer] = (-flowSum, -flowWeight)
+        self._peerEstimates[peer] = estimate
+        self._exchanges += 1
+        self._update()
+        return True
+
+    def advance(self, epoch):
+        """
+        Restart if epoch is newer than ours.
+        """
+        if epoch > self._epoch:
+            self.restart(epoch)
+
+    def restart(self, epoch):
+        """
+        Drop every flow and start again from the local value. Until the
+        new epoch warms up, the last epoch's estimate is reported.
+        """
+        if self.isWarm():
+            self._previous = self._estimate
+        self._epoch = epoch
+        self._flows = {}
+        self._peerEstimates = {}
+        self._exchanges = 0
+        self._update()
+
+    def forget(self, peer):
+        """
+        A peer left. Its flow goes back into our mass.
+        """
+        self._flows.pop(peer, None)
+        self._peerEstimates.pop(peer, None)
+        self._update()
+
+    def prune(self, peers):
+        """
+        Forget every peer not in peers.
+        """
+        for peer in [peer for peer in self._flows if peer not in peers]:
+            self.forget(peer)
+
+    def isWarm(self):
+        """
+        Whether this epoch has had enough exchanges to be trusted.
+        """
+        return self._exchanges >= self._warmup
+
+    def getEstimate(self):
+        """
+        Current estimate of the cluster-wide average.
+        """
+        if not self.isWarm() and self._previous is not None:
+            return self._previous
+        return self._estimate
+
+    def getEpoch(self):
+        """
+        Current epoch.
+        """
+        return self._epoch
+
+    def getError(self):
+        """
+        Convergence error: the largest difference between our estimate
+        and a neighbor's, relative to ours. 0 when they all agree.
+        """
+        if not self._peerEstimates:
+            return None
+        spread = max(abs(estimate - self._estimate)
+            for estimate in self._peerEstimates.itervalues())
+        return spread / max(abs(self._estimate), MIN_WEIGHT)
+
+class PushFlowSum(PushFlow):
+    """
+    Push-flow total. Only the leader, the lowest uid heard from this
+    epoch, holds a weight of 1. Every node starts out as its own leader
+    and steps down on hearing of a lower uid, so it doesn't matter if
+    membership views disagree.
+    """
+
+    def __init__(self, value, uid, epoch=0, warmup=None):
+        """
+        Constructor
+        """
+        super(PushFlowSum, self).__init__(value, epoch, warmup)
+        self._uid = uid
+        self._leader = uid
+
+    def _follow(self, leader):
+        """
+        Take leader as the leader, holding the weight if it's us.
+        """
+        self._leader = leader
+        if leader == self._uid:
+            self._setWeight(1.0)
+        else:
+            self._setWeight(0.0)
+
+    def getLeader(self):
+        """
+        The uid holding the weight, as far as we know.
+        """
+        return self._leader
+
+    def flowTo(self, peer, fraction=0.5):
+        """
+        Move fraction of our mass to peer. Returns (epoch, sum flow,
+        weight flow, estimate, leader) to send it.
+        """
+        return super(PushFlowSum, self).flowTo(peer, fraction) + \
+            (self._leader,)
+
+    def receiveFlow(self, peer, epoch, flowSum, flowWeight, estimate,
+        leader):
+        """
+        A peer's total flow to us, and its leader.
+        """
+        if not super(PushFlowSum, self).receiveFlow(
+            peer, epoch, flowSum, flowWeight, estimate):
+            return False
+        if leader < self._leader:
+            self._follow(leader)
+        return True
+
+    def restart(self, epoch):
+        """
+        Start again, as our own leader.
+        """
+        super(PushFlowSum, self).restart(epoch)
+        self._follow(self._uid)
+
+    def prune(self, peers):
+        """
+        Forget every peer not in peers. If the leader is gone, lead until
+        a lower uid is heard of.
+        """
+        super(PushFlowSum, self).prune(peers)
+        if self._leader != self._uid and self._leader not in peers:
+            self._follow(self._uid)
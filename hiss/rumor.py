@@ -0,0 +1,229 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# rumor.py                                                                   #
+# Rumor mongering for gossiped network events                                #
+# (config.GOSSIP_DISSEMINATION = "rumor"). A new rumor is hot: it rides      #
+# along in every round until it has been sent lambda * log N times or this   #
+# node has heard it back k times (the feedback counter). Cold rumors are     #
+# kept a while longer so neighbors that missed them can pull them.           #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import math
+import time
+from collections import OrderedDict
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+import connections
+from debug import debug
+
+### Interfaces ###############################################################
+class IRumorMonger(zope.interface.Interface):
+    """
+    Rumor mongering interface
+    """
+
+    def spread(msg):
+        """
+        Start spreading a gossiped message.
+        """
+
+    def heard(messageId):
+        """
+        A rumor came back to us.
+        """
+
+    def takeRound():
+        """
+        Serialized hot rumors to send this round.
+        """
+
+### Classes ##################################################################
+class RumorMonger(object):
+    """
+    Feedback-counter rumor mongering (Demers et al.) with a pull phase.
+    """
+
+    zope.interface.implements(IRumorMonger)
+
+    def __init__(self, maxRumors=None, retainSeconds=None,
+        feedbackLimit=None, pullRounds=None):
+        """
+        Constructor
+        """
+        if maxRumors is None:
+            maxRumors = config.RUMOR_MAX
+        if retainSeconds is None:
+            retainSeconds = config.RUMOR_RETAIN_SECONDS
+        if feedbackLimit is None:
+            feedbackLimit = config.RUMOR_FEEDBACK_LIMIT
+        if pullRounds is None:
+            pullRounds = config.RUMOR_PULL_ROUNDS
+        self._maxRumors = maxRumors
+        self._retainSeconds = retainSeconds
+        self._feedbackLimit = feedbackLimit
+        self._pullRounds = pullRounds
+
+        self._hot = OrderedDict()
+        self._retained = OrderedDict()
+        self._round = 0
+
+        self.started = 0
+        self.stoppedByFeedback = 0
+        self.stoppedByRounds = 0
+        self.pulled = 0
+
+    def spread(self, msg, now=None):
+        """
+        Start spreading a message. Returns False if it was already hot.
+        """
+        if now is None:
+            now = time.time()
+        messageId = msg.getMessageId()
+        if messageId in self._hot:
+            return False
+        data = msg.getSerialized()
+        if not data:
+            return False
+        self._hot[messageId] = [data, adaptiveCount(
+            config.RUMOR_ROUNDS_LAMBDA), 0]
+        self._retained.pop(messageId, None)
+        self._retained[messageId] = (data, now)
+        while len(self._hot) > self._maxRumors:
+            self._hot.popitem(last=False)
+        while len(self._retained) > self._maxRumors:
+            self._retained.popitem(last=False)
+        self.started += 1
+        return True
+
+    def heard(self, messageId):
+        """
+        A rumor we're spreading came back. After k times, stop.
+        """
+        entry = self._hot.get(messageId)
+        if entry is None:
+            return
+        entry[2] += 1
+        if entry[2] >= self._feedbackLimit:
+            del self._hot[messageId]
+            self.stoppedByFeedback += 1
+            debug("Rumor " + str(messageId) + " cold after " \
+                + str(entry[2]) + " repeats", info=True, threshold=3)
+
+    def isHot(self, messageId):
+        """
+        Whether a rumor is still being spread.
+        """
+        return messageId in self._hot
+
+    def hasHot(self):
+        """
+        Whether any rumor is still being spread.
+        """
+        return bool(self._hot)
+
+    def takeRound(self):
+        """
+        Serialized hot rumors for this round. Each send uses up a round.
+        """
+        self._round += 1
+        items = []
+        for messageId in list(self._hot):
+            entry = self._hot[messageId]
+            items.append(entry[0])
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._hot[messageId]
+                self.stoppedByRounds += 1
+                debug("Rumor " + str(messageId) + " cold after its " \
+                    + "rounds", info=True, threshold=3)
+        return items
+
+    def pullDue(self):
+        """
+        Whether this round should ask a neighbor for missed rumors.
+        """
+        return self._pullRounds > 0 and self._round % self._pullRounds == 0
+
+    def _expire(self, now):
+        """
+        Forget retained rumors older than the retain period.
+        """
+        while self._retained:
+            (messageId, (data, added)) = next(self._retained.iteritems())
+            if now - added < self._retainSeconds:
+                break
+            del self._retained[messageId]
+
+    def getRecentIds(self, now=None):
+        """
+        Ids of the rumors this node knows of, for a pull request.
+        """
+        if now is None:
+            now = time.time()
+        self._expire(now)
+        return list(self._retained)
+
+    def missingFrom(self, messageIds, now=None):
+        """
+        Serialized rumors we retain that aren't in messageIds.
+        """
+        if now is None:
+            now = time.time()
+        self._expire(now)
+        known = set(messageIds)
+        missing = [data for (messageId, (data, added))
+            in self._retained.iteritems() if messageId not in known]
+        self.pulled += len(missing)
+        return missing
+
+    def getStatistics(self):
+        """
+        Counters for the status page.
+        """
+        return {"hot": len(self._hot), "retained": len(self._retained),
+            "started": self.started,
+            "stoppedByFeedback": self.stoppedByFeedback,
+            "stoppedByRounds": self.stoppedByRounds, "pulled": self.pulled}
+
+### Variables ################################################################
+monger = RumorMonger()
+"""
+This node's rumor monger.
+"""
+
+### Functions ################################################################
+def isEnabled():
+    """
+    Whether network events spread by rumor mongering.
+    """
+    return config.GOSSIP_DISSEMINATION == "rumor"
+
+def adaptiveCount(multiplier, size=None):
+    """
+    multiplier * log(N) for the universe size N, at least 1.
+    """
+    if size is None:
+        size = len(connections.universe)
+    return max(1, int(math.ceil(multiplier * math.log(size + 1))))
+
+def gossipTtl():
+    """
+    Hop count for a new gossiped message.
+    """
+    if isEnabled():
+        return adaptiveCount(config.RUMOR_TTL_LAMBDA)
+    return config.GOSSIPTTL
@@ -0,0 +1,232 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# sketch.py                                                                  #
+# DDSketch (Masson et al.): a mergeable quantile sketch with relative        #
+# error. Values fall into logarithmic buckets, bucket i holding values in    #
+# (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so any quantile is  #
+# answered within a relative accuracy of a. Merging adds bucket weights.     #
+# The bucket range is bounded by folding the smallest buckets together.      #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import math
+
+# External Library Imports
+import zope.interface
+
+# Local Imports
+import config
+import wire
+from hiss_exceptions import GeneralError
+
+### Constants ################################################################
+MIN_VALUE = 1e-9
+"""
+Values smaller than this in magnitude count as zero.
+"""
+
+### Interfaces ###############################################################
+class IQuantileSketch(zope.interface.Interface):
+    """
+    Mergeable quantile sketch interface
+    """
+
+    def add(value, weight):
+        """
+        Add a value.
+        """
+
+    def merge(other):
+        """
+        Add another sketch's values to this one.
+        """
+
+    def getQuantile(q):
+        """
+        Estimate the q-quantile, 0 <= q <= 1.
+        """
+
+### Classes ##################################################################
+class DDSketch(object):
+    """
+    DDSketch with weighted values, so it can be scaled as well as merged.
+    """
+
+    zope.interface.implements(IQuantileSketch)
+
+    def __init__(self, relativeAccuracy=None, maxBuckets=None):
+        """
+        Constructor
+        """
+        if relativeAccuracy is None:
+            relativeAccuracy = config.AGGREGATE_QUANTILE_ACCURACY
+        if maxBuckets is None:
+            maxBuckets = config.AGGREGATE_QUANTILE_MAX_BUCKETS
+        self._relativeAccuracy = relativeAccuracy
+        self._maxBuckets = maxBuckets
+        self._gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self._logGamma = math.log(self._gamma)
+        self._positive = {}
+        self._negative = {}
+        self._zero = 0.0
+
+    def _index(self, magnitude):
+        """
+        Bucket of a positive magnitude.
+        """
+        return int(math.ceil(math.log(magnitude) / self._logGamma))
+
+    def _bucketValue(self, index):
+        """
+        Representative magnitude of a bucket, within the accuracy of every
+        value in it.
+        """
+        return 2.0 * self._gamma ** index / (self._gamma + 1)
+
+    def _collapse(self, store):
+        """
+        Fold the smallest buckets of store into one until it spans at
+        most maxBuckets.
+        """
+        if len(store) < 2:
+            return
+        highest = max(store)
+        cut = highest - self._maxBuckets + 1
+        if min(store) >= cut:
+            return
+        folded = 0.0
+        for index in [index for index in store if index < cut]:
+            folded += store.pop(index)
+        store[cut] = store.get(cut, 0.0) + folded
+
+    def add(self, value, weight=1.0):
+        """
+        Add a value with a weight.
+        """
+        if value is None or weight <= 0:
+            return
+        if abs(value) < MIN_VALUE:
+            self._zero += weight
+            return
+        if value > 0:
+            store = self._positive
+        else:
+            store = self._negative
+        index = self._index(abs(value))
+        store[index] = store.get(index, 0.0) + weight
+        self._collapse(store)
+
+    def merge(self, other):
+        """
+        Add another sketch's values to this one. Both must use the same
+        accuracy.
+        """
+        if abs(other._gamma - self._gamma) > 1e-12:
+            raise GeneralError("Cannot merge sketches of different accuracy")
+        for (store, otherStore) in ((self._positive, other._positive),
+            (self._negative, other._negative)):
+            for (index, weight) in otherStore.iteritems():
+                store[index] = store.get(index, 0.0) + weight
+            self._collapse(store)
+        self._zero += other._zero
+
+    def scale(self, factor):
+        """
+        Multiply every weight by factor.
+        """
+        for store in (self._positive, self._negative):
+            for index in store:
+                store[index] *= factor
+        self._zero *= factor
+
+    def copy(self):
+        """
+        An independent copy.
+        """
+        other = DDSketch(self._relativeAccuracy, self._maxBuckets)
+        other._positive = dict(self._positive)
+        other._negative = dict(self._negative)
+        other._zero = self._zero
+        return other
+
+    def getCount(self):
+        """
+        Total weight.
+        """
+        return sum(self._positive.itervalues()) + \
+            sum(self._negative.itervalues()) + self._zero
+
+    def getQuantile(self, q):
+        """
+        Estimate the q-quantile, 0 <= q <= 1. None if empty. Walks the
+        bucket range once: O(maxBuckets).
+        """
+        count = self.getCount()
+        if count <= 0:
+            return None
+        rank = q * count
+        seen = 0.0
+        if self._negative:
+            lowest = min(self._negative)
+            for index in xrange(max(self._negative), lowest - 1, -1):
+                seen += self._negative.get(index, 0.0)
+                if seen >= rank and seen > 0:
+                    return -self._bucketValue(index)
+        seen += self._zero
+        if seen >= rank and seen > 0:
+            return 0.0
+        if self._positive:
+            highest = max(self._positive)
+            for index in xrange(min(self._positive), highest + 1):
+                seen += self._positive.get(index, 0.0)
+                if seen >= rank and seen > 0:
+                    return self._bucketValue(index)
+            return self._bucketValue(highest)
+        return 0.0
+
+    def getWireState(self):
+        """
+        (zero weight, lowest positive bucket, positive weights, lowest
+        negative bucket, negative weights). Weights are 32 bit floats
+        over each store's contiguous range.
+        """
+        return (self._zero,) + _packStore(self._positive) + \
+            _packStore(self._negative)
+
+    def setWireState(self, state):
+        """
+        Restore weights produced by getWireState().
+        """
+        (self._zero, positiveLow, positive, negativeLow, negative) = state
+        self._positive = _unpackStore(positiveLow, positive)
+        self._negative = _unpackStore(negativeLow, negative)
+
+### Functions ################################################################
+def _packStore(store):
+    """
+    (lowest index, packed weights from there to the highest).
+    """
+    if not store:
+        return (0, "")
+    lowest = min(store)
+    return (lowest, wire.packWeights([store.get(index, 0.0)
+        for index in xrange(lowest, max(store) + 1)]))
+
+def _unpackStore(lowest, packed):
+    """
+    Inverse of _packStore(). Empty buckets are left out.
+    """
+    store = {}
+    for (offset, weight) in enumerate(wire.unpackWeights(packed)):
+        if weight:
+            store[lowest + offset] = weight
+    return store
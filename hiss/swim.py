@@ -0,0 +1,556 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# swim.py                                                                    #
+# SWIM membership (Das, Gupta, Motivala). Every protocol period each node    #
+# pings one member, falling back to k indirect ping-reqs through other       #
+# members. Unanswered members become suspect and are declared dead after     #
+# a timeout unless they refute with a higher incarnation. Membership         #
+# updates ride along on probes and gossip frames, each retransmitted         #
+# about lambda * log(N) times, so the load per member stays constant.        #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import math
+import time
+import uuid
+import random
+import itertools
+
+# External Library Imports
+import zope.interface
+from twisted.internet import reactor
+
+# Local Imports
+import config
+import connections
+import dedup
+import gossip
+import me
+import message
+import nodes
+import proximity
+import udp
+from debug import debug
+
+### Constants ################################################################
+ALIVE = 0
+SUSPECT = 1
+DEAD = 2
+
+STATE_NAMES = {ALIVE: "alive", SUSPECT: "suspect", DEAD: "dead"}
+
+### Interfaces ###############################################################
+class IMembership(zope.interface.Interface):
+    """
+    Membership provider interface
+    """
+
+    def membersRefresh():
+        """
+        Refresh the member set
+        """
+
+    def getCurrentMemberDict():
+        """
+        Get uid -> BaseNode for the current members
+        """
+
+### Classes ##################################################################
+class Member(object):
+    """
+    What this node believes about one other member.
+    """
+
+    def __init__(self, uid, ip, port, state=ALIVE, incarnation=0):
+        """
+        Constructor
+        """
+        self.uid = uid
+        self.ip = ip
+        self.port = port
+        self.state = state
+        self.incarnation = incarnation
+        self.suspected = None
+
+    def getRecord(self):
+        """
+        Wire form: (uid, ip, port, state, incarnation)
+        """
+        return (self.uid, self.ip, self.port, self.state, self.incarnation)
+
+class SwimMembership(object):
+    """
+    SWIM failure detection and dissemination for this node.
+    send(uid, msg) delivers a message to a member and returns whether it
+    went out; the default goes over the member's gossip connection.
+    Timeouts are scheduled on clock (the reactor by default).
+    """
+
+    zope.interface.implements(IMembership)
+
+    def __init__(self, uid, ip, port, send=None, clock=None):
+        """
+        Constructor
+        """
+        self._uid = uid
+        self._ip = ip
+        self._port = port
+        self._incarnation = 0
+        self._send = send or _sendToMember
+        self._clock = clock or reactor
+
+        self._members = {}
+        self._dead = dedup.SeenCache(config.DEDUP_CACHE_SIZE,
+            config.SWIM_DEAD_MEMORY_SECONDS)
+        self._updates = {}
+        self._probeOrder = []
+        self._sequence = itertools.count(1)
+        self._pending = {}
+        self._sentAt = {}
+        self._relays = {}
+        self._pendingSync = set([])
+
+        self.probes = 0
+        self.indirectProbes = 0
+        self.suspicions = 0
+        self.refutations = 0
+
+    ### Queries ##############################################################
+    def getRecord(self):
+        """
+        This node's own membership record.
+        """
+        return (self._uid, self._ip, self._port, ALIVE, self._incarnation)
+
+    def getIncarnation(self):
+        """
+        This node's incarnation number.
+        """
+        return self._incarnation
+
+    def getMember(self, uid):
+        """
+        Get the Member for a uid, or None.
+        """
+        return self._members.get(uid)
+
+    def getMembers(self, states=(ALIVE, SUSPECT)):
+        """
+        Get the uids of members in the given states.
+        """
+        return [uid for uid in self._members
+            if self._members[uid].state in states]
+
+    def getCurrentMemberDict(self):
+        """
+        Alive and suspect members (and this node) as uid -> BaseNode.
+        """
+        result = {}
+        for uid in self.getMembers():
+            member = self._members[uid]
+            result[uid] = nodes.BaseNode(
+                member.ip, member.port, uuid.UUID(uid))
+        result[self._uid] = me.getMe().getBaseData()
+        return result
+
+    def getStatistics(self):
+        """
+        Protocol counters as a dictionary.
+        """
+        return {
+            'members': len(self.getMembers()),
+            'suspect': len(self.getMembers((SUSPECT,))),
+            'incarnation': self._incarnation,
+            'updates': len(self._updates),
+            'probes': self.probes,
+            'indirect': self.indirectProbes,
+            'suspicions': self.suspicions,
+            'refutations': self.refutations,
+            }
+
+    ### Dissemination ########################################################
+    def _enqueue(self, record):
+        """
+        Queue a membership update for piggybacking. A newer update about
+        the same member replaces an older one.
+        """
+        self._updates[record[0]] = [record, 0]
+
+    def _retransmitLimit(self):
+        """
+        How many times each update is piggybacked: lambda * log(N).
+        """
+        size = len(self._members) + 1
+        return max(1, int(math.ceil(
+            config.SWIM_RETRANSMIT_MULTIPLIER * math.log(size + 1))))
+
+    def piggyback(self):
+        """
+        Take the least-transmitted updates to ride along on a message.
+        Updates are dropped once sent _retransmitLimit() times.
+        """
+        if not self._updates:
+            return []
+        limit = self._retransmitLimit()
+        chosen = sorted(self._updates.values(),
+            key=lambda entry: entry[1])[:config.SWIM_MAX_PIGGYBACK]
+        records = []
+        for entry in chosen:
+            records.append(entry[0])
+            entry[1] += 1
+            if entry[1] >= limit:
+                del self._updates[entry[0][0]]
+        return records
+
+    def createUpdateMessage(self):
+        """
+        Membership updates to add to a gossip batch, or None.
+        """
+        records = self.piggyback()
+        if not records:
+            return None
+        return message.SwimUpdateMessage(records)
+
+    def greeting(self):
+        """
+        Message sent on every new connection: this node's own record.
+        """
+        return message.SwimUpdateMessage([self.getRecord()])
+
+    def apply(self, record, now=None):
+        """
+        Apply one membership update using SWIM's precedence rules.
+        Returns True if it changed what we believe.
+        """
+        (uid, ip, port, state, incarnation) = record
+        if now is None:
+            now = time.time()
+
+        if uid == self._uid:
+            if state != ALIVE and incarnation >= self._incarnation:
+                self._incarnation = incarnation + 1
+                self._enqueue(self.getRecord())
+                self.refutations += 1
+                debug("Refuting " + STATE_NAMES[state] + " rumor about me," \
+                    + " incarnation now " + str(self._incarnation), info=True)
+            return False
+
+        if uid in self._dead:
+            return False
+
+        member = self._members.get(uid)
+        if member is None:
+            if state == DEAD:
+                self._dead.add(uid)
+                self._enqueue(record)
+                return True
+            member = Member(uid, ip, port, state, incarnation)
+            if state == SUSPECT:
+                member.suspected = now
+            self._members[uid] = member
+            self._probeOrder.insert(
+                random.randint(0, len(self._probeOrder)), uid)
+            self._enqueue(record)
+            _addNode(uid, ip, port)
+            debug("SWIM: member joined " + uid, info=True)
+            return True
+
+        if state == ALIVE:
+            override = incarnation > member.incarnation
+        elif state == SUSPECT:
+            override = incarnation > member.incarnation or \
+                (incarnation == member.incarnation and member.state == ALIVE)
+        else:
+            override = True
+        if not override:
+            return False
+
+        member.incarnation = incarnation
+        member.state = state
+        member.suspected = now if state == SUSPECT else None
+        self._enqueue(member.getRecord())
+        if state == DEAD:
+            self._bury(uid)
+        return True
+
+    def applyAll(self, records, now=None):
+        """
+        Apply a list of updates.
+        """
+        for record in records:
+            self.apply(tuple(record), now)
+
+    ### Failure Detection ####################################################
+    def _nextTarget(self):
+        """
+        Next member to probe: round robin over a shuffled list, so every
+        member is probed within one pass.
+        """
+        while self._probeOrder:
+            uid = self._probeOrder.pop(0)
+            if uid in self._members:
+                self._probeOrder.append(uid)
+                return uid
+        return None
+
+    def probe(self, now=None):
+        """
+        One protocol period: expire suspects, catch up new members, then
+        ping the next member.
+        """
+        if now is None:
+            now = time.time()
+        self._expireSuspects(now)
+        self._syncNewMembers()
+
+        target = self._nextTarget()
+        if target is None:
+            return None
+        seq = self._sequence.next()
+        self._pending[seq] = target
+        self._sentAt[seq] = self._clock.seconds()
+        self.probes += 1
+        self._send(target, message.SwimPingMessage(seq, self.piggyback()))
+        self._clock.callLater(config.SWIM_PROBE_TIMEOUT,
+            self._probeTimedOut, seq, target)
+        return target
+
+    def _probeTimedOut(self, seq, target):
+        """
+        No direct ack. Ask k other members to probe the target for us.
+        """
+        if seq not in self._pending:
+            return
+        member = self._members.get(target)
+        if member is None:
+            del self._pending[seq]
+            self._sentAt.pop(seq, None)
+            return
+        helpers = [uid for uid in self.getMembers((ALIVE,)) if uid != target]
+        helpers = random.sample(helpers,
+            min(config.SWIM_INDIRECT_PROBES, len(helpers)))
+        for helper in helpers:
+            self.indirectProbes += 1
+            self._send(helper, message.SwimPingReqMessage(
+                seq, (target, member.ip, member.port), self.piggyback()))
+        self._clock.callLater(
+            max(config.SWIM_PROBE_INTERVAL - config.SWIM_PROBE_TIMEOUT,
+                config.SWIM_PROBE_TIMEOUT),
+            self._probeFailed, seq, target)
+
+    def _probeFailed(self, seq, target):
+        """
+        Neither direct nor indirect ack by the end of the period.
+        """
+        self._sentAt.pop(seq, None)
+        if self._pending.pop(seq, None) is not None:
+            self.suspect(target)
+
+    def suspect(self, uid, now=None):
+        """
+        Start suspecting a member and tell everyone.
+        """
+        member = self._members.get(uid)
+        if member is None or member.state != ALIVE:
+            return
+        if now is None:
+            now = time.time()
+        member.state = SUSPECT
+        member.suspected = now
+        self.suspicions += 1
+        self._enqueue(member.getRecord())
+        debug("SWIM: suspecting " + uid, info=True)
+
+    def _suspectTimeout(self):
+        """
+        Seconds a suspect has to refute before being declared dead.
+        Grows with log(N) to give the refutation time to spread.
+        """
+        size = len(self._members) + 1
+        return config.SWIM_SUSPECT_MULTIPLIER * max(1.0, math.log(size)) \
+            * config.SWIM_PROBE_INTERVAL
+
+    def _expireSuspects(self, now):
+        """
+        Declare suspects dead once their timeout passes.
+        """
+        timeout = self._suspectTimeout()
+        for uid in self.getMembers((SUSPECT,)):
+            member = self._members[uid]
+            if now - member.suspected >= timeout:
+                member.state = DEAD
+                self._enqueue(member.getRecord())
+                debug("SWIM: declaring dead " + uid, info=True)
+                self._bury(uid)
+
+    def _bury(self, uid):
+        """
+        Forget a dead member.
+        """
+        self._members.pop(uid, None)
+        self._dead.add(uid)
+        self._pendingSync.discard(uid)
+        if uid in connections.universe:
+            connections.deadNode(uid)
+
+    def _syncNewMembers(self):
+        """
+        Send the full member list to members that joined through us, once
+        we have a connection to them.
+        """
+        for uid in list(self._pendingSync):
+            if uid not in self._members:
+                self._pendingSync.discard(uid)
+                continue
+            records = [self.getRecord()] + [self._members[other].getRecord()
+                for other in self._members if other != uid]
+            if self._send(uid, message.SwimUpdateMessage(records)):
+                self._pendingSync.discard(uid)
+
+    ### Message Handlers #####################################################
+    def onPing(self, sender, seq, records):
+        """
+        Answer a direct ping.
+        """
+        self.applyAll(records)
+        self._send(sender,
+            message.SwimAckMessage(seq, self._uid, self.piggyback()))
+
+    def onPingReq(self, sender, seq, target, records):
+        """
+        Probe target on behalf of sender and relay the ack.
+        """
+        self.applyAll(records)
+        (targetUid, ip, port) = target
+        if targetUid not in self._members:
+            self.apply((targetUid, ip, port, ALIVE, 0))
+        relaySeq = self._sequence.next()
+        self._relays[relaySeq] = (sender, seq, targetUid)
+        self._send(targetUid,
+            message.SwimPingMessage(relaySeq, self.piggyback()))
+        self._clock.callLater(config.SWIM_PROBE_INTERVAL,
+            self._relays.pop, relaySeq, None)
+
+    def onAck(self, sender, seq, target, records):
+        """
+        An ack, either for our own probe or for one we relayed.
+        """
+        self.applyAll(records)
+        if seq in self._relays:
+            (requester, requestSeq, targetUid) = self._relays.pop(seq)
+            self._send(requester,
+                message.SwimAckMessage(requestSeq, targetUid, []))
+        else:
+            sentAt = self._sentAt.pop(seq, None)
+            if self._pending.pop(seq, None) == sender == target \
+                and sentAt is not None:
+                # A direct ack is one heartbeat round trip.
+                proximity.recordRtt(sender, self._clock.seconds() - sentAt)
+
+    def onUpdate(self, sender, records):
+        """
+        Membership updates on their own (gossip frame or greeting). A
+        member that introduced itself to us gets the full list back.
+        """
+        newcomer = sender != self._uid and sender not in self._members
+        self.applyAll(records)
+        if newcomer and sender in self._members:
+            self._pendingSync.add(sender)
+
+### Variables ################################################################
+engine = None
+"""
+The SWIM engine for this node, created by init().
+"""
+
+### Functions ################################################################
+def _sendToMember(uid, msg):
+    """
+    Send a message over the member's gossip connection, opening one if
+    needed. Messages are allowed to get lost; SWIM's timeouts cover it.
+    """
+    node = connections.universe.get(uid)
+    if node is None or node is me.getMe():
+        return False
+    if udp.isEnabled() and udp.sendMessage(node, msg):
+        return True
+    if not node.hasTCPConnection():
+        connections.pool.connect(uid)
+        return False
+    node.getTCPConnection().dispatchMessage(msg)
+    return True
+
+def _addNode(uid, ip, port):
+    """
+    Make a newly joined member known to the connection layer.
+    """
+    if uid not in connections.universe:
+        connections.createNode(uuid.UUID(uid), ip, port)
+
+def init():
+    """
+    Create the engine for this node.
+    """
+    global engine
+    node = me.getMe()
+    engine = SwimMembership(node.getUid(), node.getIp(), node.getPort())
+
+def join(seeds=None):
+    """
+    Connect to the seed nodes. The greeting sent on each new connection
+    introduces us; the seed answers with its member list.
+    """
+    if seeds is None:
+        seeds = config.SWIM_SEEDS
+    for seed in seeds:
+        (host, port) = seed.rsplit(":", 1)
+        debug("SWIM: joining through " + seed, info=True)
+        gossip.gossipClientConnect(host, int(port))
+
+def probe():
+    """
+    Run one protocol period.
+    """
+    if engine is not None:
+        engine.probe()
+
+def greeting():
+    """
+    Get the greeting message for a new connection.
+    """
+    return engine.greeting()
+
+def createUpdateMessage():
+    """
+    Get membership updates to piggyback on a gossip batch, or None.
+    """
+    if engine is None:
+        return None
+    return engine.createUpdateMessage()
+
+def membersRefresh():
+    """
+    Nothing to poll; SWIM membership is updated as messages arrive.
+    """
+    pass
+
+def getCurrentMemberDict():
+    """
+    Get the local member set.
+    """
+    return engine.getCurrentMemberDict()
+
+def getStatistics():
+    """
+    Get SWIM protocol counters.
+    """
+    return engine.getStatistics()
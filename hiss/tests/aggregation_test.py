@@ -13,10 +13,14 @@
 
 ### Imports ##################################################################
 # Python Library Imports
+import uuid
 import unittest
 
 # Local Imports
 import Hiss.hiss.aggregation
+import Hiss.hiss.me
+import Hiss.hiss.nodes
+from Hiss.hiss.hiss_exceptions import GeneralError
 
 ### Test Classes #############################################################
 
@@ -37,6 +41,18 @@ class TestFunctions(unittest.TestCase):
     def test_refreshAll(self):
         pass
 
+    def test_getDigest(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        low = Hiss.hiss.aggregation.QuantileAggregator('load', lambda: 4.0)
+        high = Hiss.hiss.aggregation.QuantileAggregator('load', lambda: 4.0)
+        high.reduce(low.share(1))
+        self.assertNotEqual(low.getWireState(), high.getWireState())
+        self.assertEqual(Hiss.hiss.aggregation.getDigest(low),
+            Hiss.hiss.aggregation.getDigest(high))
+        average = Hiss.hiss.aggregation.AverageAggregator(
+            'load', lambda: 4.0)
+        self.assertEqual(Hiss.hiss.aggregation.getDigest(average), None)
+
 class TestAggregator(unittest.TestCase):
 
     def setUp(self):
@@ -74,16 +90,137 @@ class TestNamedAggregator(unittest.TestCase):
 
 class TestAverageAggregator(unittest.TestCase):
 
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.local = 4.0
+        self.average = Hiss.hiss.aggregation.AverageAggregator(
+            'stat', lambda: self.local)
+
     def test_refresh(self):
-        pass
+        self.local = 8.0
+        self.average.refresh()
+        self.assertEqual(self.average.getValue(), 8.0)
 
-    def test_reduce(self, other):
-        pass
+    def test_reduce(self):
+        other = Hiss.hiss.aggregation.emptyAggregator(
+            Hiss.hiss.aggregation.AverageAggregator, 'stat')
+        other.setWireState(('x', 100.0))
+        self.average.reduce(other)
+        self.assertEqual(self.average.getValue(), 4.0)
+        self.assertEqual(other.getValue(), 100.0)
+
+    def test_flows(self):
+        flow = self.average.getFlow()
+        (epoch, flowSum, flowWeight, estimate) = flow.flowTo('a', 0.5)
+        flow.receiveFlow('a', epoch, 8.0, 1.0, 6.0)
+        self.assertAlmostEqual(self.average.getValue(), 6.0)
+        self.assertTrue('error' in self.average.getStatistic())
 
 class TestSumAggregator(unittest.TestCase):
 
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+
     def test_reduce(self):
-        pass
+        total = Hiss.hiss.aggregation.SumAggregator('stat', lambda: 3.0)
+        other = Hiss.hiss.aggregation.emptyAggregator(
+            Hiss.hiss.aggregation.SumAggregator, 'stat')
+        other.setWireState(('x', 100.0))
+        total.reduce(other)
+        self.assertEqual(total.getValue(), 3.0)
+
+    def test_leader(self):
+        total = Hiss.hiss.aggregation.SumAggregator('stat', lambda: 3.0)
+        flow = total.getFlow()
+        state = flow.flowTo('0' * 32, 0.5)
+        flow.receiveFlow('0' * 32, state[0], 4.0, 0.0, 7.0, '0' * 32)
+        self.assertEqual(flow.getLeader(), '0' * 32)
+
+    def test_count(self):
+        count = Hiss.hiss.aggregation.CountAggregator('nodes')
+        self.assertEqual(count.getValue(), 1)
+
+class TestQuantileAggregator(unittest.TestCase):
+
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.statistics = Hiss.hiss.aggregation.STATISTICS
+
+    def tearDown(self):
+        Hiss.hiss.aggregation.STATISTICS = self.statistics
+
+    def test_shareAndReduce(self):
+        low = Hiss.hiss.aggregation.QuantileAggregator('load', lambda: 1.0)
+        high = Hiss.hiss.aggregation.QuantileAggregator('load', lambda: 9.0)
+        shared = low.share(1)
+        self.assertAlmostEqual(low.getSketch().getCount(), 0.5)
+        high.reduce(shared)
+        self.assertAlmostEqual(high.getSketch().getCount(), 1.5)
+        self.assertAlmostEqual(high.getQuantile(0.0), 1.0, delta=0.1)
+        self.assertAlmostEqual(high.getQuantile(1.0), 9.0, delta=0.1)
+
+    def test_wireState(self):
+        agg = Hiss.hiss.aggregation.QuantileAggregator('load', lambda: 4.0)
+        Hiss.hiss.aggregation.STATISTICS = {'load': agg}
+        other = Hiss.hiss.aggregation.fromWireState(
+            'load', agg.getWireState())
+        self.assertAlmostEqual(other.getValue(), 4.0, delta=0.1)
+        self.assertAlmostEqual(Hiss.hiss.aggregation.getAggregation(
+            'load', quantile=0.99), 4.0, delta=0.1)
+        stat = agg.getStatistic()
+        self.assertTrue('p50' in stat and 'p99' in stat)
+
+    def test_reduceOther(self):
+        agg = Hiss.hiss.aggregation.QuantileAggregator('load', lambda: 4.0)
+        other = Hiss.hiss.aggregation.QuantileAggregator('cpu', lambda: 4.0)
+        self.assertRaises(GeneralError, agg.reduce, other)
+
+class TestCardinalityAggregator(unittest.TestCase):
+
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+
+    def nodeCount(self, uid=None):
+        node = Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081)
+        if uid is not None:
+            node._uid = uid
+        Hiss.hiss.me.init(node)
+        return Hiss.hiss.aggregation.CardinalityAggregator('nodecount')
+
+    def test_countsNodes(self):
+        # Fixed uids: with random ones, two nodes sometimes share a
+        # register and the estimate is 4.
+        counts = [self.nodeCount(uuid.UUID(int=i)) for i in range(5)]
+        for count in counts:
+            for other in counts:
+                count.reduce(other)
+        self.assertEqual([count.getValue() for count in counts], [5] * 5)
+
+    def test_applicationKeys(self):
+        keys = Hiss.hiss.aggregation.CardinalityAggregator(
+            'users', lambda: ['alice', 'bob'])
+        keys.add('carol')
+        keys.refresh()
+        self.assertEqual(keys.getValue(), 3)
+        self.assertEqual(keys.getLocalValue(), 2)
+
+    def test_epochs(self):
+        count = self.nodeCount()
+        other = self.nodeCount()
+        other.setWireState((None, count.getEpoch() - 1,
+            other.getCounter().getWireState()))
+        count.reduce(other)
+        self.assertEqual(count.getValue(), 1)
+        other.setWireState((None, count.getEpoch() + 1,
+            other.getCounter().getWireState()))
+        count.reduce(other)
+        self.assertEqual(count.getEpoch(), other.getEpoch())
+        self.assertEqual(count.getValue(), 2)
+
+    def test_reduceOther(self):
+        count = self.nodeCount()
+        other = Hiss.hiss.aggregation.CardinalityAggregator('users')
+        self.assertRaises(GeneralError, count.reduce, other)
 
 class TestMinAggregator(unittest.TestCase):
 
@@ -136,14 +273,154 @@ class TestMinMaxAverageAggregator(unittest.TestCase):
 
 class TestMinMaxAverageSumAggregator(unittest.TestCase):
 
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.agg = Hiss.hiss.aggregation.MinMaxAverageSumAggregator(
+            'stat', lambda: 5.0)
+        self.statistics = Hiss.hiss.aggregation.STATISTICS
+
+    def tearDown(self):
+        Hiss.hiss.aggregation.STATISTICS = self.statistics
+
     def test_refresh(self):
-        pass
+        self.agg.refresh()
+        self.assertEqual(self.agg.getSumAggregator().getValue(), 5.0)
 
-    def test_reduce(self, other):
-        pass
+    def test_reduce(self):
+        Hiss.hiss.aggregation.STATISTICS = {'stat': self.agg}
+        other = Hiss.hiss.aggregation.fromWireState(
+            'stat', self.agg.getWireState())
+        self.agg.reduce(other)
+        self.assertEqual(other.getSumAggregator().getValue(), 5.0)
 
     def test_getStatistic(self):
-        pass
+        stat = self.agg.getStatistic()
+        self.assertEqual(stat['sum']['value'], 5.0)
+        self.assertEqual(stat['avg']['value'], 5.0)
+        parts = [part for (part, agg) in self.agg.getFlowAggregators()]
+        self.assertEqual(parts, ['avg', 'sum'])
+
+class TestWindowedAggregator(unittest.TestCase):
+
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.statistics = Hiss.hiss.aggregation.STATISTICS
+        self.now = [1000.0]
+        self.reading = [5.0]
+        self.agg = Hiss.hiss.aggregation.WindowedMaxAggregator(
+            'stat', lambda: self.reading[0], window=100, bucketSeconds=10,
+            clock=lambda: self.now[0])
+
+    def tearDown(self):
+        Hiss.hiss.aggregation.STATISTICS = self.statistics
+
+    def test_expire(self):
+        self.reading[0] = 50.0
+        self.agg.refresh()
+        self.assertEqual(self.agg.getValue(), 50.0)
+        self.reading[0] = 7.0
+        for step in range(10):
+            self.now[0] += 10
+            self.agg.refresh()
+        self.assertEqual(self.agg.getValue(), 7.0)
+        self.assertEqual(len(self.agg.getBuckets()), 10)
+
+    def test_reduce(self):
+        Hiss.hiss.aggregation.STATISTICS = {'stat': self.agg}
+        peer = Hiss.hiss.aggregation.WindowedMaxAggregator(
+            'stat', lambda: 9.0, window=100, bucketSeconds=10,
+            clock=lambda: self.now[0])
+        other = Hiss.hiss.aggregation.fromWireState(
+            'stat', peer.getWireState())
+        self.agg.reduce(other)
+        self.assertEqual(self.agg.getValue(), 9.0)
+        self.now[0] += 200
+        self.assertEqual(self.agg.getValue(), None)
+        self.agg.reduce(other)
+        self.assertEqual(self.agg.getValue(), None)
+
+    def test_reduceOther(self):
+        other = Hiss.hiss.aggregation.WindowedMaxAggregator(
+            'other', lambda: 1.0, clock=lambda: self.now[0])
+        self.assertRaises(GeneralError, self.agg.reduce, other)
+
+    def test_getStatistic(self):
+        stat = self.agg.getStatistic()
+        self.assertEqual(stat['value'], 5.0)
+        self.assertEqual(stat['window'], 100)
+
+class TestWindowedAverageAggregator(unittest.TestCase):
+
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.now = [1000.0]
+        self.reading = [2.0]
+        self.agg = Hiss.hiss.aggregation.WindowedAverageAggregator(
+            'stat', lambda: self.reading[0], window=100, bucketSeconds=10,
+            halfLife=10, clock=lambda: self.now[0])
+
+    def test_decay(self):
+        self.now[0] += 10
+        self.reading[0] = 4.0
+        self.agg.refresh()
+        self.assertAlmostEqual(self.agg.getValue(), 10.0 / 3)
+
+    def test_share(self):
+        shared = self.agg.share(1)
+        self.assertAlmostEqual(shared.getValue(), 2.0)
+        self.assertAlmostEqual(self.agg.getBuckets()[0][1][1], 0.5)
+        self.agg.reduce(shared)
+        self.assertAlmostEqual(self.agg.getBuckets()[0][1][1], 1.0)
+
+class TestWindowedQuantileAggregator(unittest.TestCase):
+
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.now = [1000.0]
+        self.agg = Hiss.hiss.aggregation.WindowedQuantileAggregator(
+            'stat', None, window=100, bucketSeconds=10,
+            clock=lambda: self.now[0])
+
+    def test_getQuantile(self):
+        for value in range(1, 101):
+            self.agg.record(float(value))
+            self.now[0] += 0.5
+        self.assertAlmostEqual(self.agg.getQuantile(0.5), 50.0, delta=1.0)
+        self.assertAlmostEqual(self.agg.getQuantile(0.99), 99.0, delta=1.0)
+        self.now[0] += 100
+        self.assertEqual(self.agg.getQuantile(0.5), None)
+
+class TestWindowedMinMaxAverageAggregator(unittest.TestCase):
+
+    def setUp(self):
+        Hiss.hiss.me.init(Hiss.hiss.nodes.CurrentNode('127.0.0.1', 30081))
+        self.statistics = Hiss.hiss.aggregation.STATISTICS
+        # One reading for each part's constructor.
+        self.readings = [5.0, 5.0, 5.0]
+        self.agg = Hiss.hiss.aggregation.WindowedMinMaxAverageAggregator(
+            'stat', lambda: self.readings.pop(0), clock=lambda: 1000.0)
+
+    def tearDown(self):
+        Hiss.hiss.aggregation.STATISTICS = self.statistics
+
+    def test_refresh(self):
+        self.readings = [1.0]
+        self.agg.refresh()
+        self.assertEqual(self.readings, [])
+        stat = self.agg.getStatistic()
+        self.assertEqual(stat['min']['value'], 1.0)
+        self.assertEqual(stat['max']['value'], 5.0)
+        self.assertAlmostEqual(stat['avg']['value'], 3.0)
+
+    def test_reduce(self):
+        Hiss.hiss.aggregation.STATISTICS = {'stat': self.agg}
+        other = Hiss.hiss.aggregation.fromWireState(
+            'stat', self.agg.share(1).getWireState())
+        self.agg.reduce(other)
+        stat = self.agg.getStatistic()
+        self.assertEqual(stat['min']['value'], 5.0)
+        self.assertEqual(stat['max']['value'], 5.0)
+        self.assertAlmostEqual(stat['avg']['value'], 5.0)
 
 class TestUpdateAggregator(unittest.TestCase):
 
@@ -0,0 +1,206 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# connections_test.py                                                        #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import uuid
+import unittest
+
+# Local Imports
+from Hiss.hiss import connections
+from Hiss.hiss import me
+from Hiss.hiss import nodes
+
+### Test Classes #############################################################
+class FakeTransport(object):
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def getPeer(self):
+        return self
+
+    def loseConnection(self):
+        self.closed = True
+
+class FakeProducerTransport(FakeTransport):
+
+    producer = None
+
+    def __init__(self, host, port):
+        FakeTransport.__init__(self, host, port)
+        self.written = []
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def abortConnection(self):
+        self.aborted = True
+
+    def writeSequence(self, data):
+        self.written.append("".join(data))
+
+class FakeMessage(object):
+
+    def getSerialized(self):
+        return "message"
+
+    def getCode(self):
+        return "F"
+
+class TestIndexes(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.node = connections.createNode(uuid.uuid1(), '10.0.0.5', 30081)
+        self.uid = self.node.getUid()
+
+    def tearDown(self):
+        connections.removeNode(self.uid)
+
+    def test_addressIndex(self):
+        self.assertEqual(
+            connections.lookupByAddress('10.0.0.5', 30081), self.uid)
+
+    def test_transportIndex(self):
+        transport = FakeTransport('10.0.0.5', 41234)
+        connections.assignTransport(self.uid, transport)
+        self.assertEqual(connections.lookupByTransport(transport), self.uid)
+        self.assertTrue(connections.lostClientAsServer(transport))
+        self.assertEqual(connections.lookupByTransport(transport), None)
+
+    def test_foundByAddress(self):
+        transport = FakeTransport('10.0.0.5', 30081)
+        self.assertTrue(connections.foundClientAsServer(transport))
+        self.assertFalse(connections.foundClientAsServer(
+            FakeTransport('10.0.0.6', 30081)))
+
+    def test_removeCleansIndexes(self):
+        transport = FakeTransport('10.0.0.5', 41234)
+        connections.assignTransport(self.uid, transport)
+        connections.removeNode(self.uid)
+        self.assertEqual(connections.lookupByAddress('10.0.0.5', 30081), None)
+        self.assertEqual(connections.lookupByTransport(transport), None)
+        self.assertFalse(self.uid in connections.universe)
+
+    def test_duplicateKeepsLowerInitiator(self):
+        inbound = FakeTransport('10.0.0.5', 41234)
+        outbound = FakeTransport('10.0.0.5', 30081)
+        connections.assignTransport(self.uid, inbound)
+        connections.assignTransport(self.uid, outbound, True)
+        kept = self.node.getTCPConnection().getTransport()
+        if me.getUid() < self.uid:
+            self.assertTrue(kept is outbound)
+            self.assertTrue(getattr(inbound, 'closed', False))
+        else:
+            self.assertTrue(kept is inbound)
+            self.assertTrue(getattr(outbound, 'closed', False))
+
+class TestBackpressure(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.node = connections.createNode(uuid.uuid1(), '10.0.6.1', 30081)
+        self.uid = self.node.getUid()
+        self.transport = FakeProducerTransport('10.0.6.1', 30081)
+        connections.assignTransport(self.uid, self.transport, True)
+        self.connection = self.node.getTCPConnection()
+
+    def tearDown(self):
+        connections.removeNode(self.uid)
+
+    def test_registered(self):
+        self.assertTrue(self.transport.producer is self.connection)
+
+    def test_coalesceWhilePaused(self):
+        self.connection.dispatchFrame("first", "batch")
+        self.assertEqual(len(self.transport.written), 1)
+        self.transport.producer.pauseProducing()
+        self.connection.dispatchFrame("second", "batch")
+        self.connection.dispatchFrame("third", "batch")
+        self.connection.dispatchMessage(FakeMessage())
+        self.assertEqual(len(self.transport.written), 1)
+        self.transport.producer.resumeProducing()
+        self.assertEqual(len(self.transport.written), 2)
+        self.assertTrue(self.transport.written[1].endswith("third"))
+        counters = connections.pool.getBackpressure(self.uid)
+        self.assertEqual(counters,
+            {"paused": 1, "dropped": 1, "coalesced": 1})
+
+    def test_loseConnection(self):
+        self.connection.loseConnection()
+        self.assertEqual(self.transport.producer, None)
+        self.assertTrue(getattr(self.transport, 'closed', False))
+        self.assertFalse(getattr(self.transport, 'aborted', False))
+
+    def test_abortWhilePaused(self):
+        self.transport.producer.pauseProducing()
+        self.connection.dispatchFrame("held", "batch")
+        self.node.destroyTCPConnection()
+        self.assertEqual(self.transport.producer, None)
+        self.assertTrue(getattr(self.transport, 'aborted', False))
+        self.assertFalse(getattr(self.transport, 'closed', False))
+        self.connection.resumeProducing()
+        self.assertEqual(self.transport.written, [])
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.pool = connections.ConnectionPool(maxOpen=2, idleSeconds=10,
+            backoffInitial=1, backoffMax=8, jitter=0)
+        self.opened = []
+        self.uids = []
+        for i in range(3):
+            node = connections.createNode(
+                uuid.uuid1(), '10.0.5.' + str(i), 30081)
+            node.openTCPConnection = \
+                lambda uid=node.getUid(): self.opened.append(uid)
+            self.uids.append(node.getUid())
+
+    def tearDown(self):
+        for uid in self.uids:
+            connections.removeNode(uid)
+
+    def test_singleConnect(self):
+        self.assertTrue(self.pool.connect(self.uids[0], now=0))
+        self.assertFalse(self.pool.connect(self.uids[0], now=1))
+        self.assertEqual(self.opened, [self.uids[0]])
+
+    def test_backoff(self):
+        uid = self.uids[0]
+        for (failures, delay) in [(1, 1), (2, 2), (3, 4), (4, 8), (5, 8)]:
+            self.pool.connect(uid, now=100)
+            self.pool.connectFailed(uid, now=100)
+            self.assertEqual(self.pool.getRetryAt(uid), 100 + delay)
+        self.assertFalse(self.pool.connect(uid, now=107))
+        self.assertTrue(self.pool.connect(uid, now=108))
+        self.pool.connected(uid, now=109)
+        self.assertEqual(self.pool.getRetryAt(uid), 0)
+
+    def test_capAndReap(self):
+        self.pool.attached(self.uids[0], now=0)
+        self.pool.attached(self.uids[1], now=0)
+        self.assertFalse(self.pool.connect(self.uids[2], now=1))
+        self.assertEqual(self.pool.refused, 1)
+        self.pool.touch(self.uids[1], now=8)
+        self.assertEqual(self.pool.reapIdle(now=12), [self.uids[0]])
+        self.assertEqual(self.pool.getOpenCount(), 1)
+        self.assertTrue(self.pool.connect(self.uids[2], now=12))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# dedup_test.py                                                              #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# Local Imports
+from Hiss.hiss import dedup
+
+### Test Classes #############################################################
+class TestSeenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = dedup.SeenCache(capacity=4, expiry=10)
+
+    def test_check(self):
+        self.assertFalse(self.cache.check(('a', 1), now=0))
+        self.assertTrue(self.cache.check(('a', 1), now=1))
+        self.assertFalse(self.cache.check(('a', 2), now=1))
+        stats = self.cache.getStatistics()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_capacity(self):
+        for i in range(100):
+            self.cache.check(i, now=0)
+        self.assertTrue(len(self.cache) <= 4)
+        self.assertTrue(99 in self.cache)
+
+    def test_expiry(self):
+        self.cache.check('old', now=0)
+        self.cache.check('newer', now=6)
+        self.assertTrue('old' in self.cache)
+        self.cache.check('newest', now=12)
+        self.assertFalse('old' in self.cache)
+        self.assertTrue('newer' in self.cache)
+
+    def test_add(self):
+        self.cache.add('mine', now=0)
+        self.assertTrue(self.cache.check('mine', now=0))
+        self.assertEqual(self.cache.getStatistics()['misses'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# failure_detector_test.py                                                   #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# Local Imports
+from Hiss.hiss.failure_detector import PhiAccrualDetector
+
+### Test Classes #############################################################
+class TestPhiAccrual(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = PhiAccrualDetector(windowSize=10, minStdDev=0.5,
+            pause=0, firstInterval=5, minInterval=0.5, now=0)
+        for t in range(5, 55, 5):
+            self.detector.heartbeat(now=t)
+
+    def test_lowPhiOnSchedule(self):
+        self.assertTrue(self.detector.phi(now=54) < 1)
+
+    def test_phiGrowsWithSilence(self):
+        phis = [self.detector.phi(now=50 + s) for s in (5, 7, 9, 12)]
+        self.assertEqual(phis, sorted(phis))
+        self.assertTrue(phis[-1] > 8)
+        self.assertFalse(self.detector.isAvailable(now=62))
+
+    def test_burstCountsOnce(self):
+        self.detector.heartbeat(now=50.1)
+        self.detector.heartbeat(now=50.2)
+        self.assertAlmostEqual(self.detector.getMean(), 5.0)
+
+    def test_heartbeatResets(self):
+        self.detector.heartbeat(now=70)
+        self.assertTrue(self.detector.phi(now=71) < 1)
+
+    def test_earlyAndLateAfterLongIntervals(self):
+        detector = PhiAccrualDetector(windowSize=1000, minStdDev=0.5,
+            pause=0, firstInterval=10, minInterval=0.5, now=0)
+        for t in range(10, 1510, 10):
+            detector.heartbeat(now=t)
+        self.assertAlmostEqual(detector.getMean(), 10.0)
+        self.assertAlmostEqual(detector.phi(now=1500.6), 0.0)
+        self.assertTrue(detector.phi(now=2500) > 100)
+        self.assertFalse(detector.isAvailable(now=2500))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# framing_test.py                                                            #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# External Library Imports
+from twisted.test import proto_helpers
+
+# Local Imports
+from Hiss.hiss import framing
+
+### Helpers ##################################################################
+class RecordingReceiver(framing.FrameReceiver):
+    """
+    Frame receiver that just remembers what it got.
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def frameReceived(self, frame):
+        self.frames.append(frame)
+
+### Test Classes #############################################################
+class TestFrameReceiver(unittest.TestCase):
+
+    def setUp(self):
+        self.receiver = RecordingReceiver()
+        self.transport = proto_helpers.StringTransport()
+        self.receiver.makeConnection(self.transport)
+
+    def test_joinedFrames(self):
+        data = framing.frame("one") + framing.frame("") + framing.frame("two")
+        self.receiver.dataReceived(data)
+        self.assertEqual(self.receiver.frames, ["one", "", "two"])
+
+    def test_splitFrames(self):
+        data = framing.frame("hello") + framing.frame("world")
+        for i in range(len(data)):
+            self.receiver.dataReceived(data[i])
+        self.assertEqual(self.receiver.frames, ["hello", "world"])
+
+    def test_splitAcrossReads(self):
+        data = framing.frame("x" * 1000) + framing.frame("tail")
+        self.receiver.dataReceived(data[:2])
+        self.receiver.dataReceived(data[2:500])
+        self.assertEqual(self.receiver.frames, [])
+        self.receiver.dataReceived(data[500:])
+        self.assertEqual(self.receiver.frames, ["x" * 1000, "tail"])
+
+    def test_lengthLimitExceeded(self):
+        self.receiver.MAX_LENGTH = 10
+        self.receiver.dataReceived(framing.frame("x" * 11))
+        self.assertEqual(self.receiver.frames, [])
+        self.assertTrue(self.transport.disconnecting)
+
+    def test_sendFrame(self):
+        self.receiver.sendFrame("payload")
+        self.assertEqual(self.transport.value(), framing.frame("payload"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# gossip_test.py                                                             #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import uuid
+import unittest
+
+# Local Imports
+from Hiss.hiss import aggregation
+from Hiss.hiss import connections
+from Hiss.hiss import gossip
+from Hiss.hiss import me
+from Hiss.hiss import message
+from Hiss.hiss import nodes
+
+### Test Classes #############################################################
+class FakeTransport(object):
+
+    producer = None
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    def getPeer(self):
+        return self
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+class TestAggregateItems(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.statistics = aggregation.STATISTICS
+        self.agg = aggregation.QuantileAggregator('load', lambda: 4.0)
+        aggregation.STATISTICS = {'load': self.agg}
+        self.uids = []
+        for i in range(2):
+            node = connections.createNode(
+                uuid.uuid1(), '10.0.8.' + str(i), 30081)
+            self.uids.append(node.getUid())
+        self.transport = FakeTransport('10.0.8.0', 30081)
+        connections.assignTransport(self.uids[0], self.transport, True)
+
+    def tearDown(self):
+        aggregation.STATISTICS = self.statistics
+        for uid in self.uids:
+            connections.removeNode(uid)
+
+    def test_unreachable(self):
+        (items, deliverable) = gossip.createAggregateItems(self.uids)
+        self.assertEqual(deliverable, [self.uids[0]])
+        self.assertEqual(len(items), 1)
+        shared = message.buildMessage(items[0]).getPayload()
+        self.assertAlmostEqual(shared.getSketch().getCount(), 0.5)
+        self.assertAlmostEqual(self.agg.getSketch().getCount(), 0.5)
+
+    def test_paused(self):
+        self.transport.producer.pauseProducing()
+        self.assertEqual(gossip.createAggregateItems(self.uids), ([], []))
+        self.assertAlmostEqual(self.agg.getSketch().getCount(), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# hyperloglog_test.py                                                        #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# Local Imports
+from Hiss.hiss import hyperloglog
+from Hiss.hiss.hiss_exceptions import GeneralError
+
+### Test Classes #############################################################
+class TestHyperLogLog(unittest.TestCase):
+
+    def test_smallCountsExact(self):
+        counter = hyperloglog.HyperLogLog(9)
+        for i in range(20):
+            counter.add("node%d" % i)
+        self.assertTrue(abs(counter.getEstimate() - 20) < 1)
+
+    def test_duplicatesIgnored(self):
+        counter = hyperloglog.HyperLogLog(9)
+        for i in range(5):
+            for key in ('a', 'b', u'c'):
+                counter.add(key)
+        self.assertEqual(int(round(counter.getEstimate())), 3)
+
+    def test_largeCount(self):
+        counter = hyperloglog.HyperLogLog(9)
+        for i in range(20000):
+            counter.add("key%d" % i)
+        error = abs(counter.getEstimate() - 20000) / 20000.0
+        self.assertTrue(error < 4 * counter.getStandardError())
+
+    def test_mergeIsUnion(self):
+        first = hyperloglog.HyperLogLog(9)
+        second = hyperloglog.HyperLogLog(9)
+        for i in range(300):
+            first.add(i)
+            second.add(i + 150)
+        first.merge(second)
+        first.merge(second)
+        self.assertTrue(abs(first.getEstimate() - 450) < 450 * 0.1)
+
+    def test_mergeDifferentPrecision(self):
+        self.assertRaises(GeneralError, hyperloglog.HyperLogLog(9).merge,
+            hyperloglog.HyperLogLog(10))
+
+    def test_wireState(self):
+        counter = hyperloglog.HyperLogLog(9)
+        for i in range(100):
+            counter.add(i)
+        state = counter.getWireState()
+        self.assertEqual(len(state), 512)
+        restored = hyperloglog.HyperLogLog(9)
+        restored.setWireState(state)
+        self.assertEqual(restored.getEstimate(), counter.getEstimate())
+        self.assertRaises(GeneralError, restored.setWireState, "x")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# message_test.py                                                            #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# Local Imports
+from Hiss.hiss import config
+from Hiss.hiss import me
+from Hiss.hiss import message
+from Hiss.hiss import nodes
+from Hiss.hiss.hiss_exceptions import GeneralError
+
+### Test Classes #############################################################
+class TestSharedBatch(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.shared = [message.InternalLogMessage("shared %d" % i, 1)
+            .getSerialized() for i in range(3)]
+        self.batch = message.SharedBatch(self.shared)
+
+    def decode(self, parts):
+        return message.buildMessage("".join(parts)).getPayload()
+
+    def test_sharedOnly(self):
+        self.assertEqual(self.decode(self.batch.getParts()), self.shared)
+
+    def test_peerItemsFirst(self):
+        peer = [message.InternalLogMessage("peer", 1).getSerialized()]
+        parts = self.batch.getParts(peer)
+        self.assertEqual(self.decode(parts), peer + self.shared)
+        # The shared bytes are the same object for every peer.
+        self.assertTrue(parts[-1] is self.batch.getParts(peer)[-1])
+
+class TestDigestMessage(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+
+    def test_notAnEvent(self):
+        clocks = dict(me.getMe().getVectorClock().getClocks())
+        digest = message.DigestMessage.createDigestMessage()
+        self.assertEqual(digest.getPayload()[0], clocks)
+        self.assertEqual(me.getMe().getVectorClock().getClocks(), clocks)
+
+class TestBatchMessage(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.codec = config.MESSAGE_CODEC
+        config.MESSAGE_CODEC = 'binary'
+        self.items = [message.InternalLogMessage("item %d" % i, 1)
+            .getSerialized() for i in range(3)]
+        self.data = message.BatchMessage(self.items).getSerialized()
+
+    def tearDown(self):
+        config.MESSAGE_CODEC = self.codec
+
+    def test_roundTrip(self):
+        msg = message.getCodec().decode(self.data)
+        self.assertTrue(message.BatchMessage.isBatchMessage(msg))
+        self.assertEqual(msg.getPayload(), self.items)
+
+    def test_empty(self):
+        data = message.BatchMessage([]).getSerialized()
+        self.assertEqual(message.getCodec().decode(data).getPayload(), [])
+
+    def test_otherVersion(self):
+        data = chr(message.WIRE_VERSION - 1) + self.data[1:]
+        self.assertRaises(GeneralError, message.getCodec().decode, data)
+
+    def test_truncated(self):
+        for cut in (1, 3, len(self.items[-1]) + 2):
+            self.assertRaises(GeneralError,
+                message.getCodec().decode, self.data[:-cut])
+
+if __name__ == '__main__':
+    unittest.main()
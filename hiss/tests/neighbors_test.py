@@ -0,0 +1,153 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# neighbors_test.py                                                          #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import uuid
+import unittest
+
+# Local Imports
+from Hiss.hiss import connections
+from Hiss.hiss import me
+from Hiss.hiss import neighbors
+from Hiss.hiss import nodes
+
+### Test Classes #############################################################
+class TestNeighborView(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.saved = connections.neighborStrategy
+        connections.neighborStrategy = neighbors.DefaultNeighborStrategy()
+        self.strategy = connections.neighborStrategy
+        connections.addNode(me.getMe())
+        self.uids = [connections.createNode(
+            uuid.uuid1(), '10.0.1.' + str(i), 30081).getUid()
+            for i in range(10)]
+
+    def tearDown(self):
+        for uid in self.uids + [me.getUid()]:
+            connections.removeNode(uid)
+        connections.neighborStrategy = self.saved
+
+    def test_viewFollowsUniverse(self):
+        view = self.strategy._universeUids()
+        self.assertEqual(view, sorted(view))
+        for uid in self.uids:
+            self.assertTrue(uid in view)
+        connections.removeNode(self.uids[0])
+        self.assertFalse(self.uids[0] in self.strategy._universeUids())
+
+    def test_sampleExcludesMe(self):
+        for i in range(50):
+            sample = self.strategy._sampleOthers(10)
+            self.assertEqual(len(sample), 10)
+            self.assertFalse(me.getUid() in sample)
+
+    def test_cachedPerRound(self):
+        first = self.strategy.getNeighbors()
+        self.assertEqual(len(first), 2)
+        for i in range(20):
+            self.assertEqual(self.strategy.getNeighbors(), first)
+        self.strategy.newRound()
+        self.assertEqual(len(self.strategy.getNeighbors()), 2)
+
+    def test_removedNeighborInvalidates(self):
+        first = self.strategy.getNeighbors()
+        gone = list(first)[0]
+        connections.removeNode(gone)
+        self.uids.remove(gone)
+        self.assertFalse(gone in self.strategy.getNeighbors())
+
+    def test_single(self):
+        single = neighbors.SingleNeighborStrategy()
+        ordered = single._universeUids()
+        ix = ordered.index(me.getUid())
+        expected = ordered[(ix + 1) % len(ordered)]
+        self.assertEqual(single.getNeighbors(), set([expected]))
+
+class TestStableStrategies(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        connections.addNode(me.getMe())
+        self.uids = [connections.createNode(
+            uuid.uuid1(), '10.0.2.' + str(i), 30081).getUid()
+            for i in range(20)]
+
+    def tearDown(self):
+        for uid in self.uids + [me.getUid()]:
+            connections.removeNode(uid)
+
+    def test_logarithmicCount(self):
+        strategy = neighbors.LogarithmicNeighborStrategy(base=2)
+        chosen = strategy.getNeighbors()
+        self.assertTrue(len(chosen) >= 4)
+        self.assertFalse(me.getUid() in chosen)
+
+    def test_stableBetweenRotations(self):
+        strategy = neighbors.ConstantNeighborStrategy(3, rotatePeriod=5)
+        first = strategy.getNeighbors()
+        self.assertEqual(len(first), 3)
+        for i in range(4):
+            strategy.newRound()
+            self.assertEqual(strategy.getNeighbors(), first)
+        strategy.newRound()
+        rotated = strategy.getNeighbors()
+        self.assertEqual(len(rotated), 3)
+        self.assertEqual(len(rotated & first), 2)
+
+    def test_prefersConnected(self):
+        strategy = neighbors.ConstantNeighborStrategy(2, rotatePeriod=1)
+        for uid in self.uids:
+            connections.universe[uid]._tcpConnection = None
+        connected = self.uids[:2]
+        for uid in connected:
+            connections.universe[uid]._tcpConnection = object()
+        strategy.neighborSet = set(connected + self.uids[2:4])
+        self.assertEqual(strategy.getNeighbors(), set(connected))
+        for uid in connected:
+            connections.universe[uid]._tcpConnection = None
+
+    def test_factory(self):
+        for name in ["default", "random", "all", "single", "logarithmic",
+            "constant"]:
+            self.assertTrue(neighbors.neighborStrategyFactory(name))
+
+class TestProximity(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        connections.addNode(me.getMe())
+        self.uids = [connections.createNode(
+            uuid.uuid1(), '10.0.4.' + str(i), 30081).getUid()
+            for i in range(10)]
+        for (i, uid) in enumerate(self.uids):
+            connections.universe[uid].getRttEstimator().sample(0.01 * (i + 1))
+
+    def tearDown(self):
+        for uid in self.uids + [me.getUid()]:
+            connections.removeNode(uid)
+
+    def test_nearestPlusRandom(self):
+        strategy = neighbors.ProximityNeighborStrategy(4, 0.25)
+        for i in range(10):
+            strategy.newRound()
+            chosen = strategy.getNeighbors()
+            self.assertEqual(len(chosen), 4)
+            self.assertFalse(me.getUid() in chosen)
+            for uid in self.uids[:3]:
+                self.assertTrue(uid in chosen)
+
+if __name__ == '__main__':
+    unittest.main()
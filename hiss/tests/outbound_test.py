@@ -0,0 +1,85 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# outbound_test.py                                                           #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# Local Imports
+from Hiss.hiss import outbound
+
+### Test Classes #############################################################
+class FakeMessage(object):
+
+    def __init__(self, code, payload, data):
+        self._code = code
+        self._payload = payload
+        self._data = data
+
+    def getCode(self):
+        return self._code
+
+    def getPayload(self):
+        return self._payload
+
+    def getSerialized(self):
+        return self._data
+
+class FakeStat(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def getName(self):
+        return self._name
+
+class TestOutboundQueue(unittest.TestCase):
+
+    def test_priorityOrder(self):
+        queue = outbound.OutboundQueue(10)
+        queue.put(FakeMessage('EL', 'x', 'log'))
+        queue.put(FakeMessage('AG', FakeStat('cpu'), 'agg'))
+        queue.put(FakeMessage('D', 'a' * 32, 'dead'))
+        self.assertEqual(queue.takeRound(1000), ['dead', 'agg', 'log'])
+        self.assertTrue(queue.empty())
+
+    def test_mergeByKey(self):
+        queue = outbound.OutboundQueue(10)
+        queue.put(FakeMessage('AG', FakeStat('cpu'), 'old'))
+        queue.put(FakeMessage('AG', FakeStat('mem'), 'mem'))
+        queue.put(FakeMessage('AG', FakeStat('cpu'), 'new'))
+        queue.put(FakeMessage('D', 'b' * 32, 'dead'))
+        queue.put(FakeMessage('D', 'b' * 32, 'dead again'))
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.takeRound(1000), ['dead again', 'new', 'mem'])
+
+    def test_bounded(self):
+        queue = outbound.OutboundQueue(2)
+        queue.put(FakeMessage('EL', 'x', 'log'))
+        queue.put(FakeMessage('AG', FakeStat('cpu'), 'agg'))
+        self.assertTrue(queue.put(FakeMessage('D', 'c' * 32, 'dead')))
+        self.assertFalse(queue.put(FakeMessage('EL', 'y', 'log2')))
+        self.assertEqual(queue.dropped, 2)
+        self.assertEqual(queue.takeRound(1000), ['dead', 'agg'])
+
+    def test_budgetCarriesOver(self):
+        queue = outbound.OutboundQueue(10)
+        for i in range(5):
+            queue.put(FakeMessage('EL', i, 'x' * 10))
+        self.assertEqual(len(queue.takeRound(25)), 2)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(len(queue.takeRound(5)), 1)
+        self.assertEqual(len(queue.takeRound(1000)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# pacing_test.py                                                             #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# External Library Imports
+from twisted.internet import task
+
+# Local Imports
+from Hiss.hiss import pacing
+
+### Test Classes #############################################################
+class TestGossipScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.calls = 0
+        self.busy = False
+
+    def call(self):
+        self.calls += 1
+
+    def isBusy(self):
+        return self.busy
+
+    def scheduler(self, jitter=0.0):
+        return pacing.GossipScheduler(self.call, self.isBusy, self.clock,
+            4.0, 1.0, 8.0, jitter, 2.0)
+
+    def test_firstRoundWithinInterval(self):
+        scheduler = self.scheduler()
+        scheduler.start()
+        self.clock.advance(4.0)
+        self.assertEqual(self.calls, 1)
+
+    def test_quietGrows(self):
+        scheduler = self.scheduler()
+        scheduler.start()
+        self.clock.advance(4.0)
+        self.assertEqual(scheduler.getInterval(), 8.0)
+        self.clock.advance(8.0)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(scheduler.getInterval(), 8.0)
+
+    def test_busyShrinks(self):
+        self.busy = True
+        scheduler = self.scheduler()
+        scheduler.start()
+        self.clock.advance(4.0)
+        self.assertEqual(scheduler.getInterval(), 2.0)
+        self.clock.advance(2.0)
+        self.assertEqual(scheduler.getInterval(), 1.0)
+        self.clock.advance(1.0)
+        self.assertEqual(scheduler.getInterval(), 1.0)
+        self.assertEqual(self.calls, 3)
+
+    def test_jitterBounds(self):
+        scheduler = self.scheduler(0.5)
+        for i in range(100):
+            delay = scheduler._jittered()
+            self.assertTrue(2.0 <= delay <= 6.0)
+
+    def test_stop(self):
+        scheduler = self.scheduler()
+        scheduler.start()
+        scheduler.stop()
+        self.clock.advance(100.0)
+        self.assertEqual(self.calls, 0)
+        self.assertFalse(self.clock.getDelayedCalls())
+
+    def test_failedRoundContinues(self):
+        def fail():
+            self.calls += 1
+            raise ValueError()
+        scheduler = pacing.GossipScheduler(fail, self.isBusy, self.clock,
+            4.0, 1.0, 8.0, 0.0, 1.0)
+        scheduler.start()
+        self.clock.advance(4.0)
+        self.clock.advance(4.0)
+        self.assertEqual(self.calls, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# proximity_test.py                                                          #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import uuid
+import unittest
+
+# Local Imports
+from Hiss.hiss import connections
+from Hiss.hiss import me
+from Hiss.hiss import nodes
+from Hiss.hiss import proximity
+
+### Test Classes #############################################################
+class TestRttEstimator(unittest.TestCase):
+
+    def test_firstSample(self):
+        estimator = proximity.RttEstimator(0.5)
+        self.assertEqual(estimator.getRtt(), None)
+        estimator.sample(0.2)
+        self.assertAlmostEqual(estimator.getRtt(), 0.2)
+
+    def test_smoothing(self):
+        estimator = proximity.RttEstimator(0.5)
+        estimator.sample(0.2)
+        estimator.sample(0.4)
+        self.assertAlmostEqual(estimator.getRtt(), 0.3)
+        estimator.sample(-1)
+        self.assertEqual(estimator.getSampleCount(), 2)
+
+class TestHandshake(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.uid = connections.createNode(
+            uuid.uuid1(), '10.0.3.1', 30081).getUid()
+
+    def tearDown(self):
+        connections.removeNode(self.uid)
+
+    def test_connectRoundTrip(self):
+        proximity.connectStarted(self.uid, now=100.0)
+        proximity.connectFinished(self.uid, now=100.05)
+        self.assertAlmostEqual(proximity.getRtt(self.uid), 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# pushflow_test.py                                                           #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import random
+import unittest
+
+# Local Imports
+from Hiss.hiss import pushflow
+
+### Test Classes #############################################################
+class TestPushFlow(unittest.TestCase):
+
+    def exchange(self, flows, sender, receiver, fraction=0.5, lost=False):
+        (epoch, flowSum, flowWeight, estimate) = \
+            flows[sender].flowTo(receiver, fraction)
+        if not lost:
+            flows[receiver].receiveFlow(
+                sender, epoch, flowSum, flowWeight, estimate)
+
+    def cluster(self, values):
+        return dict((i, pushflow.PushFlow(value, 0, 0))
+            for (i, value) in enumerate(values))
+
+    def test_pair(self):
+        flows = self.cluster([0.0, 10.0])
+        for i in range(50):
+            self.exchange(flows, 0, 1)
+            self.exchange(flows, 1, 0)
+        self.assertAlmostEqual(flows[0].getEstimate(), 5.0)
+        self.assertAlmostEqual(flows[1].getEstimate(), 5.0)
+
+    def test_convergesWithLoss(self):
+        random.seed(7)
+        values = [float(random.randint(0, 100)) for i in range(20)]
+        flows = self.cluster(values)
+        for round in range(200):
+            for sender in flows:
+                receiver = random.choice([i for i in flows if i != sender])
+                self.exchange(flows, sender, receiver,
+                    lost=random.random() < 0.2)
+        average = sum(values) / len(values)
+        for flow in flows.values():
+            self.assertAlmostEqual(flow.getEstimate(), average, 3)
+            self.assertTrue(flow.getError() < 1e-3)
+
+    def test_massConserved(self):
+        flows = self.cluster([1.0, 2.0, 6.0])
+        self.exchange(flows, 0, 1)
+        self.exchange(flows, 1, 2)
+        self.exchange(flows, 2, 0)
+        total = sum(flow._mass()[0] for flow in flows.values())
+        weight = sum(flow._mass()[1] for flow in flows.values())
+        self.assertAlmostEqual(total, 9.0)
+        self.assertAlmostEqual(weight, 3.0)
+
+    def test_forget(self):
+        flows = self.cluster([0.0, 10.0])
+        self.exchange(flows, 0, 1)
+        flows[1].forget(0)
+        self.assertAlmostEqual(flows[1].getEstimate(), 10.0)
+
+    def test_epochs(self):
+        flow = pushflow.PushFlow(4.0, 1, 1)
+        self.assertFalse(flow.receiveFlow('a', 0, 1.0, 0.5, 2.0))
+        flow.receiveFlow('a', 1, -4.0, -1.0, 6.0)
+        self.assertAlmostEqual(flow.getEstimate(), 4.0)
+        flow.setLocal(2.0)
+        flow.advance(2)
+        self.assertEqual(flow.getEpoch(), 2)
+        self.assertAlmostEqual(flow.getEstimate(), 4.0)
+        flow.receiveFlow('a', 2, 0.0, 0.0, 2.0)
+        self.assertAlmostEqual(flow.getEstimate(), 2.0)
+
+class TestPushFlowSum(unittest.TestCase):
+
+    def cluster(self, values):
+        return dict((uid, pushflow.PushFlowSum(value, uid, 0, 0))
+            for (uid, value) in values.items())
+
+    def gossip(self, flows, rounds):
+        for round in range(rounds):
+            for sender in flows:
+                receiver = random.choice(
+                    [uid for uid in flows if uid != sender])
+                state = flows[sender].flowTo(receiver, 0.5)
+                flows[receiver].receiveFlow(sender, *state)
+
+    def test_sum(self):
+        random.seed(3)
+        values = dict(('%02d' % i, float(i)) for i in range(10))
+        flows = self.cluster(values)
+        self.gossip(flows, 200)
+        for flow in flows.values():
+            self.assertEqual(flow.getLeader(), '00')
+            self.assertAlmostEqual(flow.getEstimate(), 45.0, 3)
+
+    def test_count(self):
+        random.seed(4)
+        flows = self.cluster(dict(('%02d' % i, 1.0) for i in range(7)))
+        self.gossip(flows, 200)
+        for flow in flows.values():
+            self.assertAlmostEqual(flow.getEstimate(), 7.0, 3)
+
+    def test_leaderLeaves(self):
+        random.seed(5)
+        flows = self.cluster({'a': 1.0, 'b': 2.0, 'c': 3.0})
+        self.gossip(flows, 50)
+        del flows['a']
+        for flow in flows.values():
+            flow.prune(['b', 'c'])
+        self.gossip(flows, 200)
+        for flow in flows.values():
+            self.assertEqual(flow.getLeader(), 'b')
+            self.assertAlmostEqual(flow.getEstimate(), 5.0, 3)
+
+if __name__ == '__main__':
+    unittest.main()
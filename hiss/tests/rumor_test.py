@@ -0,0 +1,91 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# rumor_test.py                                                              #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+
+# Local Imports
+from Hiss.hiss import config
+from Hiss.hiss import rumor
+
+### Test Classes #############################################################
+class FakeMessage(object):
+
+    def __init__(self, messageId, data):
+        self._messageId = messageId
+        self._data = data
+
+    def getMessageId(self):
+        return self._messageId
+
+    def getSerialized(self):
+        return self._data
+
+class TestRumorMonger(unittest.TestCase):
+
+    def test_spreadOnce(self):
+        monger = rumor.RumorMonger(10, 60, 2, 5)
+        self.assertTrue(monger.spread(FakeMessage(('a', 1), 'one'), 0))
+        self.assertFalse(monger.spread(FakeMessage(('a', 1), 'one'), 0))
+        self.assertEqual(monger.takeRound(), ['one'])
+
+    def test_feedbackStops(self):
+        monger = rumor.RumorMonger(10, 60, 2, 5)
+        monger.spread(FakeMessage(('a', 1), 'one'), 0)
+        monger.heard(('a', 1))
+        self.assertTrue(monger.isHot(('a', 1)))
+        monger.heard(('a', 1))
+        self.assertFalse(monger.isHot(('a', 1)))
+        self.assertEqual(monger.takeRound(), [])
+        self.assertEqual(monger.getStatistics()["stoppedByFeedback"], 1)
+
+    def test_roundsRunOut(self):
+        monger = rumor.RumorMonger(10, 60, 2, 5)
+        monger.spread(FakeMessage(('a', 1), 'one'), 0)
+        self.assertEqual(monger.takeRound(), ['one'])
+        self.assertEqual(monger.takeRound(), [])
+        self.assertEqual(monger.getStatistics()["stoppedByRounds"], 1)
+
+    def test_pull(self):
+        monger = rumor.RumorMonger(10, 60, 2, 5)
+        monger.spread(FakeMessage(('a', 1), 'one'), 0)
+        monger.spread(FakeMessage(('b', 2), 'two'), 0)
+        self.assertEqual(monger.getRecentIds(1), [('a', 1), ('b', 2)])
+        self.assertEqual(monger.missingFrom([('a', 1)], 1), ['two'])
+        self.assertEqual(monger.missingFrom([], 61), [])
+
+    def test_pullDue(self):
+        monger = rumor.RumorMonger(10, 60, 2, 2)
+        monger.takeRound()
+        self.assertFalse(monger.pullDue())
+        monger.takeRound()
+        self.assertTrue(monger.pullDue())
+
+class TestAdaptiveCount(unittest.TestCase):
+
+    def test_growsWithSize(self):
+        self.assertEqual(rumor.adaptiveCount(1.0, 0), 1)
+        self.assertTrue(rumor.adaptiveCount(2.0, 1000) >
+            rumor.adaptiveCount(2.0, 10))
+
+    def test_floodTtl(self):
+        mode = config.GOSSIP_DISSEMINATION
+        config.GOSSIP_DISSEMINATION = "flood"
+        try:
+            self.assertEqual(rumor.gossipTtl(), config.GOSSIPTTL)
+        finally:
+            config.GOSSIP_DISSEMINATION = mode
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# sketch_test.py                                                             #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import random
+import unittest
+
+# Local Imports
+from Hiss.hiss import sketch
+from Hiss.hiss import wire
+from Hiss.hiss.hiss_exceptions import GeneralError
+
+### Test Classes #############################################################
+class TestDDSketch(unittest.TestCase):
+
+    def assertWithin(self, estimate, exact, accuracy=0.01):
+        self.assertTrue(abs(estimate - exact) <= accuracy * abs(exact) + 1e-9,
+            "%r not within %r of %r" % (estimate, accuracy, exact))
+
+    def test_quantiles(self):
+        random.seed(11)
+        values = sorted(random.uniform(0.1, 100.0) for i in range(5000))
+        ddsketch = sketch.DDSketch(0.01, 2048)
+        for value in values:
+            ddsketch.add(value)
+        for q in (0.0, 0.5, 0.95, 0.99, 1.0):
+            exact = values[max(0, int(q * len(values)) - 1)]
+            self.assertWithin(ddsketch.getQuantile(q), exact)
+
+    def test_mergeMatchesUnion(self):
+        first = sketch.DDSketch(0.01, 2048)
+        second = sketch.DDSketch(0.01, 2048)
+        union = sketch.DDSketch(0.01, 2048)
+        for i in range(1, 1001):
+            (first if i % 2 else second).add(float(i))
+            union.add(float(i))
+        first.merge(second)
+        for q in (0.5, 0.95, 0.99):
+            self.assertEqual(first.getQuantile(q), union.getQuantile(q))
+
+    def test_mergeDifferentAccuracy(self):
+        self.assertRaises(GeneralError, sketch.DDSketch(0.01, 64).merge,
+            sketch.DDSketch(0.02, 64))
+
+    def test_zeroAndNegative(self):
+        ddsketch = sketch.DDSketch(0.01, 64)
+        for value in (-10.0, 0.0, 10.0):
+            ddsketch.add(value)
+        self.assertWithin(ddsketch.getQuantile(0.0), -10.0)
+        self.assertEqual(ddsketch.getQuantile(0.5), 0.0)
+        self.assertWithin(ddsketch.getQuantile(1.0), 10.0)
+
+    def test_boundedBuckets(self):
+        ddsketch = sketch.DDSketch(0.01, 32)
+        for i in range(1, 10000):
+            ddsketch.add(float(i))
+        positive = ddsketch._positive
+        self.assertTrue(max(positive) - min(positive) < 32)
+        self.assertAlmostEqual(ddsketch.getCount(), 9999.0)
+        self.assertWithin(ddsketch.getQuantile(0.99), 9900.0)
+
+    def test_scaleKeepsQuantiles(self):
+        ddsketch = sketch.DDSketch(0.01, 64)
+        for i in range(1, 101):
+            ddsketch.add(float(i))
+        median = ddsketch.getQuantile(0.5)
+        ddsketch.scale(0.25)
+        self.assertEqual(ddsketch.getQuantile(0.5), median)
+        self.assertAlmostEqual(ddsketch.getCount(), 25.0)
+
+    def test_wireState(self):
+        ddsketch = sketch.DDSketch(0.01, 256)
+        for value in (-3.0, 0.0, 1.5, 20.0, 75.0):
+            ddsketch.add(value, 0.5)
+        restored = sketch.DDSketch(0.01, 256)
+        restored.setWireState(wire.unpack(wire.pack(
+            ddsketch.getWireState())))
+        for q in (0.0, 0.3, 0.5, 0.8, 1.0):
+            self.assertEqual(restored.getQuantile(q), ddsketch.getQuantile(q))
+
+    def test_empty(self):
+        self.assertEqual(sketch.DDSketch(0.01, 64).getQuantile(0.5), None)
+
+if __name__ == '__main__':
+    unittest.main()
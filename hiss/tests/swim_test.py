@@ -0,0 +1,109 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# swim_test.py                                                               #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import time
+import uuid
+import unittest
+
+# External Library Imports
+from twisted.internet import task
+
+# Local Imports
+from Hiss.hiss import me
+from Hiss.hiss import nodes
+from Hiss.hiss import swim
+
+### Test Classes #############################################################
+class Network(object):
+    """
+    Delivers SWIM messages straight to the handlers of other engines.
+    """
+
+    def __init__(self, size):
+        self.clock = task.Clock()
+        self.down = set([])
+        self.engines = {}
+        for i in range(size):
+            uid = uuid.uuid1().hex
+            self.engines[uid] = swim.SwimMembership(uid, '10.0.0.' + str(i),
+                30081, self.sender(uid), self.clock)
+
+    def sender(self, fromUid):
+        def send(uid, msg):
+            if uid in self.down or fromUid in self.down:
+                return False
+            engine = self.engines[uid]
+            payload = msg.getPayload()
+            if msg.getCode() == 'SP':
+                engine.onPing(fromUid, *payload)
+            elif msg.getCode() == 'SR':
+                engine.onPingReq(fromUid, *payload)
+            elif msg.getCode() == 'SA':
+                engine.onAck(fromUid, *payload)
+            else:
+                engine.onUpdate(fromUid, payload)
+            return True
+        return send
+
+    def rounds(self, count, now):
+        for i in range(count):
+            for uid in self.engines:
+                if uid not in self.down:
+                    self.engines[uid].probe(now)
+            self.clock.advance(1)
+
+class TestSwim(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.net = Network(5)
+        uids = self.net.engines.keys()
+        self.seed = self.net.engines[uids[0]]
+        for uid in uids[1:]:
+            self.seed.onUpdate(uid, [self.net.engines[uid].getRecord()])
+
+    def test_joinConverges(self):
+        self.net.rounds(6, time.time())
+        for engine in self.net.engines.values():
+            self.assertEqual(len(engine.getMembers()), 4)
+
+    def test_deadAfterSuspicion(self):
+        self.net.rounds(6, time.time())
+        victim = self.net.engines.keys()[1]
+        self.net.down.add(victim)
+        self.net.rounds(10, time.time())
+        self.net.rounds(10, time.time() + 1000)
+        for uid, engine in self.net.engines.items():
+            if uid != victim:
+                self.assertEqual(engine.getMember(victim), None)
+
+    def test_refuteSuspicion(self):
+        engine = self.net.engines.values()[1]
+        record = engine.getRecord()
+        engine.apply(record[:3] + (swim.SUSPECT, 0))
+        self.assertEqual(engine.getIncarnation(), 1)
+
+    def test_incarnationPrecedence(self):
+        uid = self.net.engines.keys()[1]
+        record = self.net.engines[uid].getRecord()
+        self.seed.apply(record[:3] + (swim.SUSPECT, 0))
+        self.assertEqual(self.seed.getMember(uid).state, swim.SUSPECT)
+        self.assertFalse(self.seed.apply(record[:3] + (swim.ALIVE, 0)))
+        self.assertTrue(self.seed.apply(record[:3] + (swim.ALIVE, 1)))
+        self.assertEqual(self.seed.getMember(uid).state, swim.ALIVE)
+
+
+if __name__ == '__main__':
+    unittest.main()
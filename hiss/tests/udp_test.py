@@ -0,0 +1,98 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# udp_test.py                                                                #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import uuid
+import unittest
+
+# Local Imports
+from Hiss.hiss import connections
+from Hiss.hiss import me
+from Hiss.hiss import message
+from Hiss.hiss import nodes
+from Hiss.hiss import udp
+
+### Test Classes #############################################################
+class FakeDatagramTransport(object):
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data, address):
+        self.written.append((data, address))
+
+class TestPack(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+
+    def test_fitsMtu(self):
+        items = ["x" * 100 for i in range(30)]
+        (datagrams, oversize) = udp.pack(items, mtu=500)
+        self.assertEqual(oversize, [])
+        self.assertTrue(len(datagrams) > 1)
+        unpacked = []
+        for datagram in datagrams:
+            self.assertTrue(len(datagram) <= 500)
+            unpacked.extend(message.buildMessage(datagram).getPayload())
+        self.assertEqual(unpacked, items)
+
+    def test_oversizeLeftForTcp(self):
+        items = ["small", "y" * 600, "small again"]
+        (datagrams, oversize) = udp.pack(items, mtu=500)
+        self.assertEqual(oversize, ["y" * 600])
+        self.assertEqual(message.buildMessage(datagrams[0]).getPayload(),
+            ["small", "small again"])
+
+class TestProtocol(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.node = connections.createNode(uuid.uuid1(), '10.0.7.1', 30081)
+        self.protocol = udp.GossipDatagramProtocol()
+        self.protocol.transport = FakeDatagramTransport()
+
+    def tearDown(self):
+        connections.removeNode(self.node.getUid())
+
+    def test_send(self):
+        (datagrams, oversize) = udp.pack(["a", "b"])
+        self.assertTrue(self.protocol.sendDatagrams(self.node, datagrams))
+        self.assertEqual(self.protocol.transport.written,
+            [(datagrams[0], ('10.0.7.1', 30081))])
+
+    def test_sendItems(self):
+        previous = udp.protocol
+        udp.protocol = self.protocol
+        try:
+            oversize = udp.sendItems(self.node, ["a", "z" * 70000])
+        finally:
+            udp.protocol = previous
+        self.assertEqual(oversize, ["z" * 70000])
+        self.assertEqual(self.protocol.oversize, 1)
+        self.assertEqual(self.protocol.sent, 1)
+
+    def test_receiveHeartbeat(self):
+        detector = self.node.getFailureDetector()
+        last = detector.getLastHeartbeat()
+        sender = nodes.CurrentNode('10.0.7.1', 30081)
+        sender._uid = self.node.getUidAsObject()
+        batch = message.BatchMessage([], sender)
+        self.protocol.datagramReceived(batch.getSerialized(),
+            ('10.0.7.1', 30081))
+        self.assertEqual(self.protocol.received, 1)
+        self.assertTrue(detector.getLastHeartbeat() >= last)
+
+if __name__ == '__main__':
+    unittest.main()
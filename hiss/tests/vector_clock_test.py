@@ -0,0 +1,121 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# vector_clock_test.py                                                       #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+import uuid
+
+# Local Imports
+from Hiss.hiss import me
+from Hiss.hiss import nodes
+from Hiss.hiss import vector_clock
+from Hiss.hiss.vector_clock import VectorClock
+
+### Test Classes #############################################################
+class TestOrdering(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VectorClock('a', {'a': 2, 'b': 1})
+
+    def test_cameBefore(self):
+        self.assertTrue(self.clock.cameBefore({'a': 2, 'b': 2}))
+        self.assertFalse(self.clock.cameBefore({'a': 2, 'b': 1}))
+
+    def test_missingEntries(self):
+        self.assertTrue(self.clock.cameBefore({'a': 2, 'b': 1, 'c': 1}))
+        self.assertFalse(self.clock.cameBefore({'a': 3}))
+        self.assertTrue(self.clock.cameAfter({'a': 1}))
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VectorClock('a', {'a': 5, 'b': 1, 'c': 3})
+
+    def test_delta(self):
+        self.assertEqual(self.clock.getDelta({'a': 5, 'b': 2}), {'c': 3})
+        self.assertEqual(self.clock.getDelta({'a': 4, 'c': 3}),
+            {'a': 5, 'b': 1})
+
+    def test_noDeltaWhenBehind(self):
+        self.assertEqual(self.clock.getDelta({'a': 6, 'b': 1, 'c': 3}), {})
+
+    def test_deltaCatchesUp(self):
+        other = VectorClock('b', {'a': 1, 'b': 2})
+        other.mergeClock(self.clock.getDelta(other))
+        self.assertEqual(self.clock.getDelta(other), {})
+
+class TestDeltaMessages(unittest.TestCase):
+
+    def setUp(self):
+        me.init(nodes.CurrentNode('127.0.0.1', 30081))
+        self.clock = me.getMe().getVectorClock()
+        self.clock.mergeClock({'p': 3, 'q': 4})
+
+    def test_firstMessageIsFull(self):
+        clocks = self.clock.createMessage('peer').getPayload()
+        self.assertEqual(clocks, self.clock.getClocks())
+
+    def test_deltaAfterFirst(self):
+        self.clock.createMessage('peer')
+        self.clock.mergeClock({'q': 9})
+        clocks = self.clock.createMessage('peer').getPayload()
+        uid = me.getMe().getUid()
+        self.assertEqual(clocks, {'q': 9, uid: self.clock.getClocks()[uid]})
+
+    def test_forgetPeer(self):
+        self.clock.createMessage('peer')
+        self.clock.forgetPeer('peer')
+        clocks = self.clock.createMessage('peer').getPayload()
+        self.assertEqual(clocks, self.clock.getClocks())
+
+class TestCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.dead = uuid.uuid1().hex
+        self.clock = VectorClock('live', {'live': 1, self.dead: 7, 'other': 2})
+        self.collector = vector_clock.TombstoneCollector(10)
+        self.collector.bury(self.dead, now=100)
+
+    def test_waitsForGrace(self):
+        self.collector.acknowledge('peer', [self.dead])
+        self.assertEqual(self.collector.collect(['peer'], now=105), 0)
+        self.assertTrue(self.dead in self.clock.getClocks())
+
+    def test_waitsForEveryPeer(self):
+        self.collector.acknowledge('peer', [self.dead])
+        self.assertEqual(self.collector.collect(['peer', 'p2'], now=200), 0)
+        self.assertTrue(self.collector.isBuried(self.dead))
+
+    def test_compacts(self):
+        self.collector.acknowledge('peer', [self.dead])
+        size = self.clock.getSize()
+        self.assertEqual(
+            self.collector.collect(['peer', self.dead], now=200), 1)
+        self.assertEqual(self.clock.getSize(), size - 1)
+        self.assertEqual(self.clock.getClocks()['other'], 2)
+        self.assertEqual(self.collector.getStatistics()['compacted'], 1)
+
+    def test_retiredNotResurrected(self):
+        self.collector.acknowledge('peer', [self.dead])
+        self.collector.collect(['peer'], now=200)
+        self.clock.mergeClock({self.dead: 9})
+        self.assertFalse(self.dead in self.clock.getClocks())
+
+    def test_reviveOnMessage(self):
+        self.collector.acknowledge(self.dead, [])
+        self.assertFalse(self.collector.isBuried(self.dead))
+
+
+if __name__ == '__main__':
+    unittest.main()
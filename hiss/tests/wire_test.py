@@ -0,0 +1,72 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# wire_test.py                                                               #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import unittest
+import uuid
+
+# Local Imports
+from Hiss.hiss import wire
+from Hiss.hiss.hiss_exceptions import GeneralError
+
+### Test Classes #############################################################
+class TestPack(unittest.TestCase):
+
+    def test_roundTrip(self):
+        value = {
+            'none': None,
+            'flags': [True, False],
+            'int': -12345,
+            'big': 2 ** 80,
+            'float': 0.25,
+            'str': "abc\x00def",
+            'unicode': u"caf\xe9",
+            'uuid': uuid.uuid1(),
+            'tuple': (1, (2, 3), []),
+            }
+        self.assertEqual(wire.unpack(wire.pack(value)), value)
+
+    def test_tupleStaysTuple(self):
+        self.assertEqual(type(wire.unpack(wire.pack((1, 2)))), tuple)
+
+    def test_unsupportedType(self):
+        self.assertRaises(GeneralError, wire.pack, object())
+
+    def test_truncated(self):
+        data = wire.pack("a long enough string")
+        self.assertRaises(GeneralError, wire.unpack, data[:-3])
+
+class TestUids(unittest.TestCase):
+
+    def test_uidBytes(self):
+        uid = uuid.uuid1()
+        self.assertEqual(wire.uidToBytes(uid.hex), uid.bytes)
+        self.assertEqual(wire.bytesToUid(uid.bytes), uid.hex)
+
+    def test_packUids(self):
+        uids = [uuid.uuid1().hex for i in range(5)]
+        data = wire.packUids(uids) + "trailer"
+        unpacked, offset = wire.unpackUids(data)
+        self.assertEqual(unpacked, uids)
+        self.assertEqual(data[offset:], "trailer")
+
+    def test_counters(self):
+        counters = [0, 1, 2 ** 64 - 1]
+        data = wire.packCounters(counters)
+        self.assertEqual(wire.unpackCounters(data, 0, 3),
+            (tuple(counters), 24))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# udp.py                                                                     #
+# UDP gossip transport (config.GOSSIP_TRANSPORT = "udp"). One socket on the  #
+# receive port serves every peer, so there is no connection setup. Each      #
+# datagram is one batch message, packed up to the MTU. Messages too big      #
+# for a datagram go over TCP as before. Loss is fine: the vector clock and   #
+# aggregate traffic repeats every round and SWIM has its own timeouts.       #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+
+# External Library Imports
+from twisted.internet.protocol import DatagramProtocol
+
+# Local Imports
+import config
+import failure_detector
+import message
+import wire
+from debug import debug
+
+### Classes ##################################################################
+class GossipDatagramProtocol(DatagramProtocol):
+    """
+    Sends and receives gossip datagrams.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.sent = 0
+        self.received = 0
+        self.oversize = 0
+
+    def datagramReceived(self, data, (host, port)):
+        """
+        A datagram arrived: one batch message.
+        """
+        msg = message.buildMessage(data)
+        if msg is None:
+            debug("Could not decode datagram from " + host, error=True)
+            return
+        self.received += 1
+        uid = msg.getSender().getUid()
+        failure_detector.heartbeat(uid)
+        try:
+            message.receiveMessage(msg)
+        except:
+            debug("Could not handle datagram of " + str(len(data)) \
+                + " bytes", error=True)
+
+    def sendDatagrams(self, node, datagrams):
+        """
+        Send already packed datagrams to a node.
+        """
+        if self.transport is None:
+            return False
+        address = (node.getIp(), node.getPort())
+        for datagram in datagrams:
+            try:
+                self.transport.write(datagram, address)
+                self.sent += 1
+            except Exception as e:
+                debug("Could not send datagram to [ " + node.getShortUid() \
+                    + " ]: " + str(e), error=True)
+                return False
+        return True
+
+### Variables ################################################################
+protocol = None
+"""
+The datagram protocol, once listening.
+"""
+
+### Functions ################################################################
+def isEnabled():
+    """
+    Whether gossip goes over UDP.
+    """
+    return config.GOSSIP_TRANSPORT == "udp" and protocol is not None
+
+def listen(reactor):
+    """
+    Listen for datagrams on the receive port.
+    """
+    global protocol
+    protocol = GossipDatagramProtocol()
+    reactor.listenUDP(config.RECEIVE_PORT, protocol)
+    debug("Listening for gossip datagrams on port " \
+        + str(config.RECEIVE_PORT) + ".", info=True)
+
+def pack(items, mtu=None):
+    """
+    Pack serialized messages into as few batch datagrams as fit the MTU,
+    in order. Returns (datagrams, oversize items). An item that can't fit
+    in a datagram on its own is left for TCP.
+    """
+    if mtu is None:
+        mtu = config.UDP_MTU
+    overhead = len(message.BatchMessage([]).getSerialized())
+    datagrams = []
+    oversize = []
+    current = []
+    size = overhead
+    for item in items:
+        itemSize = wire.LENGTH.size + len(item)
+        if overhead + itemSize > mtu:
+            oversize.append(item)
+            continue
+        if size + itemSize > mtu:
+            datagrams.append(message.BatchMessage(current).getSerialized())
+            current = []
+            size = overhead
+        current.append(item)
+        size += itemSize
+    if current:
+        datagrams.append(message.BatchMessage(current).getSerialized())
+    return (datagrams, oversize)
+
+def sendPacked(node, datagrams, oversize):
+    """
+    Send datagrams made by pack() to a node, counting the items pack()
+    left over. Returns those, which the caller sends over TCP.
+    """
+    protocol.sendDatagrams(node, datagrams)
+    protocol.oversize += len(oversize)
+    return oversize
+
+def sendItems(node, items):
+    """
+    Send serialized messages to a node by datagram. Returns the ones too
+    big for a datagram, which the caller sends over TCP.
+    """
+    (datagrams, oversize) = pack(items)
+    return sendPacked(node, datagrams, oversize)
+
+def sendMessage(node, msg):
+    """
+    Send one message to a node by datagram. Returns False if it was too
+    big and has to go over TCP.
+    """
+    data = msg.getSerialized()
+    if not data:
+        return True
+    return not sendItems(node, [data])
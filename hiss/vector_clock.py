@@ -10,18 +10,36 @@
 #----------------------------------------------------------------------------#
 # vectorClock.py                                                             #
 # Implements vector clocks using Lamport's logical clocks                    #
+# Every known UID gets a dense integer index shared by all clocks, so a      #
+# clock is just an array of counters and merges/comparisons are single      #
+# passes over two arrays. Entries for dead nodes are tombstoned and pruned   #
+# once every live peer has acknowledged the tombstone.                       #
 #----------------------------------------------------------------------------#
 
 ### Imports ##################################################################
+# Python Library Imports
+import time
+import weakref
+import operator
+from array import array
+from itertools import compress, izip, imap
+
 # External Library Imports
 import zope.interface
 
 # Local Imports
 import config
 import connections
+import me
 import message
 from debug import debug
 
+### Constants ################################################################
+COUNTER_TYPE = 'L'
+"""
+array typecode for counters: unsigned long, 64 bits on LP64 platforms.
+"""
+
 ### Interfaces ###############################################################
 class IVectorClock(zope.interface.Interface):
     """
@@ -38,11 +56,6 @@ class IVectorClock(zope.interface.Interface):
         Handle internal system event
         """
 
-    def createMessage():
-        """
-        Create a message from this clock
-        """
-
     def mergeClock(otherclock):
         """
         Merge this clock with another
@@ -68,6 +81,26 @@ class IVectorClock(zope.interface.Interface):
         Whether we cannot be sure about the order.
         """
 
+    def getDelta(otherclock):
+        """
+        Get the entries of this clock that are newer than another.
+        """
+
+    def createMessage(peer=None):
+        """
+        Create a message from this clock, a delta if peer is given
+        """
+
+    def forgetPeer(peer):
+        """
+        Forget what was last sent to a peer
+        """
+
+    def getSize():
+        """
+        Get the number of entries in this clock
+        """
+
     def getClocks():
         """
         Get internal clock
@@ -79,9 +112,115 @@ class IVectorClock(zope.interface.Interface):
         """
 
 ### Classes ##################################################################
+class UidIndex(object):
+    """
+    Dense integer index for every UID any clock has seen. Shared by all
+    clocks on this node so that index i means the same UID everywhere.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._indexes = {}
+        self._uids = []
+        self._clocks = weakref.WeakSet()
+        self._retired = {}
+
+    def indexOf(self, uid):
+        """
+        Get the index for a uid, assigning the next one if it's new.
+        """
+        try:
+            return self._indexes[uid]
+        except KeyError:
+            self._indexes[uid] = len(self._uids)
+            self._uids.append(uid)
+            return self._indexes[uid]
+
+    def lookup(self, uid):
+        """
+        Get the index for a uid, or None if it has never been seen.
+        """
+        return self._indexes.get(uid)
+
+    def uidAt(self, i):
+        """
+        Get the uid at an index.
+        """
+        return self._uids[i]
+
+    def getUids(self):
+        """
+        Get all uids, ordered by index.
+        """
+        return self._uids
+
+    def register(self, clock):
+        """
+        Track a clock so that compact() can remap its counters.
+        """
+        self._clocks.add(clock)
+
+    def compact(self, uids, now=None):
+        """
+        Drop uids from the index and from every registered clock, keeping
+        the remaining slots dense and in order. The dropped uids are
+        retired: entries for them arriving later are ignored instead of
+        being indexed again. Returns the number of slots removed.
+        """
+        if now is None:
+            now = time.time()
+        doomed = set([])
+        for uid in uids:
+            if uid in self._indexes:
+                doomed.add(self._indexes[uid])
+            self._retired[uid] = now
+        if not doomed:
+            return 0
+        keep = [i not in doomed for i in xrange(len(self._uids))]
+        self._uids = list(compress(self._uids, keep))
+        self._indexes = dict(izip(self._uids, xrange(len(self._uids))))
+        for clock in list(self._clocks):
+            clock._compact(keep)
+        return len(doomed)
+
+    def isRetired(self, uid):
+        """
+        Whether a uid was compacted away.
+        """
+        return uid in self._retired
+
+    def revive(self, uid):
+        """
+        Stop ignoring a retired uid (it turned out to be alive).
+        """
+        self._retired.pop(uid, None)
+
+    def expireRetired(self, before):
+        """
+        Forget uids retired before the given time.
+        """
+        for uid in [uid for uid in self._retired 
+            if self._retired[uid] < before]:
+            del self._retired[uid]
+
+    def getRetiredCount(self):
+        """
+        Number of uids currently retired.
+        """
+        return len(self._retired)
+
+    def __contains__(self, uid):
+        return uid in self._indexes
+
+    def __len__(self):
+        return len(self._uids)
+
 class VectorClock(object):
     """
     Basic Vector Clock algorithm implementation for single-threaded web apps.
+    Counters live in an array indexed through the shared UidIndex.
     """
 
     zope.interface.implements(IVectorClock)
@@ -90,102 +229,364 @@ class VectorClock(object):
         """
         Constructor
         """
-        if initialClocks:
-            self._clocks = initialClocks
-        else:
-            self._clocks = {}
-            if externKeys:
-                for externKey in externKeys:
-                    self._clocks[externKey] = 0
         if key:
             self._key = key
         else:
             self._key = connections.getMe().getUid()
+        self._keyIndex = index.indexOf(self._key)
+        self._counters = array(COUNTER_TYPE)
+        self._sent = {}
+        self._sentRounds = {}
+        index.register(self)
+
+        if externKeys:
+            for externKey in externKeys:
+                index.indexOf(externKey)
+        self._grow()
+        if initialClocks:
+            self.mergeClock(initialClocks)
+
+    def _grow(self):
+        """
+        Pad the counters with zeros for uids indexed since the last call.
+        """
+        missing = len(index) - len(self._counters)
+        if missing > 0:
+            self._counters.extend(array(COUNTER_TYPE, [0]) * missing)
+
+    def _compact(self, keep):
+        """
+        Drop the slots the index compacted away (keep is a mask over the
+        old slots).
+        """
+        self._counters = _keepSlots(self._counters, keep)
+        for peer in self._sent:
+            self._sent[peer] = _keepSlots(self._sent[peer], keep)
+        self._keyIndex = index.indexOf(self._key)
+        self._grow()
 
-        if self._key not in self._clocks:
-            self._clocks[self._key] = 0
+    def _slotsOf(self, clocks):
+        """
+        Get (slot, counter) pairs for a uid dictionary, indexing new uids
+        and skipping retired ones.
+        """
+        slots = [(index.indexOf(uid), clocks[uid]) for uid in clocks
+            if not index.isRetired(uid)]
+        self._grow()
+        return slots
+
+    def _countersOf(self, otherclock):
+        """
+        Get another clock (VectorClock, counter array or uid dictionary)
+        as a counter array of the same length as ours.
+        """
+        if isinstance(otherclock, VectorClock):
+            otherclock._grow()
+            self._grow()
+            return otherclock._counters
+        if isinstance(otherclock, array):
+            self._grow()
+            missing = len(self._counters) - len(otherclock)
+            if missing > 0:
+                otherclock = otherclock + array(COUNTER_TYPE, [0]) * missing
+            return otherclock
+        slots = self._slotsOf(otherclock)
+        counters = array(COUNTER_TYPE, [0]) * len(self._counters)
+        for i, value in slots:
+            counters[i] = value
+        return counters
 
     def incrementClock(self):
         """
         Increment this node's logical clock.
         """
-        self._clocks[self._key] += 1
+        self._counters[self._keyIndex] += 1
 
     def handleEvent(self, message):
         """
         handle an event. Increment this logical clock and return the value.
         """
         self.incrementClock()
-        return self._clocks[self._key]
+        return self._counters[self._keyIndex]
 
-    def createMessage(self):
+    def createMessage(self, peer=None):
         """
         Send a message from this machine. returns the message to send.
+        Given a peer, only the entries that changed since the last message
+        to that peer are sent, with the whole clock every
+        VECTOR_CLOCK_FULL_SYNC_ROUNDS messages in case one was lost.
         """
         self.incrementClock()
-        return message.VectorMessage(self._clocks)
+        if peer is None or not config.VECTOR_CLOCK_DELTAS:
+            return self._tombstoned(message.VectorMessage(self.getClocks()))
 
-    def mergeClock(self, otherclock):
+        rounds = self._sentRounds.get(peer, 0)
+        if peer in self._sent \
+            and rounds < config.VECTOR_CLOCK_FULL_SYNC_ROUNDS:
+            clocks = self.getDelta(self._sent[peer])
+            self._sentRounds[peer] = rounds + 1
+        else:
+            clocks = self.getClocks()
+            self._sentRounds[peer] = 1
+        self._sent[peer] = array(COUNTER_TYPE, self._counters)
+        return self._tombstoned(message.VectorMessage(clocks))
+
+    def _tombstoned(self, vectorMessage):
         """
-        Merge another clock into this one.
+        Piggyback our tombstones on an outgoing clock message, which is
+        how peers acknowledge each other's tombstones.
         """
-        if isinstance(otherclock, VectorClock):
-            otherclock = otherclock.getClocks()
-        for key in otherclock:
-            if key in self._clocks:
-                self._clocks[key] = max(otherclock[key], self._clocks[key])
-            else:
-                self._clocks[key] = otherclock[key] 
-        debug("Merged Vector Clocks", success=True)
+        vectorMessage.setTombstones(collector.getTombstones())
+        return vectorMessage
 
+    def forgetPeer(self, peer):
+        """
+        Forget what was last sent to a peer, e.g. when the connection
+        drops, so the next message to it carries the whole clock.
+        """
+        self._sent.pop(peer, None)
+        self._sentRounds.pop(peer, None)
+
+    def mergeClock(self, otherclock):
+        """
+        Merge another clock into this one. A uid dictionary (usually a
+        delta) only touches its own entries; whole clocks are merged in
+        one pass over both arrays. Returns the uids whose entries moved
+        forward.
+        """
+        if isinstance(otherclock, dict):
+            counters = self._counters
+            advanced = []
+            for i, value in self._slotsOf(otherclock):
+                if value > counters[i]:
+                    counters[i] = value
+                    advanced.append(i)
+            advanced = [index.uidAt(i) for i in advanced]
+        else:
+            other = self._countersOf(otherclock)
+            advanced = list(compress(index.getUids(),
+                imap(operator.gt, other, self._counters)))
+            self._counters = array(COUNTER_TYPE,
+                imap(max, self._counters, other))
+        debug("Merged Vector Clocks", success=True)
+        return advanced
 
     def receiveMessage(self, vectorMessage):
         """
-        Receive a message and update this clock.
+        Receive a message and update this clock. Returns the uids whose
+        entries moved forward.
         """
         self.incrementClock()
-        self.mergeClock(vectorMessage.getPayload())
+        collector.acknowledge(
+            vectorMessage.getClockKey(), vectorMessage.getTombstones())
+        return self.mergeClock(vectorMessage.getPayload())
 
     def cameBefore(self, otherclock):
         """
         Return if this clock logically came before another.
         """
-        if isinstance(otherclock, VectorClock):
-            otherclock = otherclock.getClocks()
-        oneStrictlySmall = False
-        for key in otherclock:
-            if self._clocks[key] > otherclock[key]:
-                return False
-            elif self._clocks[key] < otherclock[key]:
-                oneStrictlySmall = True
-        return oneStrictlySmall
+        other = self._countersOf(otherclock)
+        return self._counters != other and \
+            all(imap(operator.le, self._counters, other))
 
     def cameAfter(self, otherclock):
         """
         Return if this clock logically came after another.
         """
-        if isinstance(otherclock, VectorClock):
-            otherclock = otherclock.getClocks()
-        oneStrictlyLarger = False
-        for key in otherclock:
-            if self._clocks[key] < otherclock[key]:
-                return False
-            elif self._clocks[key] > otherclock[key]:
-                oneStrictlyLarger = True
-        return oneStrictlyLarger
+        other = self._countersOf(otherclock)
+        return self._counters != other and \
+            all(imap(operator.ge, self._counters, other))
 
     def certainOrder(self, otherclock):
         return self.cameBefore(otherclock) or self.cameAfter(otherclock)
 
+    def getDelta(self, otherclock):
+        """
+        Get the entries of this clock that another clock is missing or has
+        an older value for. Empty if this clock isn't ahead anywhere.
+        Merging the delta into the other clock brings it up to date.
+        """
+        other = self._countersOf(otherclock)
+        newer = list(imap(operator.gt, self._counters, other))
+        return dict(izip(compress(index.getUids(), newer),
+            compress(self._counters, newer)))
+
     def getClocks(self):
         """
-        Get the dictionary of clocks. (vector clock)
+        Get the dictionary of clocks (vector clock), leaving out entries
+        that are still zero. Our own entry is always included.
+        """
+        self._grow()
+        clocks = dict(izip(compress(index.getUids(), self._counters),
+            compress(self._counters, self._counters)))
+        clocks[self._key] = self._counters[self._keyIndex]
+        return clocks
+
+    def getSize(self):
+        """
+        Get the number of entries (slots) in this clock.
+        """
+        self._grow()
+        return len(self._counters)
+
+    def __deepcopy__(self, memo):
+        """
+        Copies share the index, so they are registered with it too.
         """
-        return self._clocks
+        clock = VectorClock(self._key)
+        clock._counters = array(COUNTER_TYPE, self._counters)
+        return clock
 
     def getKey(self):
         """
         get the key of this vector clock. I assumed it would be the key of the
         current system, but that might not be the case for merges.
         """
-        return self._key
\ No newline at end of file
+        return self._key
+
+class TombstoneCollector(object):
+    """
+    Garbage collector for clock entries of dead nodes. A dead uid is
+    tombstoned and the tombstone is piggybacked on every clock message.
+    A peer acknowledges the tombstone by sending it back. Once the uid has
+    been dead for the grace period and every live peer has acknowledged
+    it, its slot is compacted out of the index and every clock.
+    """
+
+    def __init__(self, grace):
+        """
+        Constructor
+        """
+        self._grace = grace
+        self._buried = {}
+        self._acks = {}
+
+        self.compacted = 0
+        self.collections = 0
+
+    def bury(self, uid, now=None):
+        """
+        Tombstone a uid. Burying it again doesn't restart the grace period.
+        """
+        if uid not in self._buried:
+            if now is None:
+                now = time.time()
+            self._buried[uid] = now
+            self._acks[uid] = set([])
+
+    def revive(self, uid):
+        """
+        A buried uid turned out to be alive. Drop its tombstone.
+        """
+        if uid in self._buried:
+            del self._buried[uid]
+            del self._acks[uid]
+        index.revive(uid)
+
+    def isBuried(self, uid):
+        """
+        Whether a uid is tombstoned.
+        """
+        return uid in self._buried
+
+    def getTombstones(self):
+        """
+        Get the tombstoned uids.
+        """
+        return self._buried.keys()
+
+    def acknowledge(self, peer, tombstones):
+        """
+        A peer sent us its tombstones. Count them as acknowledgements of
+        ours, and adopt the ones for nodes we don't consider alive. A
+        message from a buried peer means it is alive after all.
+        """
+        if peer in self._buried:
+            self.revive(peer)
+        for uid in tombstones:
+            if uid not in self._buried and not index.isRetired(uid) \
+                and uid not in connections.universe:
+                self.bury(uid)
+            if uid in self._acks:
+                self._acks[uid].add(peer)
+
+    def collect(self, peers, now=None):
+        """
+        Compact every uid that has been buried for the grace period and
+        acknowledged by all of peers. Returns the number of slots removed.
+        """
+        if now is None:
+            now = time.time()
+        peers = set(peers)
+        ready = [uid for uid in self._buried 
+            if now - self._buried[uid] >= self._grace
+            and peers - set([uid]) <= self._acks[uid]]
+        for uid in ready:
+            del self._buried[uid]
+            del self._acks[uid]
+        removed = index.compact(ready, now)
+        index.expireRetired(now - config.VECTOR_CLOCK_RETIRED_SECONDS)
+
+        self.compacted += removed
+        self.collections += 1
+        return removed
+
+    def getStatistics(self):
+        """
+        Get clock size and collection counters as a dictionary.
+        """
+        return {
+            'clocksize': len(index),
+            'tombstones': len(self._buried),
+            'retired': index.getRetiredCount(),
+            'compacted': self.compacted,
+            'collections': self.collections,
+            }
+
+### Variables ################################################################
+index = UidIndex()
+"""
+UID to counter index shared by every clock on this node.
+"""
+
+collector = TombstoneCollector(config.VECTOR_CLOCK_GC_GRACE_SECONDS)
+"""
+Tombstones for dead uids, pruned from the clocks once acknowledged.
+"""
+
+### Functions ################################################################
+def _keepSlots(counters, keep):
+    """
+    Keep the counters whose slot is set in the mask keep.
+    """
+    missing = len(keep) - len(counters)
+    if missing > 0:
+        counters = counters + array(COUNTER_TYPE, [0]) * missing
+    return array(COUNTER_TYPE, compress(counters, keep))
+
+def bury(uid):
+    """
+    Tombstone the clock entry of a dead node.
+    """
+    if uid != me.getMe().getUid():
+        collector.bury(uid)
+
+def collectGarbage():
+    """
+    Prune acknowledged tombstones. Peers are the live nodes we know of.
+    """
+    peers = [uid for uid in connections.universe 
+        if uid != me.getMe().getUid()]
+    removed = collector.collect(peers)
+    stats = collector.getStatistics()
+    debug("Vector clock size " + str(stats['clocksize']) + ", compacted " \
+        + str(removed) + " (" + str(stats['compacted']) + " total), " \
+        + str(stats['tombstones']) + " tombstones pending.", 
+        info=True, threshold=2)
+    return removed
+
+def getStatistics():
+    """
+    Get clock size and garbage collection counters.
+    """
+    return collector.getStatistics()
@@ -0,0 +1,244 @@
+##############################################################################
+#        __  ___                                                             #
+#       / / / (_)_________                                                   #
+#      / /_/ / / ___/ ___/                                                   #
+#     / __  / (__  |__  )                                                    #
+#    /_/ /_/_/____/____/        Gossip with Python on Twisted                #
+#                                                                            #
+##############################################################################
+
+#----------------------------------------------------------------------------#
+# wire.py                                                                    #
+# Compact tagged packing of primitive values (msgpack style). Used by the    #
+# binary message codec for payloads that don't have a fixed layout.         #
+#----------------------------------------------------------------------------#
+
+### Imports ##################################################################
+# Python Library Imports
+import struct
+import uuid
+import binascii
+
+# Local Imports
+from hiss_exceptions import GeneralError
+
+### Constants ################################################################
+LENGTH = struct.Struct("!I")
+INTEGER = struct.Struct("!q")
+DOUBLE = struct.Struct("!d")
+
+INT_MIN = -(2 ** 63)
+INT_MAX = (2 ** 63) - 1
+
+TAG_NONE = 'n'
+TAG_TRUE = 't'
+TAG_FALSE = 'f'
+TAG_INT = 'i'
+TAG_BIGINT = 'I'
+TAG_FLOAT = 'd'
+TAG_STR = 's'
+TAG_UNICODE = 'u'
+TAG_UUID = 'U'
+TAG_LIST = 'l'
+TAG_TUPLE = 'T'
+TAG_DICT = 'm'
+
+### Functions ################################################################
+def uidToBytes(uid):
+    """
+    Get the 16 raw bytes of a UID given as a hex string or uuid object.
+    """
+    if isinstance(uid, uuid.UUID):
+        return uid.bytes
+    if len(uid) != 32:
+        raise GeneralError("Malformed uid " + repr(uid))
+    return binascii.unhexlify(uid)
+
+def bytesToUid(raw):
+    """
+    Get the hex string UID for 16 raw bytes.
+    """
+    if len(raw) != 16:
+        raise GeneralError("Malformed uid bytes")
+    return binascii.hexlify(raw)
+
+def packUids(uids):
+    """
+    Pack a sequence of hex string UIDs as a count followed by the raw
+    bytes of each, converted in a single pass.
+    """
+    return LENGTH.pack(len(uids)) + binascii.unhexlify("".join(uids))
+
+def unpackUids(data, offset=0):
+    """
+    Unpack UIDs packed with packUids(). Returns (list of uids, new offset).
+    """
+    try:
+        (count,) = LENGTH.unpack_from(data, offset)
+    except struct.error:
+        raise GeneralError("Truncated value")
+    offset += LENGTH.size
+    end = offset + 16 * count
+    if len(data) < end:
+        raise GeneralError("Truncated value")
+    hexed = binascii.hexlify(data[offset:end])
+    return [hexed[i:i + 32] for i in xrange(0, 32 * count, 32)], end
+
+def packCounters(counters):
+    """
+    Pack a sequence of unsigned 64 bit counters (no count prefix).
+    """
+    return struct.pack("!%dQ" % len(counters), *counters)
+
+def unpackCounters(data, offset, count):
+    """
+    Unpack count counters packed with packCounters().
+    Returns (tuple of counters, new offset).
+    """
+    try:
+        counters = struct.unpack_from("!%dQ" % count, data, offset)
+    except struct.error:
+        raise GeneralError("Truncated value")
+    return counters, offset + 8 * count
+
+def packWeights(weights):
+    """
+    Pack a sequence of weights as 32 bit floats into a string. Its length
+    gives the count.
+    """
+    return struct.pack("!%df" % len(weights), *weights)
+
+def unpackWeights(raw):
+    """
+    Unpack weights packed with packWeights(). Returns a tuple of floats.
+    """
+    if len(raw) % 4:
+        raise GeneralError("Malformed weights")
+    return struct.unpack("!%df" % (len(raw) // 4), raw)
+
+def pack(value):
+    """
+    Pack a primitive value (None, bool, int, long, float, str, unicode,
+    uuid, and lists, tuples or dicts of those) into a string.
+    """
+    out = []
+    packInto(value, out)
+    return "".join(out)
+
+def packInto(value, out):
+    """
+    Pack a value, appending the pieces to the list out.
+    """
+    if value is None:
+        out.append(TAG_NONE)
+    elif value is True:
+        out.append(TAG_TRUE)
+    elif value is False:
+        out.append(TAG_FALSE)
+    elif isinstance(value, (int, long)):
+        if INT_MIN <= value <= INT_MAX:
+            out.append(TAG_INT)
+            out.append(INTEGER.pack(value))
+        else:
+            digits = str(value)
+            out.append(TAG_BIGINT)
+            out.append(LENGTH.pack(len(digits)))
+            out.append(digits)
+    elif isinstance(value, float):
+        out.append(TAG_FLOAT)
+        out.append(DOUBLE.pack(value))
+    elif isinstance(value, str):
+        out.append(TAG_STR)
+        out.append(LENGTH.pack(len(value)))
+        out.append(value)
+    elif isinstance(value, unicode):
+        encoded = value.encode('utf-8')
+        out.append(TAG_UNICODE)
+        out.append(LENGTH.pack(len(encoded)))
+        out.append(encoded)
+    elif isinstance(value, uuid.UUID):
+        out.append(TAG_UUID)
+        out.append(value.bytes)
+    elif isinstance(value, (list, tuple)):
+        if isinstance(value, tuple):
+            out.append(TAG_TUPLE)
+        else:
+            out.append(TAG_LIST)
+        out.append(LENGTH.pack(len(value)))
+        for item in value:
+            packInto(item, out)
+    elif isinstance(value, dict):
+        out.append(TAG_DICT)
+        out.append(LENGTH.pack(len(value)))
+        for key in value:
+            packInto(key, out)
+            packInto(value[key], out)
+    else:
+        raise GeneralError(
+            "Cannot pack value of type " + type(value).__name__)
+
+def unpack(data, offset=0):
+    """
+    Unpack a single value packed with pack().
+    """
+    value, offset = unpackFrom(data, offset)
+    return value
+
+def unpackFrom(data, offset=0):
+    """
+    Unpack one value starting at offset. Returns (value, new offset).
+    """
+    try:
+        tag = data[offset]
+        offset += 1
+        if tag == TAG_NONE:
+            return None, offset
+        elif tag == TAG_TRUE:
+            return True, offset
+        elif tag == TAG_FALSE:
+            return False, offset
+        elif tag == TAG_INT:
+            (value,) = INTEGER.unpack_from(data, offset)
+            return value, offset + INTEGER.size
+        elif tag == TAG_FLOAT:
+            (value,) = DOUBLE.unpack_from(data, offset)
+            return value, offset + DOUBLE.size
+        elif tag in (TAG_STR, TAG_UNICODE, TAG_BIGINT):
+            (length,) = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            raw = data[offset:offset + length]
+            if len(raw) != length:
+                raise GeneralError("Truncated value")
+            offset += length
+            if tag == TAG_UNICODE:
+                return raw.decode('utf-8'), offset
+            elif tag == TAG_BIGINT:
+                return long(raw), offset
+            return raw, offset
+        elif tag == TAG_UUID:
+            raw = data[offset:offset + 16]
+            if len(raw) != 16:
+                raise GeneralError("Truncated value")
+            return uuid.UUID(bytes=raw), offset + 16
+        elif tag in (TAG_LIST, TAG_TUPLE):
+            (length,) = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            items = []
+            for i in xrange(length):
+                item, offset = unpackFrom(data, offset)
+                items.append(item)
+            if tag == TAG_TUPLE:
+                return tuple(items), offset
+            return items, offset
+        elif tag == TAG_DICT:
+            (length,) = LENGTH.unpack_from(data, offset)
+            offset += LENGTH.size
+            result = {}
+            for i in xrange(length):
+                key, offset = unpackFrom(data, offset)
+                result[key], offset = unpackFrom(data, offset)
+            return result, offset
+        else:
+            raise GeneralError("Unknown wire tag " + repr(tag))
+    except (struct.error, IndexError):
+        raise GeneralError("Truncated value")